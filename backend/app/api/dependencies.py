@@ -7,6 +7,8 @@ from app.core.config import settings
 from app.db.session import get_session
 from app.models.usuario import Usuario
 from app.services.usuario_service import get_usuario_by_email
+from app.services.usuario_cache_service import obtener_usuario_cacheado, guardar_usuario_cacheado
+from app.services.usuario_token_service import token_vigente
 
 auth_scheme = HTTPBearer()
 
@@ -18,7 +20,14 @@ def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
     db: Session = Depends(get_session)
 ) -> Usuario:
-    """Obtiene el usuario actual a partir del token JWT proporcionado."""
+    """
+    Obtiene el usuario actual a partir del token JWT proporcionado.
+
+    Si el token trae los claims uid, rol_id y ver, se autoriza sin consultar
+    la tabla usuario: se valida contra el estado vigente de los usuarios y se
+    retorna un Usuario con id, email y rol_id (sin asociar a la sesión).
+    Los tokens que solo traen el email buscan el usuario (con caché).
+    """
 
     token = credentials.credentials
 
@@ -36,10 +45,22 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
+    usuario_id = payload.get("uid")
+    if settings.AUTH_TOKEN_CLAIMS_ENABLED and usuario_id is not None and "ver" in payload:
+        rol_id = payload.get("rol_id")
+        if not token_vigente(db, usuario_id, rol_id, payload["ver"]):
+            raise credentials_exception
+        return Usuario(id=usuario_id, email=email, rol_id=rol_id, estado=True)
+
+    user = obtener_usuario_cacheado(db, email)
+    if user is not None:
+        return user
+
     user = get_usuario_by_email(db, email=email)
     if user is None:
         raise credentials_exception
 
+    guardar_usuario_cacheado(email, user)
     return user
 
 def get_current_admin_user(
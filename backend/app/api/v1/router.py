@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from app.api.v1.routes import (
     auth, 
     usuario, 
@@ -10,6 +10,9 @@ from app.api.v1.routes import (
     detalle_venta,
     categoria
 )
+from app.api.dependencies import get_current_admin_user
+from app.models.usuario import Usuario
+from app.services.transaccion import estadisticas_reintentos
 
 router = APIRouter()
 router.include_router(auth.router, prefix="/auth", tags=["Auth"])
@@ -25,4 +28,10 @@ router.include_router(exportar.router, prefix="/exportar", tags=["Exportar"])
 
 @router.get("/", tags=["Health"])
 def health():
-    return {"status": "ok", "message": "API is running"}
\ No newline at end of file
+    return {"status": "ok", "message": "API is running"}
+
+
+@router.get("/transacciones", tags=["Health"])
+def transacciones(admin: Usuario = Depends(get_current_admin_user)):
+    """Reintentos por deadlock o timeout de bloqueo, por servicio."""
+    return estadisticas_reintentos()
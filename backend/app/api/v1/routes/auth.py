@@ -1,19 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 
-from app.schemas.auth import LoginRequest, Token
+from app.schemas.auth import LoginRequest, Token, CacheUsuariosEstadisticas
 from app.schemas.usuario import UsuarioCreate, UsuarioRead
 from app.schemas.shared import ErrorResponse
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_current_admin_user
 from app.models.usuario import Usuario
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_and_update_password_async, create_access_token
 from app.db.session import get_session
 from app.services.usuario_service import (
     get_usuario_by_email, 
     create_usuario, 
     UsuarioExistsError,
-    get_usuario_by_id
+    get_usuario_by_id,
+    actualizar_hash_contrasena
     )
+from app.services.usuario_cache_service import estadisticas_cache_usuarios
+from app.services.usuario_token_service import claims_token, actualizar_usuario_token
 
 router = APIRouter()
 
@@ -28,13 +32,18 @@ router = APIRouter()
             }
         }
         )
-def login(request: LoginRequest, db: Session = Depends(get_session)):
+async def login(request: LoginRequest, db: Session = Depends(get_session)):
     """
     Endpoint para autenticar un usuario y generar un token JWT.
+    La verificación con bcrypt corre en su propio pool; las consultas, en el threadpool.
     """
-    user = get_usuario_by_email(db, request.email) 
+    user = await run_in_threadpool(get_usuario_by_email, db, request.email)
 
-    if not user or not verify_password(request.password, user.contrasena):
+    valida, nuevo_hash = (False, None)
+    if user:
+        valida, nuevo_hash = await verify_and_update_password_async(request.password, user.contrasena)
+
+    if not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas"
@@ -46,7 +55,12 @@ def login(request: LoginRequest, db: Session = Depends(get_session)):
             detail="Usuario inactivo, contacte al administrador"
         )    
 
-    token = create_access_token({"sub": user.email})
+    # Hash con un costo distinto al configurado: se rehace con la contraseña ya verificada
+    if nuevo_hash:
+        user = await run_in_threadpool(actualizar_hash_contrasena, db, user, nuevo_hash)
+
+    actualizar_usuario_token(user)
+    token = create_access_token(claims_token(user))
 
     return {"access_token": token, "token_type": "bearer"}
 
@@ -93,7 +107,38 @@ def obtener_usuario_actual(
     """
     Endpoint para obtener los datos del usuario autenticado.
     """
-    return current_user
+    usuario = get_usuario_by_id(db, current_user.id)
+
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales"
+        )
+
+    return usuario
+
+@router.get(
+        "/cache", 
+        response_model=CacheUsuariosEstadisticas, 
+        summary="Estadísticas de la caché de usuarios autenticados",
+        responses= {
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            403: {
+                "description": "Permisos insuficientes",
+                "model": ErrorResponse,
+            }
+        }
+        )
+def obtener_estadisticas_cache(
+    admin: Usuario = Depends(get_current_admin_user)
+):
+    """
+    Endpoint para consultar los aciertos y fallos de la caché de autenticación.
+    """
+    return estadisticas_cache_usuarios()
 
 @router.get(
     "/{user_id}",
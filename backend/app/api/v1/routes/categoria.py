@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import Annotated, Optional, List
 
@@ -28,6 +28,10 @@ router = APIRouter()
         response_model=List[CategoriaSimpleRead], 
         summary="Listar categorías activas",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -35,18 +39,24 @@ router = APIRouter()
         }
         )
 def listar_categorias_infinita(
+    response: Response,
     db: Session = Depends(get_session),
     skip: int = Query(0, ge=0, description="Número de registro desde donde empezar"),     
     limit: int = Query(50, le=100, description="Número de registro máximos a retornar"),
     search: Optional[str] = Query(None, description="Buscar por nombre de categoría"),
+    cursor: Optional[str] = Query(None, description="Cabecera X-Next-Cursor de la respuesta anterior; si se envía, se ignora skip"),
     user=Depends(get_current_user)
 ):
-    return get_categorias_infinito(
+    pagina = get_categorias_infinito(
         db=db,
         skip=skip,
         limit=limit,
-        search=search
+        search=search,
+        cursor=cursor
     )
+    if pagina.next_cursor:
+        response.headers["X-Next-Cursor"] = pagina.next_cursor
+    return pagina.filas
 
 
 @router.post(
@@ -88,6 +98,7 @@ def listar_categorias(
     db: Session = Depends(get_session),
     page: int = Query(1, ge=1, description="Número de página (comienza en 1)"),
     page_size: int = Query(50, ge=1, le=100, description="Elementos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     search: Optional[str] = Query(None, description="Buscar por nombre de categoría"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
@@ -101,7 +112,8 @@ def listar_categorias(
         search=search,
         estado=estado,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        include_total=include_total
     )
 
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import Optional
 from sqlmodel import Session
 from typing import List
@@ -27,6 +27,10 @@ router = APIRouter()
         response_model=List[ClienteReadSimple], 
         summary="Listar clientes activos",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -34,18 +38,24 @@ router = APIRouter()
         }
         )
 def listar_clientes_infinita(
+    response: Response,
     db: Session = Depends(get_session),
     skip: int = Query(0, ge=0, description="Número de registro desde donde empezar"),     
     limit: int = Query(50, le=100, description="Número de registro máximos a retornar"),
     search: Optional[str] = Query(None, description="Buscar por nombre de cliente"),
+    cursor: Optional[str] = Query(None, description="Cabecera X-Next-Cursor de la respuesta anterior; si se envía, se ignora skip"),
     user=Depends(get_current_user)
 ):
-    return get_clientes_infinito(
+    pagina = get_clientes_infinito(
         db=db,
         skip=skip,
         limit=limit,
-        search=search
+        search=search,
+        cursor=cursor
     )
+    if pagina.next_cursor:
+        response.headers["X-Next-Cursor"] = pagina.next_cursor
+    return pagina.filas
 
 
 @router.get(
@@ -106,6 +116,7 @@ def crear_cliente(
 def listar_clientes(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     search: Optional[str] = Query(None, description="Búsqueda general por nombre, identificación o email"),
     tipo_persona: Optional[TipoPersona] = Query(None, description="Tipo de persona: natural o jurídica"),
     db: Session = Depends(get_session),
@@ -122,7 +133,8 @@ def listar_clientes(
         tipo_persona=tipo_persona,
         sort_by=sort_by,
         sort_order=sort_order,
-        estado=estado
+        estado=estado,
+        include_total=include_total
         )
 
 
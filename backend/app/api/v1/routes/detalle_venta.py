@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session
 from app.db.session import get_session
 from app.schemas.detalle_venta import DetalleVentaCreate, DetalleVentaUpdate, DetalleVentaRead
@@ -31,11 +31,12 @@ router = APIRouter()
 def agregar_detalle_venta(
     venta_id: int,
     detalle_data: DetalleVentaCreate,
+    reservar: bool = Query(False, description="Si es true la línea queda en borrador: aparta el stock hasta confirmar la venta"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
     """Agrega un nuevo detalle a una venta y devuelve la venta actualizada."""
-    venta = add_detalle_venta(db, venta_id, detalle_data, user)
+    venta = add_detalle_venta(db, venta_id, detalle_data, user, reservar=reservar)
     return venta
 
 
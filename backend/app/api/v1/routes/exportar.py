@@ -1,30 +1,106 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from datetime import date, datetime
+from typing import Optional
 from sqlmodel import Session
-from app.db.session import get_session
+from app.db.session import get_session, engine
 from app.api.dependencies import get_current_user, get_current_admin_user
 from app.services.cliente_service import get_cliente_by_id
 from app.services.producto_service import get_producto_by_id
 from app.services.usuario_service import get_usuario_by_id
+from app.models.cliente import TipoPersona
+from app.models.movimiento_inventario import TipoMovimientoEnum
 from app.services.exportar_service import (
-    exportar_inventario,
-    exportar_ventas,
-    exportar_productos,
-    exportar_usuarios,
-    exportar_clientes,
-    exportar_movimientos_por_producto,
-    exportar_movimientos_por_usuario,
-    exportar_ventas_por_cliente,
-    exportar_detalle_venta_por_venta_id,
-    exportar_movimientos_inventario,
-    exportar_categorias
+    Consulta,
+    consulta_inventario,
+    consulta_ventas,
+    consulta_productos,
+    consulta_usuarios,
+    consulta_clientes,
+    consulta_movimientos_por_producto,
+    consulta_movimientos_por_usuario,
+    consulta_ventas_por_cliente,
+    consulta_detalle_venta_por_venta_id,
+    consulta_movimientos_inventario,
+    consulta_categorias,
+    crear_excel,
+    crear_respaldo,
+    generar_csv,
+    generar_ndjson,
+    iterar_archivo
 )
-from app.core.config import COL_TZ
+from app.services.exportar_cache_service import obtener_exportacion
+from app.services.exportar_job_service import (
+    crear_trabajo_exportacion,
+    get_trabajo_exportacion,
+    get_archivo_trabajo
+)
+from app.core.config import COL_TZ, settings
 from app.schemas.shared import ErrorResponse
+from app.schemas.exportar import (
+    FormatoExportacion,
+    TrabajoExportacionCreate,
+    TrabajoExportacionRead
+)
 
 router = APIRouter()
 
+MEDIA_TYPES = {
+    FormatoExportacion.xlsx: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    FormatoExportacion.csv: "text/csv; charset=utf-8",
+    FormatoExportacion.ndjson: "application/x-ndjson",
+}
+
+GENERADORES = {
+    FormatoExportacion.csv: generar_csv,
+    FormatoExportacion.ndjson: generar_ndjson,
+}
+
+formato_query = Query(
+    FormatoExportacion.xlsx,
+    alias="format",
+    description="Formato del archivo: xlsx, csv o ndjson"
+)
+
+
+def _generar_con_sesion(generador, consulta: Consulta):
+    """
+    Ejecuta el generador con una sesión propia: la sesión de la dependencia
+    se cierra antes de que la respuesta termine de enviarse.
+    """
+    with Session(engine) as db:
+        yield from generador(db, consulta)
+
+
+def _respuesta_exportacion(
+    db: Session,
+    consulta: Consulta,
+    formato: FormatoExportacion,
+    nombre: str,
+    usar_cache: bool = False
+) -> StreamingResponse:
+    """
+    Construye la respuesta de descarga en el formato solicitado. CSV y NDJSON
+    se envían a medida que se leen; con `usar_cache` y la caché activa, el
+    Excel se sirve desde disco si los datos no cambiaron.
+    """
+    if formato == FormatoExportacion.xlsx and usar_cache and settings.EXPORT_CACHE_ENABLED:
+        contenido = iterar_archivo(obtener_exportacion(db, consulta, formato))
+    elif formato == FormatoExportacion.xlsx:
+        contenido = iterar_archivo(crear_excel(db, consulta))
+    else:
+        contenido = _generar_con_sesion(GENERADORES[formato], consulta)
+
+    # Usar la zona horaria definida en config
+    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
+    filename = f"{nombre}_{fecha_colombia}.{formato.value}"
+
+    return StreamingResponse(
+        contenido,
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 
 @router.get(
         "/inventarios", 
@@ -42,19 +118,20 @@ router = APIRouter()
         }
         )
 def descargar_inventario(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre o código de producto"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_inventario(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Inventario_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_inventario(search, estado, sort_by, sort_order),
+        formato,
+        "Inventario",
+        usar_cache=True
     )
 
 
@@ -74,19 +151,21 @@ def descargar_inventario(
         }
         )
 def descargar_ventas(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre de cliente, nombre de vendedor o id de venta"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_ventas(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Ventas_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_ventas(search, estado, fecha_desde, fecha_hasta, sort_by, sort_order),
+        formato,
+        "Ventas"
     )
 
 
@@ -107,20 +186,20 @@ def descargar_ventas(
         )
 def descargar_ventas_por_cliente(
     cliente_id: int,
+    formato: FormatoExportacion = formato_query,
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_ventas_por_cliente(db, cliente_id)
     cliente = get_cliente_by_id(db, cliente_id)
 
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Ventas_Cliente_ID_{cliente.identificacion}_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_ventas_por_cliente(cliente_id, estado, fecha_desde, fecha_hasta),
+        formato,
+        f"Ventas_Cliente_ID_{cliente.identificacion}"
     )
 
 
@@ -140,19 +219,20 @@ def descargar_ventas_por_cliente(
         }
         )
 def descargar_clientes(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre, identificación o correo"),
+    tipo_persona: Optional[TipoPersona] = Query(None, description="Tipo de persona: natural o jurídica"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_clientes(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Cliente_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_clientes(search, tipo_persona, estado, sort_by, sort_order),
+        formato,
+        "Cliente"
     )
 
 
@@ -172,19 +252,19 @@ def descargar_clientes(
         }
         )
 def descargar_categorias(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_categorias(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Categorias_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_categorias(search, estado, sort_by, sort_order),
+        formato,
+        "Categorias"
     )
 
 
@@ -204,19 +284,21 @@ def descargar_categorias(
         }
         )
 def descargar_productos(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre o código"),
+    categoria: Optional[str] = Query(None, description="Buscar por nombre de categoría"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_productos(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Productos_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_productos(search, categoria, estado, sort_by, sort_order),
+        formato,
+        "Productos",
+        usar_cache=True
     )
     
 
@@ -236,19 +318,19 @@ def descargar_productos(
         }
         )
 def descargar_usuarios(
+    formato: FormatoExportacion = formato_query,
+    search: Optional[str] = Query(None, description="Buscar por nombre o correo"),
+    estado: Optional[bool] = Query(None, description="Filtrar por estado"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     admin=Depends(get_current_admin_user)
 ):
-    output = exportar_usuarios(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Usuarios_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_usuarios(search, estado, sort_by, sort_order),
+        formato,
+        "Usuarios"
     )
 
 
@@ -269,20 +351,20 @@ def descargar_usuarios(
         )
 def descargar_movimientos_producto(
     producto_id: int,
+    formato: FormatoExportacion = formato_query,
+    tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_movimientos_por_producto(db, producto_id)
     producto = get_producto_by_id(db, producto_id)
 
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Movimientos_Producto_COD_{producto.codigo}_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_movimientos_por_producto(producto_id, tipo, fecha_desde, fecha_hasta),
+        formato,
+        f"Movimientos_Producto_COD_{producto.codigo}"
     )
     
     
@@ -303,20 +385,20 @@ def descargar_movimientos_producto(
         )
 def descargar_movimientos_usuario(
     usuario_id: int,
+    formato: FormatoExportacion = formato_query,
+    tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_movimientos_por_usuario(db, usuario_id)
     usuario = get_usuario_by_id(db, usuario_id)
 
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Movimientos_Usuario_{usuario.nombre}_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_movimientos_por_usuario(usuario_id, tipo, fecha_desde, fecha_hasta),
+        formato,
+        f"Movimientos_Usuario_{usuario.nombre}"
     )
 
 
@@ -336,19 +418,21 @@ def descargar_movimientos_usuario(
         }
         )
 def descargar_movimientos_inventario(
+    formato: FormatoExportacion = formato_query,
+    tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
+    search: Optional[str] = Query(None, description="Buscar por nombre de usuario, nombre/código de producto o ID de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_movimientos_inventario(db)
-
-    # Usar la zona horaria definida en config
-    fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Movimientos_Inventarios_{fecha_colombia}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return _respuesta_exportacion(
+        db,
+        consulta_movimientos_inventario(tipo, search, fecha_desde, fecha_hasta, sort_by, sort_order),
+        formato,
+        "Movimientos_Inventarios"
     )
 
 
@@ -369,19 +453,134 @@ def descargar_movimientos_inventario(
         )
 def descargar_detalle_venta(
     venta_id: int,
+    formato: FormatoExportacion = formato_query,
     db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    output = exportar_detalle_venta_por_venta_id(db, venta_id)
+    return _respuesta_exportacion(
+        db,
+        consulta_detalle_venta_por_venta_id(venta_id),
+        formato,
+        f"Venta_{venta_id}_Detalles"
+    )
+    
+    
+
+
+@router.get(
+        "/completo",
+        response_class=StreamingResponse,
+        summary="Exportar respaldo completo del sistema",
+        responses={
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            403: {
+                "description": "Permisos insuficientes",
+                "model": ErrorResponse,
+            },
+            500: {
+                "description": "Error al generar el respaldo",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def descargar_respaldo_completo(
+    formato: FormatoExportacion = Query(
+        FormatoExportacion.xlsx,
+        alias="format",
+        description="xlsx: un libro con una hoja por entidad; csv o ndjson: un zip con un archivo por entidad"
+    ),
+    admin=Depends(get_current_admin_user)
+):
+    archivo = crear_respaldo(engine, formato)
 
-    # Usar la zona horaria definida en config
     fecha_colombia = datetime.now(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"Venta_{venta_id}_Detalles_{fecha_colombia}.xlsx"
+    extension = "xlsx" if formato == FormatoExportacion.xlsx else "zip"
+    media_type = MEDIA_TYPES[formato] if formato == FormatoExportacion.xlsx else "application/zip"
 
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        iterar_archivo(archivo),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=Respaldo_{fecha_colombia}.{extension}"}
+    )
+
+
+@router.post(
+        "/trabajos",
+        response_model=TrabajoExportacionRead,
+        status_code=202,
+        summary="Crear exportación en segundo plano",
+        responses={
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            403: {
+                "description": "Permisos insuficientes para el tipo de exportación",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def crear_trabajo(
+    data: TrabajoExportacionCreate,
+    user=Depends(get_current_user)
+):
+    return crear_trabajo_exportacion(data, user)
+
+
+@router.get(
+        "/trabajos/{trabajo_id}",
+        response_model=TrabajoExportacionRead,
+        summary="Consultar estado de una exportación",
+        responses={
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Trabajo de exportación no encontrado",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def consultar_trabajo(
+    trabajo_id: str,
+    user=Depends(get_current_user)
+):
+    return get_trabajo_exportacion(trabajo_id, user)
+
+
+@router.get(
+        "/trabajos/{trabajo_id}/descarga",
+        response_class=FileResponse,
+        summary="Descargar una exportación completada",
+        responses={
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Trabajo de exportación no encontrado",
+                "model": ErrorResponse,
+            },
+            409: {
+                "description": "La exportación aún no está disponible",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def descargar_trabajo(
+    trabajo_id: str,
+    user=Depends(get_current_user)
+):
+    trabajo = get_archivo_trabajo(trabajo_id, user)
+    fecha_colombia = trabajo.creado.astimezone(COL_TZ).strftime("%Y-%m-%d_%H-%M-%S")
+    nombre = trabajo.tipo.value.capitalize()
+
+    return FileResponse(
+        trabajo.ruta,
+        media_type=MEDIA_TYPES[trabajo.formato],
+        filename=f"{nombre}_{fecha_colombia}.{trabajo.formato.value}"
     )
-    
-    
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session
 from typing import List, Optional
+from datetime import date
 
 from app.db.session import get_session
 from app.models.inventario import Inventario
@@ -9,7 +10,8 @@ from app.schemas.inventario import (
     InventarioReadDetail,
     InventarioCantidadCreate,
     InventarioRead,
-    InventarioCantidadUpdate
+    InventarioCantidadUpdate,
+    InventarioFranjasUpdate
 )
 from app.schemas.movimiento_inventario import (
     MovimientoInventarioRead,
@@ -28,12 +30,13 @@ from app.services.inventario_service import (
     get_historial_movimientos_by_usuario,
     update_inventario,
     change_estado_inventario,
+    configurar_franjas_inventario,
     get_inventario_by_id,
     get_movimiento_by_id
 )
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_current_admin_user
 from app.models.usuario import Usuario
-from app.schemas.shared import PagedResponse, ErrorResponse
+from app.schemas.shared import EstrategiaTotal, PagedResponse, ErrorResponse
 
 router = APIRouter()
 
@@ -97,6 +100,10 @@ def registrar_salida(
         response_model=PagedResponse[MovimientoInventarioDetailRead], 
         summary="Historial de movimientos por producto (paginado)",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -107,7 +114,15 @@ def historial_movimientos_producto(
     producto_id: int,
     page: int = Query(1, ge=1, description="Número de página (desde 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Cantidad de resultados por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
+    total_strategy: EstrategiaTotal = Query(
+        EstrategiaTotal.exacto,
+        description="Cálculo del total: exacto, cache (total reciente de los mismos filtros) o estimado (estadísticas de la tabla, sin filtros)"
+    ),
     tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior; si se envía, se ignora page"),
     db: Session = Depends(get_session),
     user: Usuario = Depends(get_current_user)
 ):
@@ -116,7 +131,12 @@ def historial_movimientos_producto(
         producto_id=producto_id,
         page=page,
         page_size=page_size,
-        tipo=tipo
+        tipo=tipo,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia_total=total_strategy
     )
 
 
@@ -125,6 +145,10 @@ def historial_movimientos_producto(
         response_model=PagedResponse[MovimientoInventarioDetailRead], 
         summary="Historial de movimientos por usuario (paginado)",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -135,7 +159,15 @@ def historial_movimientos_usuario(
     usuario_id: int,
     page: int = Query(1, ge=1, description="Número de página (desde 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Cantidad de resultados por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
+    total_strategy: EstrategiaTotal = Query(
+        EstrategiaTotal.exacto,
+        description="Cálculo del total: exacto, cache (total reciente de los mismos filtros) o estimado (estadísticas de la tabla, sin filtros)"
+    ),
     tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior; si se envía, se ignora page"),
     db: Session = Depends(get_session),
     user: Usuario = Depends(get_current_user)
 ):
@@ -144,7 +176,12 @@ def historial_movimientos_usuario(
         usuario_id=usuario_id,
         page=page,
         page_size=page_size,
-        tipo=tipo
+        tipo=tipo,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia_total=total_strategy
     )
 
 
@@ -153,6 +190,10 @@ def historial_movimientos_usuario(
         response_model=PagedResponse[MovimientoInventarioDetailRead], 
         summary="Listar movimientos de inventario",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -163,8 +204,16 @@ def listar_movimientos_inventario(
     db: Session = Depends(get_session),
     page: int = Query(1, ge=1, description="Número de página (comienza en 1)"),
     page_size: int = Query(50, ge=1, le=100, description="Cantidad de elementos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
+    total_strategy: EstrategiaTotal = Query(
+        EstrategiaTotal.exacto,
+        description="Cálculo del total: exacto, cache (total reciente de los mismos filtros) o estimado (estadísticas de la tabla, sin filtros)"
+    ),
     tipo: Optional[TipoMovimientoEnum] = Query(None, description="Filtrar por tipo de movimiento"),
     search: Optional[str] = Query(None, description="Buscar por nombre de usuario, nombre/código de producto o ID de movimiento"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior; si se envía, se ignora page"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     user=Depends(get_current_user)
@@ -176,7 +225,12 @@ def listar_movimientos_inventario(
         tipo=tipo,
         search=search,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia_total=total_strategy
     )
 
 
@@ -196,6 +250,7 @@ def listar_stock_bajo(
     search: Optional[str] = Query(None, description="Buscar por nombre o código de producto"),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     user: Usuario = Depends(get_current_user)
@@ -206,7 +261,8 @@ def listar_stock_bajo(
         page=page, 
         page_size=page_size, 
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        include_total=include_total
     )
 
 
@@ -225,6 +281,7 @@ def listar_inventarios(
     db: Session = Depends(get_session),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     search: Optional[str] = Query(None, description="Buscar por nombre o código de producto"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
@@ -238,7 +295,8 @@ def listar_inventarios(
         search=search,
         estado=estado,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        include_total=include_total
         )
 
 
@@ -396,3 +454,39 @@ def cambiar_estado_inventario(
     user=Depends(get_current_user)
 ):
     return change_estado_inventario(db, inventario_id)
+
+
+@router.patch(
+        "/{inventario_id}/franjas", 
+        response_model=InventarioRead, 
+        summary="Repartir el stock en contadores para productos muy vendidos",
+        responses={
+            400: {
+                "description": "Número de franjas inválido",
+                "model": ErrorResponse,
+            },
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            403: {
+                "description": "Permisos insuficientes",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Inventario no encontrado",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def configurar_franjas(
+    inventario_id: int,
+    data: InventarioFranjasUpdate,
+    db: Session = Depends(get_session),
+    admin: Usuario = Depends(get_current_admin_user)
+):
+    """
+    Con franjas > 1 las ventas del producto descuentan de filas distintas y
+    no se bloquean entre sí. La cantidad leída sigue siendo el total.
+    """
+    return configurar_franjas_inventario(db, inventario_id, data)
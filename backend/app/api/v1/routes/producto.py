@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlmodel import Session
 from typing import Optional, List
 
@@ -34,6 +34,10 @@ router = APIRouter()
         response_model=List[ProductoInfinito], 
         summary="Listar productos activos para vista de inventarios",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -41,18 +45,24 @@ router = APIRouter()
         }
         )
 def listar_productos_infinita_inventario(
+    response: Response,
     db: Session = Depends(get_session),
     skip: int = Query(0, ge=0, description="Número de registro desde donde empezar"),     
     limit: int = Query(50, le=100, description="Número de registro máximos a retornar"),
     search: Optional[str] = Query(None, description="Buscar por nombre o código de producto"),
+    cursor: Optional[str] = Query(None, description="Cabecera X-Next-Cursor de la respuesta anterior; si se envía, se ignora skip"),
     user=Depends(get_current_user)
 ):
-    return get_productos_infinito_inventario(
+    pagina = get_productos_infinito_inventario(
         db=db,
         skip=skip,
         limit=limit,
-        search=search
+        search=search,
+        cursor=cursor
     )
+    if pagina.next_cursor:
+        response.headers["X-Next-Cursor"] = pagina.next_cursor
+    return pagina.filas
     
 
 @router.get(
@@ -60,6 +70,10 @@ def listar_productos_infinita_inventario(
         response_model=List[ProductoInfinito], 
         summary="Listar productos activos para vista de movimientos",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -67,18 +81,24 @@ def listar_productos_infinita_inventario(
         }
         )
 def listar_productos_infinita_movimiento(
+    response: Response,
     db: Session = Depends(get_session),
     skip: int = Query(0, ge=0, description="Número de registro desde donde empezar"),     
     limit: int = Query(50, le=100, description="Número de registro máximos a retornar"),
     search: Optional[str] = Query(None, description="Buscar por nombre o código de producto"),
+    cursor: Optional[str] = Query(None, description="Cabecera X-Next-Cursor de la respuesta anterior; si se envía, se ignora skip"),
     user=Depends(get_current_user)
 ):
-    return get_productos_infinito_movimiento(
+    pagina = get_productos_infinito_movimiento(
         db=db,
         skip=skip,
         limit=limit,
-        search=search
+        search=search,
+        cursor=cursor
     )
+    if pagina.next_cursor:
+        response.headers["X-Next-Cursor"] = pagina.next_cursor
+    return pagina.filas
 
 
 @router.post(
@@ -139,6 +159,7 @@ def listar_productos(
     categoria: Optional[str] = Query(None, description="Buscar por nombre de categoría"),
     page: int = Query(1, ge=1, description="Número de página (desde 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Cantidad de productos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     estado: Optional[bool] = Query(None, description="Filtrar por estado del producto (true=activo, false=inactivo)"),
@@ -153,7 +174,8 @@ def listar_productos(
         page_size=page_size,
         estado=estado,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        include_total=include_total
     )
 
 
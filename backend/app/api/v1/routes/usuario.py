@@ -33,6 +33,7 @@ def listar_usuarios(
     db: Session = Depends(get_session),
     page: int = Query(1, ge=1, description="Número de página (comienza en 1)"),
     page_size: int = Query(50, ge=1, le=100, description="Elementos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     search: Optional[str] = Query(None, description="Buscar por nombre o correo del usuario"),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
@@ -46,7 +47,8 @@ def listar_usuarios(
         search=search,
         sort_by=sort_by,
         sort_order=sort_order,
-        estado=estado
+        estado=estado,
+        include_total=include_total
     )
 
 
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session
 from typing import List, Optional
+from datetime import date
 
 from app.db.session import get_session
 from app.services.venta_service import (
     create_venta, 
+    create_venta_completa,
     get_venta_by_id, 
     get_ventas, 
     update_venta, 
@@ -12,6 +14,8 @@ from app.services.venta_service import (
     get_venta_by_cliente_id,
     get_numero_ventas_ultimos_30_dias,
     change_estado_venta,
+    confirmar_venta,
+    anular_venta,
     get_detalles_venta_by_venta_id
 )
 from app.schemas.venta import (
@@ -19,11 +23,12 @@ from app.schemas.venta import (
     VentaDetailRead, 
     VentaUpdate, 
     VentaRequest, 
+    VentaCompletaRequest,
     VentaTotalResponse,
     VentaUpdateRead
 )
 from app.schemas.detalle_venta import DetalleVentaRead
-from app.schemas.shared import PagedResponse, ErrorResponse
+from app.schemas.shared import EstrategiaTotal, PagedResponse, ErrorResponse
 from app.models.venta import Venta
 from app.api.dependencies import get_current_user 
 
@@ -57,6 +62,42 @@ def crear_venta(
     )
 
 
+@router.post(
+        "/completa", 
+        response_model=VentaDetailRead, 
+        status_code=status.HTTP_201_CREATED, 
+        summary="Crear venta con todos sus detalles",
+        responses={
+            400: {
+                "description": "Producto inactivo o stock insuficiente",
+                "model": ErrorResponse,
+            },
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Cliente o inventario no encontrado",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def crear_venta_completa(
+    request: VentaCompletaRequest,
+    db: Session = Depends(get_session),
+    current_user=Depends(get_current_user)
+):
+    """
+    Crea la venta y todas sus líneas en una sola transacción.
+    Si alguna línea no es válida no se crea nada.
+    """
+    return create_venta_completa(
+        db,
+        venta_data=request,
+        usuario_id=current_user.id
+    )
+
+
 @router.get(
         "/30dias", 
         response_model=VentaTotalResponse, 
@@ -80,6 +121,10 @@ def ventas_30_dias(
         response_model=PagedResponse[VentaListRead], 
         summary="Listar ventas paginadas y buscables",
         responses={
+            400: {
+                "description": "Cursor inválido",
+                "model": ErrorResponse,
+            },
             401: {
                 "description": "No autorizado",
                 "model": ErrorResponse,
@@ -90,10 +135,18 @@ def listar_ventas(
     search: Optional[str] = Query(None, description="Buscar por nombre de cliente, nombre de vendedor o id de venta"),
     page: int = Query(1, ge=1, description="Número de página"),
     page_size: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
+    total_strategy: EstrategiaTotal = Query(
+        EstrategiaTotal.exacto,
+        description="Cálculo del total: exacto, cache (total reciente de los mismos filtros) o estimado (estadísticas de la tabla, sin filtros)"
+    ),
     db: Session = Depends(get_session),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
     estado: Optional[bool] = Query(None, description="Filtrar por estado de la venta (true=activa, false=inactiva)"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha inicial (inclusive), AAAA-MM-DD"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha final (inclusive), AAAA-MM-DD"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior; si se envía, se ignora page"),
     user=Depends(get_current_user)
 ):
     return get_ventas(
@@ -103,7 +156,12 @@ def listar_ventas(
         page_size=page_size,
         estado=estado,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia_total=total_strategy
         )
     
 
@@ -127,6 +185,7 @@ def listar_detalles_venta_por_venta_id(
     search: Optional[str] = Query(None, description="Buscar por nombre, código de producto o ID de detalle"),
     page: int = Query(1, ge=1, description="Número de página"),
     page_size: int = Query(10, ge=1, le=100, description="Elementos por página"),
+    include_total: bool = Query(True, description="Si es false no se calcula el total (total y total_pages vienen vacíos)"),
     db: Session = Depends(get_session),
     sort_by: Optional[str] = Query(None, description="Columna para ordenar"),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Orden ascendente o descendente"),
@@ -139,7 +198,8 @@ def listar_detalles_venta_por_venta_id(
         page=page, 
         page_size=page_size,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        include_total=include_total
         )
 
 
@@ -229,6 +289,68 @@ def ventas_por_cliente(cliente_id: int, db: Session = Depends(get_session), user
 
 
 
+@router.post(
+        "/{venta_id}/confirmar", 
+        response_model=VentaDetailRead, 
+        summary="Confirmar las líneas reservadas de una venta",
+        responses={
+            400: {
+                "description": "Venta inactiva o sin líneas reservadas",
+                "model": ErrorResponse,
+            },
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Venta no encontrada",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def confirmar_venta_borrador(
+    venta_id: int,
+    db: Session = Depends(get_session),
+    current_user=Depends(get_current_user)
+):
+    """
+    Registra los movimientos de venta de las líneas en borrador.
+    Las reservas que vencen antes de confirmar se liberan solas.
+    """
+    return confirmar_venta(db, venta_id, current_user)
+
+
+@router.post(
+        "/{venta_id}/anular", 
+        response_model=VentaDetailRead, 
+        summary="Anular venta completa",
+        responses={
+            400: {
+                "description": "Venta inactiva",
+                "model": ErrorResponse,
+            },
+            401: {
+                "description": "No autorizado",
+                "model": ErrorResponse,
+            },
+            404: {
+                "description": "Venta no encontrada",
+                "model": ErrorResponse,
+            },
+        }
+        )
+def anular_venta_completa(
+    venta_id: int,
+    db: Session = Depends(get_session),
+    current_user=Depends(get_current_user)
+):
+    """
+    Devuelve al inventario el stock de todas las líneas, registra las
+    anulaciones y desactiva la venta, en una sola transacción.
+    """
+    return anular_venta(db, venta_id, current_user)
+
+
 @router.patch(
         "/{venta_id}/estado", 
         response_model=VentaDetailRead, 
@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 from datetime import datetime, timezone, timedelta
 import os
+import tempfile
 
 COL_TZ = timezone(timedelta(hours=-5))  # Zona horaria para Colombia (UTC-5)
 
@@ -12,8 +13,36 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    AUTH_CACHE_ENABLED: bool = True  # Reutilizar el usuario autenticado entre peticiones
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Tiempo máximo que se reutiliza sin consultar la base de datos
+    AUTH_CACHE_MAX_ENTRIES: int = 1000  # Usuarios en caché antes de expulsar el menos usado
+    AUTH_TOKEN_CLAIMS_ENABLED: bool = True  # Autorizar con los claims del token sin consultar el usuario
+    AUTH_REVOCACION_REFRESH_SECONDS: int = 30  # Cada cuánto se recarga el estado de los usuarios
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # Costo de bcrypt; los hashes con otro costo se rehacen al iniciar sesión
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" o "process"
+    PASSWORD_HASH_WORKERS: int = 4  # Verificaciones de contraseña simultáneas
     STOCK_MINIMO: int = 5  # Valor por defecto para el stock mínimo
+    STOCK_FRANJAS_MAX: int = 16  # Franjas máximas por producto con contadores repartidos
+    STOCK_FRANJAS_REFRESH_SECONDS: int = 30  # Cada cuánto se recarga qué productos tienen franjas
+    RESERVA_STOCK_TTL_SECONDS: int = 900  # Vigencia de las líneas reservadas de una venta en borrador
+    RESERVA_STOCK_BARRIDO_SECONDS: int = 60  # Cada cuánto se liberan las reservas vencidas
     ENTORNO: str = "dev"  # Valor por defecto para el entorno
+    EXPORT_CHUNK_SIZE: int = 1000  # Filas leídas por lote al exportar
+    EXPORT_SPOOL_MAX_BYTES: int = 10 * 1024 * 1024  # Tamaño en memoria antes de pasar a disco
+    EXPORT_DIR: str = os.path.join(tempfile.gettempdir(), "sonyco_exportaciones")  # Archivos generados en segundo plano
+    EXPORT_JOB_EXECUTOR: str = "process"  # "process" o "thread"
+    EXPORT_JOB_WORKERS: int = 2  # Trabajos de exportación simultáneos
+    EXPORT_JOB_TTL_SECONDS: int = 3600  # Tiempo que se conserva un archivo generado
+    EXPORT_JOB_MAX_BYTES: int = 500 * 1024 * 1024  # Tamaño máximo total de archivos generados
+    EXPORT_CACHE_ENABLED: bool = True  # Reutilizar los Excel de inventario y productos si los datos no cambiaron
+    EXPORT_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "sonyco_exportaciones_cache")
+    EXPORT_CACHE_MAX_BYTES: int = 200 * 1024 * 1024  # Tamaño máximo de la caché en disco
+    EXPORT_COMPLETO_WORKERS: int = 4  # Consultas simultáneas del respaldo completo
+    PAGINACION_TOTAL_CACHE_TTL: int = 30  # Segundos que se reutiliza el total de un listado con los mismos filtros
+    DB_RETRY_MAX_INTENTOS: int = 3  # Intentos de una transacción ante deadlocks o timeouts de bloqueo
+    DB_RETRY_BASE_MS: int = 50  # Espera base entre intentos (se duplica en cada intento, con jitter)
+    DB_RETRY_MAX_MS: int = 1000  # Espera máxima entre intentos
+    PAGINACION_ESTIMADO_MINIMO: int = 10000  # Por debajo de estas filas estimadas se cuenta exacto
 
 
     # Aquí definimos dinámicamente el .env a usar
@@ -1,14 +1,24 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from app.core.config import settings
 from dotenv import load_dotenv
 import os
 
 
 # Hasheo de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
+)
+
+# Pool exclusivo para bcrypt, para que los inicios de sesión no ocupen
+# los hilos que atienden el resto de peticiones
+_hash_executor: Optional[Executor] = None
 
 # Obtener variables de settigs
 SECRET_KEY = settings.SECRET_KEY
@@ -27,6 +37,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash no usa el costo configurado,
+    retorna un hash nuevo para reemplazarlo.
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+
+def _get_hash_executor() -> Executor:
+    """Crea el pool de hashing la primera vez que se necesita."""
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="bcrypt"
+            )
+    return _hash_executor
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password ejecutada en el pool de hashing, sin bloquear el event loop."""
+    future = _get_hash_executor().submit(verify_and_update_password, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+
+def cerrar_pool_hash() -> None:
+    """Detiene el pool de hashing (se llama al apagar la aplicación)."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea un token de acceso JWT."""
     to_encode = data.copy()
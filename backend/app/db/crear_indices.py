@@ -0,0 +1,60 @@
+from typing import List, Tuple
+from sqlalchemy import func, inspect, select
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+from app.db.session import engine
+
+# init_db importa todos los modelos para que SQLModel registre las tablas
+import app.db.init_db
+
+
+def _tiene_duplicados(conn, indice) -> bool:
+    """Indica si las filas actuales impiden crear un índice único."""
+    columnas = list(indice.columns)
+    return conn.execute(
+        select(*columnas)
+        .group_by(*columnas)
+        .having(func.count() > 1)
+        .limit(1)
+    ).first() is not None
+
+
+def crear_indices_faltantes(engine: Engine) -> Tuple[List[str], List[str]]:
+    """
+    Lleva una base de datos existente al esquema de índices de los modelos
+    sin borrar datos: crea las tablas que falten y, en las que ya existen,
+    los índices declarados que todavía no están. Se puede ejecutar varias veces.
+
+    Retorna los índices creados y los índices únicos omitidos porque la
+    tabla tiene filas duplicadas (hay que depurarlas y volver a ejecutar).
+    """
+    SQLModel.metadata.create_all(engine)
+
+    creados, omitidos = [], []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for tabla in SQLModel.metadata.sorted_tables:
+            existentes = {indice["name"] for indice in inspector.get_indexes(tabla.name)}
+            for indice in sorted(tabla.indexes, key=lambda indice: indice.name):
+                if indice.name in existentes:
+                    continue
+                if indice.unique and _tiene_duplicados(conn, indice):
+                    omitidos.append(indice.name)
+                    continue
+                indice.create(conn)
+                creados.append(indice.name)
+
+    return creados, omitidos
+
+
+def main():
+    creados, omitidos = crear_indices_faltantes(engine)
+    print(f"Índices creados: {len(creados)}")
+    for nombre in creados:
+        print(f"  + {nombre}")
+    for nombre in omitidos:
+        print(f"  ! {nombre} omitido: la tabla tiene valores duplicados")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,12 @@ from app.models.producto import Producto
 from app.models.rol import Rol
 from app.models.usuario import Usuario
 from app.models.inventario import Inventario
+from app.models.inventario_franja import InventarioFranja
 from app.models.movimiento_inventario import MovimientoInventario
 from app.models.venta import Venta
 from app.models.detalle_venta import DetalleVenta
+from app.models.reserva_stock import ReservaStock
+from app.models.version_tabla import VersionTabla
 from app.models.categoria import Categoria
 
 # Crear tablas
@@ -0,0 +1,16 @@
+from sqlmodel import Session
+from app.db.session import engine
+
+# init_db importa todos los modelos para que SQLModel registre las relaciones
+import app.db.init_db
+from app.services.venta_service import recalcular_totales
+
+
+def main():
+    with Session(engine) as session:
+        corregidas = recalcular_totales(session)
+    print(f"Totales recalculados: {corregidas} ventas corregidas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,10 @@ from app.core.config import settings
 engine = create_engine(settings.DATABASE_URL, echo=False)
 
 
-# Crear para obtener la sesión de la base de datos
+# Crear para obtener la sesión de la base de datos.
+# Los objetos conservan sus valores tras el commit: los servicios arman la
+# respuesta con lo que ya está en la sesión en vez de volver a consultarlo.
 def get_session():
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
@@ -4,7 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.router import router
 from app.core.config import settings
+from app.core.security import cerrar_pool_hash
 from app.db.init_db import init_db
+from app.services.exportar_job_service import cerrar_trabajos
+from app.services.reserva_service import detener_barrido_reservas, iniciar_barrido_reservas
 
 
 @asynccontextmanager
@@ -13,8 +16,13 @@ async def lifespan(app: FastAPI):
 
     if settings.ENTORNO != "test":
         init_db()
+        iniciar_barrido_reservas()
     yield
 
+    detener_barrido_reservas()
+    cerrar_trabajos()
+    cerrar_pool_hash()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -29,7 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Next-Cursor"],
 )
 
 # Routers
@@ -0,0 +1,3 @@
+# La tabla de versiones se crea con sus filas iniciales sin importar qué
+# servicio la use (ver version_tabla.py)
+from app.models import version_tabla
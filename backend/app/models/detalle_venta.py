@@ -10,7 +10,7 @@ class DetalleVenta(SQLModel, table=True):
     __tablename__ = "detalle_venta"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    venta_id: int = Field(foreign_key="venta.id")
+    venta_id: int = Field(foreign_key="venta.id", index=True)
     producto_id: int = Field(foreign_key="producto.id")
     cantidad: int
     precio_unitario: Optional[Decimal] = None
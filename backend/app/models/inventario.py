@@ -1,6 +1,9 @@
 from typing import Optional, TYPE_CHECKING
+from sqlalchemy import func, select
+from sqlalchemy.orm import column_property
 from sqlmodel import SQLModel, Field, Relationship
 from app.core.config import settings
+from app.models.inventario_franja import InventarioFranja
 
 if TYPE_CHECKING:
     from app.models.producto import Producto
@@ -9,11 +12,22 @@ class Inventario(SQLModel, table=True):
     __tablename__ = "inventario"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    producto_id: int = Field(foreign_key="producto.id")
+    producto_id: int = Field(foreign_key="producto.id", unique=True, index=True)
     cantidad: int
     cantidad_minima: Optional[int] = Field(default=settings.STOCK_MINIMO)
     estado: bool = Field(default=True, index=True)
 
     producto: Optional["Producto"] = Relationship(back_populates="inventario")
-    
-    
\ No newline at end of file
+
+
+# Stock total: la cantidad de la fila más la de sus franjas (si tiene).
+# Con franjas la fila queda en 0 y el stock vive en inventario_franja.
+Inventario.cantidad_total = column_property(
+    Inventario.__table__.c.cantidad + func.coalesce(
+        select(func.sum(InventarioFranja.cantidad))
+        .where(InventarioFranja.inventario_id == Inventario.__table__.c.id)
+        .correlate_except(InventarioFranja)
+        .scalar_subquery(),
+        0
+    )
+)
@@ -0,0 +1,17 @@
+from typing import Optional
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+
+class InventarioFranja(SQLModel, table=True):
+    """
+    Parte del stock de un inventario con contadores repartidos: las ventas
+    descuentan de una franja al azar en vez de competir por la misma fila.
+    """
+    __tablename__ = "inventario_franja"
+    __table_args__ = (UniqueConstraint("inventario_id", "franja"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    inventario_id: int = Field(foreign_key="inventario.id")
+    franja: int
+    cantidad: int = Field(default=0)
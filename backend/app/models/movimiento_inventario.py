@@ -3,7 +3,7 @@ from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field, Relationship
 from enum import Enum
 from sqlalchemy import Enum as SAEnum
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 
 if TYPE_CHECKING:
     from app.models.usuario import Usuario
@@ -19,6 +19,11 @@ class TipoMovimientoEnum(str, Enum):
 
 class MovimientoInventario(SQLModel, table=True):
     __tablename__ = "movimiento_inventario"
+    # Historiales por producto y por usuario, ordenados por fecha
+    __table_args__ = (
+        Index("ix_movimiento_inventario_producto_id_fecha", "producto_id", "fecha"),
+        Index("ix_movimiento_inventario_usuario_id_fecha", "usuario_id", "fecha"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     producto_id: int = Field(foreign_key="producto.id")
@@ -31,9 +36,9 @@ class MovimientoInventario(SQLModel, table=True):
     )
     cantidad: int
     cantidad_inventario: Optional[int] = None
-    fecha: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    fecha: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     usuario_id: int = Field(foreign_key="usuario.id")
-    venta_id: Optional[int] = Field(default=None, foreign_key="venta.id")
+    venta_id: Optional[int] = Field(default=None, foreign_key="venta.id", index=True)
     
     producto: Optional["Producto"] = Relationship(back_populates="movimientos")
     usuario: Optional["Usuario"] = Relationship(back_populates="movimientos")
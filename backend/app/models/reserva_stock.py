@@ -0,0 +1,22 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class ReservaStock(SQLModel, table=True):
+    """
+    Stock apartado por una línea de una venta en borrador. El stock ya está
+    descontado del inventario, pero el movimiento de venta solo se registra
+    al confirmar; si la reserva vence, el stock se devuelve y la línea se elimina.
+    `cantidad_inventario` es el stock que quedó tras descontar esta reserva y
+    es el que registra su movimiento al confirmar.
+    """
+    __tablename__ = "reserva_stock"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    venta_id: int = Field(foreign_key="venta.id", index=True)
+    detalle_venta_id: int = Field(foreign_key="detalle_venta.id", unique=True)
+    producto_id: int = Field(foreign_key="producto.id")
+    cantidad: int
+    cantidad_inventario: int = 0
+    expira: datetime = Field(index=True)
@@ -1,6 +1,7 @@
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime, timezone
 from decimal import Decimal
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -10,11 +11,13 @@ if TYPE_CHECKING:
 
 class Venta(SQLModel, table=True):
     __tablename__ = "venta"
+    # Ventas de un cliente ordenadas por fecha
+    __table_args__ = (Index("ix_venta_cliente_id_fecha", "cliente_id", "fecha"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     cliente_id: int = Field(foreign_key="cliente.id")
     usuario_id: int = Field(foreign_key="usuario.id")
-    fecha: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    fecha: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     total: Optional[Decimal] = None
     estado: bool = Field(default=True, index=True)
 
@@ -0,0 +1,50 @@
+from sqlalchemy import event, insert, select, update
+from sqlmodel import Session, SQLModel, Field
+
+
+# Tablas de catálogo de las exportaciones que se guardan en caché (Excel de
+# inventario y productos). Su versión la incrementan los servicios que las
+# modifican; el stock no se versiona (ver exportar_cache_service.huella_datos).
+TABLAS_VERSIONADAS = frozenset({"categoria", "producto", "inventario"})
+
+
+class VersionTabla(SQLModel, table=True):
+    """
+    Versión de los datos de catálogo de una tabla. Forma la huella de las
+    exportaciones guardadas en caché, así que la comparten todos los procesos
+    que usan la base de datos.
+    """
+    __tablename__ = "version_tabla"
+
+    tabla: str = Field(primary_key=True, max_length=64)
+    version: int = Field(default=0)
+
+
+@event.listens_for(VersionTabla.__table__, "after_create")
+def _crear_versiones(tabla, conn, **kw) -> None:
+    """Crea la fila de versión de cada tabla junto con la tabla."""
+    conn.execute(insert(tabla), [{"tabla": nombre, "version": 0} for nombre in sorted(TABLAS_VERSIONADAS)])
+
+
+def incrementar_versiones(db: Session, *tablas: str) -> None:
+    """
+    Incrementa la versión de las tablas indicadas dentro de la transacción del
+    llamador: la versión nueva se confirma junto con los datos, y un rollback
+    la descarta. Solo la llaman las escrituras de catálogo, que son poco
+    frecuentes; las ventas y movimientos de stock no pasan por aquí.
+    """
+    tablas = sorted(set(tablas))
+    actualizadas = db.execute(
+        update(VersionTabla)
+        .where(VersionTabla.tabla.in_(tablas))
+        .values(version=VersionTabla.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if actualizadas < len(tablas):
+        # Filas borradas a mano: se recrean ya incrementadas
+        existentes = set(db.execute(
+            select(VersionTabla.tabla).where(VersionTabla.tabla.in_(tablas))
+        ).scalars())
+        db.execute(insert(VersionTabla), [
+            {"tabla": tabla, "version": 1} for tabla in tablas if tabla not in existentes
+        ])
@@ -7,3 +7,10 @@ class Token(BaseModel):
 class LoginRequest(BaseModel):
     email: str
     password: str
+
+
+class CacheUsuariosEstadisticas(BaseModel):
+    hits: int
+    misses: int
+    invalidaciones: int
+    entradas: int
@@ -0,0 +1,68 @@
+from typing import Optional
+from datetime import date, datetime
+from enum import Enum
+from pydantic import BaseModel, Field, field_serializer
+
+from app.core.config import COL_TZ
+from app.models.cliente import TipoPersona
+from app.models.movimiento_inventario import TipoMovimientoEnum
+
+
+class FormatoExportacion(str, Enum):
+    xlsx = "xlsx"
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class TipoExportacion(str, Enum):
+    inventarios = "inventarios"
+    ventas = "ventas"
+    clientes = "clientes"
+    categorias = "categorias"
+    productos = "productos"
+    usuarios = "usuarios"
+    movimiento_inventarios = "movimiento_inventarios"
+
+
+class EstadoTrabajo(str, Enum):
+    pendiente = "pendiente"
+    en_proceso = "en_proceso"
+    completado = "completado"
+    error = "error"
+
+
+class FiltrosExportacion(BaseModel):
+    """Filtros de los listados; cada tipo de exportación usa los que le aplican."""
+    search: Optional[str] = None
+    estado: Optional[bool] = None
+    tipo_persona: Optional[TipoPersona] = None
+    categoria: Optional[str] = None
+    tipo: Optional[TipoMovimientoEnum] = None
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    sort_by: Optional[str] = None
+    sort_order: Optional[str] = Field("asc", pattern="^(asc|desc)$")
+
+
+class TrabajoExportacionCreate(BaseModel):
+    tipo: TipoExportacion
+    formato: FormatoExportacion = FormatoExportacion.xlsx
+    filtros: FiltrosExportacion = FiltrosExportacion()
+
+
+class TrabajoExportacionRead(BaseModel):
+    id: str
+    tipo: TipoExportacion
+    formato: FormatoExportacion
+    estado: EstadoTrabajo
+    procesadas: int = 0
+    total: Optional[int] = None
+    progreso: Optional[float] = None
+    tamano_bytes: Optional[int] = None
+    error: Optional[str] = None
+    creado: datetime
+    finalizado: Optional[datetime] = None
+
+    @field_serializer("creado", "finalizado")
+    def serialize_fecha(self, fecha: Optional[datetime], _info):
+        return fecha.astimezone(COL_TZ).isoformat() if fecha else None
@@ -1,11 +1,14 @@
 from typing import Optional
-from pydantic import BaseModel, ConfigDict
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
 from app.schemas.producto import ProductoSimpleRead, ProductoRead
 
+# El stock leído es el total, incluidas las franjas de los contadores repartidos
+_CANTIDAD_TOTAL = AliasChoices("cantidad_total", "cantidad")
+
 class InventarioBase(BaseModel):
     producto_id: int
-    cantidad: int
+    cantidad: int = Field(validation_alias=_CANTIDAD_TOTAL)
     cantidad_minima: Optional[int] = None
     estado: bool
 
@@ -23,7 +26,7 @@ class InventarioRead(InventarioBase):
 
 class InventarioReadSimple(BaseModel):
     id: int
-    cantidad: int
+    cantidad: int = Field(validation_alias=_CANTIDAD_TOTAL)
     
     model_config = ConfigDict(from_attributes=True)
     
@@ -34,6 +37,9 @@ class InventarioCantidadCreate(BaseModel):
     estado: Optional[bool] = None
     
     
+class InventarioFranjasUpdate(BaseModel):
+    franjas: int  # 0 o 1 desactiva el reparto
+
 class InventarioCantidadUpdate(BaseModel):
     producto_id: Optional[int] = None
     cantidad: Optional[int] = None
@@ -1,14 +1,25 @@
 from typing import Generic, TypeVar, List, Optional
+from enum import Enum
 from pydantic import BaseModel, ConfigDict
 
 T = TypeVar("T")
 
+
+class EstrategiaTotal(str, Enum):
+    exacto = "exacto"
+    cache = "cache"  # Total exacto calculado hace menos de PAGINACION_TOTAL_CACHE_TTL segundos
+    estimado = "estimado"  # Estadísticas de la tabla, solo sin filtros
+
+
 class PagedResponse(BaseModel, Generic[T]):
-    total: int
+    total: Optional[int] = None  # None cuando se pidió include_total=false
     page_size: int
     current_page: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    total_strategy: Optional[EstrategiaTotal] = None
     items: List[T]
+    has_next: bool = False
+    next_cursor: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
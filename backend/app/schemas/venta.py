@@ -1,7 +1,7 @@
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel, field_serializer, ConfigDict
+from pydantic import BaseModel, Field, field_serializer, ConfigDict
 
 from app.schemas.detalle_venta import DetalleVentaRead, DetalleVentaCreate
 from app.schemas.usuario import UsuarioReadSimple
@@ -11,6 +11,10 @@ from app.core.config import COL_TZ
 class VentaRequest(BaseModel):
     cliente_id: int
 
+class VentaCompletaRequest(BaseModel):
+    cliente_id: int
+    detalles: List[DetalleVentaCreate] = Field(min_length=1)
+
 class VentaTotalResponse(BaseModel): 
     total: int
 
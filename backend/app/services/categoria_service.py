@@ -1,9 +1,11 @@
-from typing import Optional, List
+from typing import Optional
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, asc, desc
 from sqlmodel import select, col
 from app.models.categoria import Categoria
+from app.models.producto import Producto
+from app.models.version_tabla import incrementar_versiones
 from app.schemas.categoria import (
     CategoriaCreate,
     CategoriaUpdate,
@@ -12,6 +14,8 @@ from app.schemas.categoria import (
 )
 from app.schemas.shared import PagedResponse 
 from app.core.config import settings
+from app.services.paginacion import Pagina, paginar, paginar_por_nombre, respuesta_paginada
+from app.services.relaciones import verificar_sin_relaciones
 
 
 def get_categoria_by_id(db: Session, categoria_id: int) -> Optional[Categoria]:
@@ -33,8 +37,8 @@ def create_categoria(db: Session, categoria_create: CategoriaCreate) -> Categori
 
     categoria = Categoria.model_validate(categoria_create)
     db.add(categoria)
+    incrementar_versiones(db, "categoria")
     db.commit()
-    db.refresh(categoria)
     return categoria
 
 
@@ -61,8 +65,8 @@ def update_categoria(db: Session, categoria_id: int, categoria_update: Categoria
     for field, value in categoria_update.model_dump(exclude_unset=True).items():
         setattr(categoria, field, value)
 
+    incrementar_versiones(db, "categoria")
     db.commit()
-    db.refresh(categoria)
     return categoria
 
 
@@ -73,27 +77,21 @@ def delete_categoria(db: Session, categoria_id: int) -> bool:
         raise HTTPException(status_code=404, detail="Categoria no encontrado")
 
     # Relaciones que bloquean el borrado
-    if categoria.productos:
-        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
+    verificar_sin_relaciones(db, Producto.categoria_id == categoria_id)
 
     # Eliminar el categoria
     db.delete(categoria)
+    incrementar_versiones(db, "categoria")
     db.commit()
 
     return True
 
 
-def get_categorias(
-    db: Session,
-    page: int = 1,
-    page_size: int = 50,
+def build_categoria_filters(
     search: Optional[str] = None,
-    estado: Optional[bool] = None,
-    sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
-) -> PagedResponse[CategoriaDetailRead]:
-    """Obtiene todas las categorías con búsqueda por nombre, filtros, paginación y ordenamiento dinámico."""
-    
+    estado: Optional[bool] = None
+) -> list:
+    """Filtros del listado de categorías, compartidos con la exportación."""
     filters = []
     if search:
         filters.append(Categoria.nombre.ilike(f"%{search}%"))
@@ -101,15 +99,29 @@ def get_categorias(
     if estado is not None:
         filters.append(Categoria.estado == estado)
 
-    # --- Conteo total ---
-    count_stmt = select(func.count(Categoria.id))
-    if filters:
-        count_stmt = count_stmt.where(*filters)
+    return filters
 
-    total = db.exec(count_stmt).one()
 
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+def get_categoria_sort_column(sort_by: Optional[str]):
+    """Columna de ordenamiento de categorías según sort_by, o None si no aplica."""
+    if sort_by and hasattr(Categoria, sort_by):
+        return getattr(Categoria, sort_by)
+    return None
+
+
+def get_categorias(
+    db: Session,
+    page: int = 1,
+    page_size: int = 50,
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
+) -> PagedResponse[CategoriaDetailRead]:
+    """Obtiene todas las categorías con búsqueda por nombre, filtros, paginación y ordenamiento dinámico."""
+    
+    filters = build_categoria_filters(search, estado)
 
     # --- Listado ---
     statement = select(Categoria)
@@ -118,11 +130,7 @@ def get_categorias(
         statement = statement.where(*filters)
 
     # Ordenamiento dinámico
-    col = None
-    if sort_by:
-        if hasattr(Categoria, sort_by):
-            col = getattr(Categoria, sort_by)
-
+    col = get_categoria_sort_column(sort_by)
     if col is not None:
         statement = statement.order_by(
             asc(col) if sort_order == "asc" else desc(col)
@@ -131,18 +139,10 @@ def get_categorias(
         # Orden por defecto
         statement = statement.order_by(asc(Categoria.nombre))
 
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    categorias = db.exec(statement).all()
-
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=categorias
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def change_estado_categoria(db: Session, categoria_id: int) -> CategoriaDetailRead:
@@ -155,8 +155,8 @@ def change_estado_categoria(db: Session, categoria_id: int) -> CategoriaDetailRe
     # Alternar el estado del usuario
     categoria.estado = not categoria.estado
 
+    incrementar_versiones(db, "categoria")
     db.commit()
-    db.refresh(categoria)
 
     return CategoriaDetailRead.model_validate(categoria)
 
@@ -165,11 +165,13 @@ def get_categorias_infinito(
     db: Session,
     skip: int = 0,     
     limit: int = 50,
-    search: Optional[str] = None
-) -> List[CategoriaSimpleRead]:
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Pagina:
     """
     Obtiene categorías activas para infinite scroll.
     Devuelve solo id y nombre.
+    Con `cursor` (next_cursor de la página anterior) continúa por (nombre, id) en lugar de skip.
     """
     statement = select(Categoria)
     
@@ -180,9 +182,7 @@ def get_categorias_infinito(
     # Solo entidades activas
     statement = statement.where(Categoria.estado == True)
 
-    # Orden alfabetico por nombre
-    statement = statement.order_by(Categoria.nombre).offset(skip).limit(limit)
-
-    rows = db.exec(statement).all()
+    # Orden alfabético por nombre con el id como desempate
+    pagina = paginar_por_nombre(db, statement, Categoria, skip=skip, limit=limit, cursor=cursor)
 
-    return [CategoriaSimpleRead.model_validate(row) for row in rows]
\ No newline at end of file
+    return pagina._replace(filas=[CategoriaSimpleRead.model_validate(row) for row in pagina.filas])
\ No newline at end of file
@@ -1,7 +1,7 @@
 from sqlmodel import Session, select
 from sqlalchemy import func, or_, distinct, asc, desc
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from typing import Optional
 from pydantic import EmailStr 
 from fastapi import HTTPException, status
 
@@ -9,32 +9,20 @@ from app.models.cliente import Cliente, TipoPersona
 from app.models.venta import Venta
 from app.schemas.cliente import ClienteCreate, ClienteUpdate, ClienteRead, ClienteVentasResponse, ClienteReadSimple
 from app.schemas.shared import PagedResponse
+from app.services.paginacion import Pagina, paginar, paginar_por_nombre, respuesta_paginada
+from app.services.relaciones import verificar_sin_relaciones
 
 class ClienteExistsError(Exception):
     """Excepción personalizada para indicar que el cliente ya existe."""
     pass
 
 
-def get_clientes(
-    db: Session,
-    page: int = 1,
-    page_size: int = 50,
+def build_cliente_filters(
     search: Optional[str] = None,
     tipo_persona: Optional[TipoPersona] = None,
-    estado: Optional[bool] = None,
-    sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
-) -> PagedResponse[ClienteRead]:
-    """
-    Obtiene clientes con filtros, paginación y ordenamiento.
-    Filtros disponibles:
-      - search: busca en nombre, identificación y correo.
-      - tipo_persona: filtra por tipo de persona.
-      - estado: filtra por estado activo/inactivo.
-    Soporta ordenamiento dinámico mediante sort_by y sort_order.
-    """
-
-    # Construir filtros comunes para ambas consultas
+    estado: Optional[bool] = None
+) -> list:
+    """Filtros del listado de clientes, compartidos con la exportación."""
     filters = []
 
     if search:
@@ -52,15 +40,38 @@ def get_clientes(
     if estado is not None:
         filters.append(Cliente.estado == estado)
 
-    # Consulta para contar total
-    count_stmt = select(func.count(Cliente.id))
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-    total = db.exec(count_stmt).one()
+    return filters
 
-    # Calcular páginas
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+
+def get_cliente_sort_column(sort_by: Optional[str]):
+    """Columna de ordenamiento de clientes según sort_by, o None si no aplica."""
+    if sort_by and hasattr(Cliente, sort_by):
+        return getattr(Cliente, sort_by)
+    return None
+
+
+def get_clientes(
+    db: Session,
+    page: int = 1,
+    page_size: int = 50,
+    search: Optional[str] = None,
+    tipo_persona: Optional[TipoPersona] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
+) -> PagedResponse[ClienteRead]:
+    """
+    Obtiene clientes con filtros, paginación y ordenamiento.
+    Filtros disponibles:
+      - search: busca en nombre, identificación y correo.
+      - tipo_persona: filtra por tipo de persona.
+      - estado: filtra por estado activo/inactivo.
+    Soporta ordenamiento dinámico mediante sort_by y sort_order.
+    """
+
+    # Construir filtros
+    filters = build_cliente_filters(search, tipo_persona, estado)
 
     # Consulta para obtener los clientes
     statement = select(Cliente)
@@ -68,28 +79,16 @@ def get_clientes(
         statement = statement.where(*filters)
 
     # Ordenamiento dinámico
-    if sort_by:
-        col = None
-        if hasattr(Cliente, sort_by):
-            col = getattr(Cliente, sort_by)
-
-        if col is not None:
-            statement = statement.order_by(
-                asc(col) if sort_order == "asc" else desc(col)
-            )
-
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
+    col = get_cliente_sort_column(sort_by)
+    if col is not None:
+        statement = statement.order_by(
+            asc(col) if sort_order == "asc" else desc(col)
+        )
 
-    clientes = db.exec(statement).all()
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=clientes
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def get_cliente_by_email(db: Session, email: EmailStr) -> Optional[ClienteRead]:
@@ -125,7 +124,6 @@ def create_cliente(db: Session, cliente_create: ClienteCreate) -> ClienteRead:
     cliente = Cliente.model_validate(cliente_create)
     db.add(cliente)
     db.commit()
-    db.refresh(cliente)
     return cliente
 
 
@@ -163,7 +161,6 @@ def update_cliente(db: Session, cliente_id: int, cliente_update: ClienteUpdate)
 
     db.add(cliente)
     db.commit()
-    db.refresh(cliente)
     return cliente
 
 
@@ -174,8 +171,7 @@ def delete_cliente(db: Session, cliente_id: int) -> bool:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
     # Relaciones que bloquean el borrado
-    if cliente.ventas:
-        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
+    verificar_sin_relaciones(db, Venta.cliente_id == cliente_id)
 
     # Eliminar el cliente
     db.delete(cliente)
@@ -195,7 +191,6 @@ def change_estado_cliente(db: Session, cliente_id: int) -> ClienteRead:
     cliente.estado = not cliente.estado
 
     db.commit()
-    db.refresh(cliente)
 
     return ClienteRead.model_validate(cliente)
 
@@ -217,11 +212,13 @@ def get_clientes_infinito(
     db: Session,
     skip: int = 0,     
     limit: int = 50,
-    search: Optional[str] = None
-) -> List[ClienteReadSimple]:
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Pagina:
     """
     Obtiene clientes activos para infinite scroll.
     Devuelve solo id y nombre.
+    Con `cursor` (next_cursor de la página anterior) continúa por (nombre, id) en lugar de skip.
     """
     statement = select(Cliente)
     
@@ -232,9 +229,7 @@ def get_clientes_infinito(
     # Solo entidades activas
     statement = statement.where(Cliente.estado == True)
 
-    # Orden alfabetico por nombre
-    statement = statement.order_by(Cliente.nombre).offset(skip).limit(limit)
-
-    rows = db.exec(statement).all()
+    # Orden alfabético por nombre con el id como desempate
+    pagina = paginar_por_nombre(db, statement, Cliente, skip=skip, limit=limit, cursor=cursor)
 
-    return [ClienteReadSimple.model_validate(row) for row in rows]
\ No newline at end of file
+    return pagina._replace(filas=[ClienteReadSimple.model_validate(row) for row in pagina.filas])
\ No newline at end of file
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import uuid
+from typing import List
+
+from sqlalchemy import func
+from sqlalchemy.sql.util import find_tables
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.inventario import Inventario
+from app.models.inventario_franja import InventarioFranja
+from app.models.version_tabla import TABLAS_VERSIONADAS, VersionTabla
+from app.schemas.exportar import FormatoExportacion
+from app.services.exportar_service import Consulta, escribir_archivo
+
+
+_lock = threading.Lock()
+
+# Tablas cuyo stock cambia en cada venta. No se versionan, porque cada
+# venta escribiría la misma fila de version_tabla: su parte de la huella se
+# calcula al exportar a partir de las cantidades.
+TABLAS_STOCK = {
+    "inventario": Inventario,
+    "inventario_franja": InventarioFranja,
+}
+
+
+def _tablas(consulta: Consulta) -> List[str]:
+    """Tablas que intervienen en la consulta, sin repetir y en orden estable."""
+    return sorted({tabla.name for tabla in find_tables(consulta.statement, include_joins=True)})
+
+
+def _huella_stock(db: Session, tabla: str) -> str:
+    """
+    Agregados de las cantidades de una tabla de stock: cambian con cualquier
+    venta o movimiento sin que esas escrituras tengan que versionar nada. La
+    suma ponderada por id distingue stock que pasa de un producto a otro.
+    """
+    modelo = TABLAS_STOCK[tabla]
+    filas, suma, ponderada = db.exec(
+        select(
+            func.count(),
+            func.coalesce(func.sum(modelo.cantidad), 0),
+            func.coalesce(func.sum(modelo.cantidad * modelo.id), 0)
+        )
+    ).one()
+    return f"{tabla}.stock:{filas}:{suma}:{ponderada}"
+
+
+def huella_datos(db: Session, consulta: Consulta) -> str:
+    """
+    Huella de la versión de los datos exportados: la versión de catálogo
+    guardada en la base de datos de cada tabla involucrada y, para las
+    tablas con stock, agregados de sus cantidades leídos al exportar.
+    """
+    tablas = _tablas(consulta)
+    no_versionadas = set(tablas) - TABLAS_VERSIONADAS - set(TABLAS_STOCK)
+    if no_versionadas:
+        raise ValueError(f"Tablas sin versión para la caché de exportaciones: {sorted(no_versionadas)}")
+
+    versiones = dict(db.exec(
+        select(VersionTabla.tabla, VersionTabla.version)
+        .where(VersionTabla.tabla.in_(TABLAS_VERSIONADAS.intersection(tablas)))
+    ).all())
+    partes = [f"{tabla}:{versiones.get(tabla, 0)}" for tabla in tablas if tabla in TABLAS_VERSIONADAS]
+    partes += [_huella_stock(db, tabla) for tabla in tablas if tabla in TABLAS_STOCK]
+    return "|".join(partes)
+
+
+def _clave(db: Session, consulta: Consulta, formato: FormatoExportacion) -> str:
+    """Clave de caché: consulta con sus parámetros, formato y huella de los datos."""
+    compilado = consulta.statement.compile()
+    parametros = sorted(compilado.params.items())
+    contenido = f"{compilado}|{parametros}|{formato.value}|{huella_datos(db, consulta)}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _limpiar_cache() -> None:
+    """Elimina los archivos usados hace más tiempo hasta respetar el tamaño máximo."""
+    archivos = []
+    with os.scandir(settings.EXPORT_CACHE_DIR) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and not entrada.name.endswith(".parcial"):
+                info = entrada.stat()
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    total_bytes = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total_bytes <= settings.EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total_bytes -= tamano
+
+
+def obtener_exportacion(db: Session, consulta: Consulta, formato: FormatoExportacion):
+    """
+    Retorna abierto un archivo con la exportación solicitada. Si ya se generó
+    con la misma huella de datos se reutiliza; si no, se genera y se guarda
+    en la caché. Cada uso actualiza la fecha del archivo para la expulsión LRU.
+    """
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(settings.EXPORT_CACHE_DIR, f"{_clave(db, consulta, formato)}.{formato.value}")
+
+    try:
+        archivo = open(ruta, "rb")
+        os.utime(ruta)
+        return archivo
+    except FileNotFoundError:
+        pass
+
+    temporal = f"{ruta}.{uuid.uuid4().hex}.parcial"
+    try:
+        escribir_archivo(db, consulta, formato, temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    # Abrir antes de limpiar: el archivo sigue legible aunque se expulse
+    archivo = open(ruta, "rb")
+    with _lock:
+        _limpiar_cache()
+    return archivo
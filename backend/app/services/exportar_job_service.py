@@ -0,0 +1,279 @@
+import inspect
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.usuario import Usuario
+from app.schemas.exportar import (
+    EstadoTrabajo,
+    FormatoExportacion,
+    TipoExportacion,
+    TrabajoExportacionCreate,
+    TrabajoExportacionRead
+)
+from app.services.exportar_service import (
+    consulta_inventario,
+    consulta_ventas,
+    consulta_clientes,
+    consulta_categorias,
+    consulta_productos,
+    consulta_usuarios,
+    consulta_movimientos_inventario,
+    contar_filas,
+    escribir_archivo
+)
+
+
+CONSULTAS_TRABAJO = {
+    TipoExportacion.inventarios: consulta_inventario,
+    TipoExportacion.ventas: consulta_ventas,
+    TipoExportacion.clientes: consulta_clientes,
+    TipoExportacion.categorias: consulta_categorias,
+    TipoExportacion.productos: consulta_productos,
+    TipoExportacion.usuarios: consulta_usuarios,
+    TipoExportacion.movimiento_inventarios: consulta_movimientos_inventario,
+}
+
+
+class _Trabajo:
+    """Estado interno de un trabajo de exportación registrado en este proceso."""
+
+    def __init__(self, tipo: TipoExportacion, formato: FormatoExportacion, usuario_id: int):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.formato = formato
+        self.usuario_id = usuario_id
+        self.estado = EstadoTrabajo.pendiente
+        self.error: Optional[str] = None
+        self.creado = datetime.now(timezone.utc)
+        self.finalizado: Optional[datetime] = None
+        self.ruta = os.path.join(settings.EXPORT_DIR, f"{self.id}.{formato.value}")
+
+    @property
+    def ruta_progreso(self) -> str:
+        return f"{self.ruta}.progreso"
+
+    @property
+    def tamano_bytes(self) -> Optional[int]:
+        if self.estado != EstadoTrabajo.completado or not os.path.exists(self.ruta):
+            return None
+        return os.path.getsize(self.ruta)
+
+
+_trabajos: Dict[str, _Trabajo] = {}
+_lock = threading.Lock()
+_executor: Optional[Executor] = None
+
+
+def _inicializar_worker() -> None:
+    """
+    Descarta las conexiones heredadas del proceso padre: cada proceso del
+    pool abre las suyas contra la base de datos.
+    """
+    engine.dispose(close=False)
+
+
+def _get_executor() -> Executor:
+    """Crea el pool de trabajos la primera vez que se necesita."""
+    global _executor
+    if _executor is None:
+        if settings.EXPORT_JOB_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_JOB_WORKERS)
+        else:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS,
+                initializer=_inicializar_worker
+            )
+    return _executor
+
+
+def cerrar_trabajos() -> None:
+    """Detiene el pool de trabajos (se llama al apagar la aplicación)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _escribir_progreso(ruta_progreso: str, procesadas: int, total: int) -> None:
+    """Guarda el avance del trabajo en un archivo que lee el proceso de la API."""
+    temporal = f"{ruta_progreso}.tmp"
+    with open(temporal, "w") as archivo:
+        json.dump({"procesadas": procesadas, "total": total}, archivo)
+    os.replace(temporal, ruta_progreso)
+
+
+def _construir_consulta(tipo: TipoExportacion, filtros: dict):
+    """Construye la consulta del tipo pasando solo los filtros que acepta."""
+    constructor = CONSULTAS_TRABAJO[tipo]
+    aceptados = inspect.signature(constructor).parameters
+    return constructor(**{k: v for k, v in filtros.items() if k in aceptados})
+
+
+def _ejecutar_trabajo(tipo: str, formato: str, ruta: str, filtros: dict) -> None:
+    """
+    Genera el archivo de un trabajo. Se ejecuta dentro del pool, por lo que
+    solo recibe valores serializables y abre su propia sesión.
+    """
+    consulta = _construir_consulta(TipoExportacion(tipo), filtros)
+    ruta_progreso = f"{ruta}.progreso"
+    temporal = f"{ruta}.parcial"
+
+    with Session(engine) as db:
+        total = contar_filas(db, consulta)
+        _escribir_progreso(ruta_progreso, 0, total)
+        escribir_archivo(
+            db,
+            consulta,
+            FormatoExportacion(formato),
+            temporal,
+            progreso=lambda procesadas: _escribir_progreso(ruta_progreso, procesadas, total)
+        )
+
+    # Publicar el archivo solo cuando está completo
+    os.replace(temporal, ruta)
+    _escribir_progreso(ruta_progreso, total, total)
+
+
+def _finalizar_trabajo(trabajo: _Trabajo, future: Future) -> None:
+    """Actualiza el estado del trabajo cuando el pool termina."""
+    with _lock:
+        trabajo.finalizado = datetime.now(timezone.utc)
+        error = future.exception() if not future.cancelled() else None
+        if future.cancelled() or error is not None:
+            trabajo.estado = EstadoTrabajo.error
+            trabajo.error = str(error) if error else "Trabajo cancelado"
+            _eliminar_archivos(trabajo)
+        else:
+            trabajo.estado = EstadoTrabajo.completado
+
+
+def _eliminar_archivos(trabajo: _Trabajo) -> None:
+    """Borra el archivo generado y sus archivos auxiliares."""
+    for ruta in (trabajo.ruta, trabajo.ruta_progreso, f"{trabajo.ruta}.parcial"):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _limpiar_trabajos() -> None:
+    """
+    Elimina los trabajos terminados cuyo TTL venció y, si los archivos
+    completados superan el tamaño máximo, descarta los más antiguos.
+    """
+    ahora = datetime.now(timezone.utc)
+    with _lock:
+        terminados = sorted(
+            (t for t in _trabajos.values() if t.finalizado is not None),
+            key=lambda t: t.finalizado
+        )
+
+        vigentes = []
+        for trabajo in terminados:
+            if (ahora - trabajo.finalizado).total_seconds() > settings.EXPORT_JOB_TTL_SECONDS:
+                _eliminar_archivos(trabajo)
+                del _trabajos[trabajo.id]
+            else:
+                vigentes.append(trabajo)
+
+        total_bytes = sum(t.tamano_bytes or 0 for t in vigentes)
+        for trabajo in vigentes:
+            if total_bytes <= settings.EXPORT_JOB_MAX_BYTES:
+                break
+            total_bytes -= trabajo.tamano_bytes or 0
+            _eliminar_archivos(trabajo)
+            del _trabajos[trabajo.id]
+
+
+def _to_read(trabajo: _Trabajo) -> TrabajoExportacionRead:
+    """Construye la respuesta del trabajo leyendo su avance."""
+    procesadas, total = 0, None
+    estado = trabajo.estado
+    try:
+        with open(trabajo.ruta_progreso) as archivo:
+            avance = json.load(archivo)
+        procesadas, total = avance["procesadas"], avance["total"]
+        if estado == EstadoTrabajo.pendiente:
+            estado = EstadoTrabajo.en_proceso
+    except (FileNotFoundError, ValueError):
+        pass
+
+    progreso = None
+    if total is not None:
+        progreso = round(100 * procesadas / total, 1) if total else 100.0
+
+    return TrabajoExportacionRead(
+        id=trabajo.id,
+        tipo=trabajo.tipo,
+        formato=trabajo.formato,
+        estado=estado,
+        procesadas=procesadas,
+        total=total,
+        progreso=progreso,
+        tamano_bytes=trabajo.tamano_bytes,
+        error=trabajo.error,
+        creado=trabajo.creado,
+        finalizado=trabajo.finalizado
+    )
+
+
+def crear_trabajo_exportacion(
+    data: TrabajoExportacionCreate,
+    current_user: Usuario
+) -> TrabajoExportacionRead:
+    """
+    Registra un trabajo de exportación y lo envía al pool.
+    Los trabajos viven en memoria del proceso que los creó.
+    """
+    if data.tipo == TipoExportacion.usuarios and current_user.rol_id != 1:
+        raise HTTPException(status_code=403, detail="No tienes permisos suficientes")
+
+    _limpiar_trabajos()
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+
+    trabajo = _Trabajo(data.tipo, data.formato, current_user.id)
+    with _lock:
+        _trabajos[trabajo.id] = trabajo
+
+    future = _get_executor().submit(
+        _ejecutar_trabajo,
+        trabajo.tipo.value,
+        trabajo.formato.value,
+        trabajo.ruta,
+        data.filtros.model_dump(exclude_none=True)
+    )
+    future.add_done_callback(lambda f: _finalizar_trabajo(trabajo, f))
+
+    return _to_read(trabajo)
+
+
+def _get_trabajo(trabajo_id: str, current_user: Usuario) -> _Trabajo:
+    """Obtiene un trabajo visible para el usuario (su creador o un administrador)."""
+    _limpiar_trabajos()
+    trabajo = _trabajos.get(trabajo_id)
+    if not trabajo or (trabajo.usuario_id != current_user.id and current_user.rol_id != 1):
+        raise HTTPException(status_code=404, detail="Trabajo de exportación no encontrado")
+    return trabajo
+
+
+def get_trabajo_exportacion(trabajo_id: str, current_user: Usuario) -> TrabajoExportacionRead:
+    """Retorna el estado y avance de un trabajo de exportación."""
+    return _to_read(_get_trabajo(trabajo_id, current_user))
+
+
+def get_archivo_trabajo(trabajo_id: str, current_user: Usuario) -> _Trabajo:
+    """Retorna un trabajo completado cuyo archivo puede descargarse."""
+    trabajo = _get_trabajo(trabajo_id, current_user)
+    if trabajo.estado != EstadoTrabajo.completado:
+        raise HTTPException(status_code=409, detail="La exportación aún no está disponible")
+    return trabajo
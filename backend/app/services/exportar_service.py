@@ -1,39 +1,229 @@
+import csv
 import io
-from typing import List
+import json
+import os
+import queue
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, Iterator, List, NamedTuple, Optional
 from openpyxl import Workbook
 from sqlmodel import Session, select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Row, func, asc, desc
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
 
 from app.models.producto import Producto
 from app.models.usuario import Usuario
 from app.models.venta import Venta
-from app.models.cliente import Cliente
+from app.models.cliente import Cliente, TipoPersona
 from app.models.categoria import Categoria
 from app.models.inventario import Inventario
-from app.models.usuario import Usuario
-from app.models.movimiento_inventario import MovimientoInventario
+from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
 from app.models.detalle_venta import DetalleVenta
-
-from datetime import timedelta
-
-
-def _crear_excel(headers: List[str], rows: List[list]) -> io.BytesIO:
-    """Crea un archivo Excel con los datos proporcionados."""
-    output = io.BytesIO()
-    wb = Workbook()
-    ws = wb.active
-
-    ws.append(headers)
-    for row in rows:
-        ws.append(row)
-
-    wb.save(output)
+from app.services.cliente_service import build_cliente_filters, get_cliente_sort_column
+from app.services.categoria_service import build_categoria_filters, get_categoria_sort_column
+from app.services.producto_service import build_producto_filters, get_producto_sort_column
+from app.services.usuario_service import build_usuario_filters, get_usuario_sort_column
+from app.services.venta_service import build_venta_filters, get_venta_sort_column
+from app.services.inventario_service import (
+    build_inventario_filters,
+    get_inventario_sort_column,
+    build_movimiento_filters,
+    get_movimiento_sort_column
+)
+from app.core.config import settings
+from app.schemas.exportar import FormatoExportacion
+
+from datetime import date, timedelta
+
+
+class Consulta(NamedTuple):
+    """Define una exportación: encabezados, consulta proyectada y conversión de cada fila."""
+    headers: List[str]
+    statement: Select
+    fila: Callable[[Row], list]
+
+
+def _iterar_lotes(
+    db: Session,
+    consulta: Consulta,
+    progreso: Optional[Callable[[int], None]] = None
+) -> Iterator[List[list]]:
+    """
+    Recorre el resultado de la consulta por lotes (yield_per) sin cargar
+    toda la tabla en memoria ni construir entidades ORM.
+    Si se indica, `progreso` recibe el número de filas procesadas tras cada lote.
+    """
+    resultado = db.exec(
+        consulta.statement.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+    )
+    procesadas = 0
+    for particion in resultado.partitions():
+        yield [consulta.fila(row) for row in particion]
+        procesadas += len(particion)
+        if progreso:
+            progreso(procesadas)
+
+
+def contar_filas(db: Session, consulta: Consulta) -> int:
+    """Cuenta las filas que producirá la consulta de exportación."""
+    subquery = consulta.statement.order_by(None).subquery()
+    return db.exec(select(func.count()).select_from(subquery)).one()
+
+
+def _descartar_libro(wb: Workbook) -> None:
+    """
+    Cierra las hojas de un libro write-only que no se llegó a guardar y borra
+    los archivos temporales donde openpyxl iba escribiendo sus filas.
+    """
+    for ws in wb.worksheets:
+        if not ws.closed:
+            ws.close()
+        ws._writer.cleanup()
+
+
+def _escribir_excel(db: Session, consulta: Consulta, destino, progreso=None) -> None:
+    """Escribe el Excel en modo write-only sobre un archivo o ruta de destino."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    try:
+        ws.append(consulta.headers)
+        for lote in _iterar_lotes(db, consulta, progreso):
+            for row in lote:
+                ws.append(row)
+    except BaseException:
+        _descartar_libro(wb)
+        raise
+
+    wb.save(destino)
+
+
+def crear_excel(db: Session, consulta: Consulta):
+    """
+    Crea un archivo Excel en modo write-only respaldado por un archivo temporal.
+    Las filas se escriben a medida que llegan del cursor, por lo que la memoria
+    usada no depende del tamaño de la tabla.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+    try:
+        _escribir_excel(db, consulta, output)
+    except BaseException:
+        output.close()
+        raise
     output.seek(0)
     return output
 
 
-def exportar_inventario(db: Session):
-    """Exporta el inventario a un archivo Excel."""
+def generar_csv(db: Session, consulta: Consulta, progreso=None) -> Iterator[bytes]:
+    """
+    Genera un CSV codificado en UTF-8 por bloques: primero los encabezados y
+    luego un bloque por cada lote leído del cursor.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(consulta.headers)
+    yield buffer.getvalue().encode("utf-8")
+
+    for lote in _iterar_lotes(db, consulta, progreso):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(lote)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _json_default(valor):
+    """Serializa los tipos que json no soporta de forma nativa."""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+def generar_ndjson(db: Session, consulta: Consulta, progreso=None) -> Iterator[bytes]:
+    """
+    Genera NDJSON (un objeto JSON por línea, con los encabezados como claves)
+    por bloques, uno por cada lote leído del cursor.
+    """
+    for lote in _iterar_lotes(db, consulta, progreso):
+        lineas = [
+            json.dumps(
+                dict(zip(consulta.headers, row)),
+                ensure_ascii=False,
+                default=_json_default
+            )
+            for row in lote
+        ]
+        yield ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+def escribir_archivo(
+    db: Session,
+    consulta: Consulta,
+    formato: FormatoExportacion,
+    ruta: str,
+    progreso: Optional[Callable[[int], None]] = None
+) -> None:
+    """Escribe la exportación completa en disco en el formato indicado."""
+    if formato == FormatoExportacion.xlsx:
+        _escribir_excel(db, consulta, ruta, progreso)
+        return
+
+    generador = generar_csv if formato == FormatoExportacion.csv else generar_ndjson
+    with open(ruta, "wb") as archivo:
+        for bloque in generador(db, consulta, progreso):
+            archivo.write(bloque)
+
+
+def iterar_archivo(archivo, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Lee un archivo por bloques para una StreamingResponse y lo cierra al terminar."""
+    try:
+        while True:
+            bloque = archivo.read(chunk_size)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def _filtrar(
+    statement: Select,
+    id_col,
+    filtros: list,
+    sort_col=None,
+    sort_order: Optional[str] = "asc"
+) -> Select:
+    """
+    Aplica los filtros del listado y el orden solicitado. El id se agrega
+    siempre al final para que el orden sea estable al leer por lotes.
+    """
+    if filtros:
+        statement = statement.where(*filtros)
+    if sort_col is not None:
+        statement = statement.order_by(asc(sort_col) if sort_order == "asc" else desc(sort_col))
+    return statement.order_by(id_col)
+
+
+def _fecha_colombia(fecha) -> str:
+    """Resta 5 horas para convertir UTC a hora de Colombia."""
+    return (fecha - timedelta(hours=5)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# -------------------------------
+# Consultas de exportación
+# -------------------------------
+
+def consulta_inventario(
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas del inventario con su producto y categoría, con los filtros del listado."""
     headers = [
         "ID", 
         "Código_producto", 
@@ -45,319 +235,568 @@ def exportar_inventario(db: Session):
         "Categoria",
         "Estado"
         ]
-    rows = []
-
-    inventarios = db.exec(
-        select(Inventario)
-        .options(
-            selectinload(Inventario.producto)
-            .selectinload(Producto.categoria)
-            )
-        ).all()
-    for inventario in inventarios:
-        rows.append(
-            [
-                inventario.id,
-                inventario.producto.codigo, 
-                inventario.producto.nombre,
-                inventario.producto.unidad_medida.value, 
-                inventario.cantidad,
-                inventario.cantidad_minima,
-                inventario.producto.precio_unitario,
-                inventario.producto.categoria.nombre,
-                inventario.estado
-                ]
-            )
+    statement = (
+        select(
+            Inventario.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            Inventario.cantidad_total,
+            Inventario.cantidad_minima,
+            Producto.precio_unitario,
+            Categoria.nombre,
+            Inventario.estado
+        )
+        .join(Producto, Inventario.producto_id == Producto.id)
+        .join(Categoria, Producto.categoria_id == Categoria.id)
+    )
+    statement = _filtrar(
+        statement,
+        Inventario.id,
+        build_inventario_filters(search, estado),
+        get_inventario_sort_column(sort_by),
+        sort_order
+    )
+
+    def fila(r: Row) -> list:
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5], r[6], r[7], r[8]]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_ventas(
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de las ventas con cliente y vendedor, con los filtros del listado."""
+    headers = ["ID", "Identificación_cliente", "Cliente", "Vendedor", "Fecha", "Total", "Estado"]
+    statement = (
+        select(
+            Venta.id,
+            Cliente.identificacion,
+            Cliente.nombre,
+            Usuario.nombre,
+            Venta.fecha,
+            Venta.total,
+            Venta.estado
+        )
+        .join(Cliente, Venta.cliente_id == Cliente.id)
+        .join(Usuario, Venta.usuario_id == Usuario.id)
+    )
+    statement = _filtrar(
+        statement,
+        Venta.id,
+        build_venta_filters(search, estado, fecha_desde, fecha_hasta),
+        get_venta_sort_column(sort_by),
+        sort_order
+    )
+
+    def fila(r: Row) -> list:
+        return [r[0], r[1], r[2], r[3], _fecha_colombia(r[4]), round(r[5], 2), r[6]]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_ventas_por_cliente(
+    cliente_id: int,
+    estado: Optional[bool] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None
+) -> Consulta:
+    """Columnas de las ventas de un cliente específico, con filtro por estado y fechas."""
+    headers = ["ID", "Identificación_cliente", "Cliente", "Estado_cliente","Vendedor", "Fecha", "Total", "Estado_venta"]
+    statement = (
+        select(
+            Venta.id,
+            Cliente.identificacion,
+            Cliente.nombre,
+            Cliente.estado,
+            Usuario.nombre,
+            Venta.fecha,
+            Venta.total,
+            Venta.estado
+        )
+        .join(Cliente, Venta.cliente_id == Cliente.id)
+        .join(Usuario, Venta.usuario_id == Usuario.id)
+        .where(Venta.cliente_id == cliente_id)
+    )
+    statement = _filtrar(
+        statement,
+        Venta.id,
+        build_venta_filters(estado=estado, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    )
+
+    def fila(r: Row) -> list:
+        return [r[0], r[1], r[2], r[3], r[4], r[5].strftime("%Y-%m-%d %H:%M:%S"), round(r[6], 2), r[7]]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_clientes(
+    search: Optional[str] = None,
+    tipo_persona: Optional[TipoPersona] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de los clientes, con los filtros del listado."""
+    headers = ["ID", "Identificación", "Nombre", "Tipo", "Email", "Teléfono", "Estado"]
+    statement = (
+        select(
+            Cliente.id,
+            Cliente.identificacion,
+            Cliente.nombre,
+            Cliente.tipo_persona,
+            Cliente.email,
+            Cliente.telefono,
+            Cliente.estado
+        )
+    )
+    statement = _filtrar(
+        statement,
+        Cliente.id,
+        build_cliente_filters(search, tipo_persona, estado),
+        get_cliente_sort_column(sort_by),
+        sort_order
+    )
+
+    def fila(r: Row) -> list:
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5], r[6]]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_categorias(
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de las categorías, con los filtros del listado."""
+    headers = ["ID", "Nombre", "Descripción", "Estado"]
+    statement = (
+        select(
+            Categoria.id,
+            Categoria.nombre,
+            Categoria.descripcion,
+            Categoria.estado
+        )
+    )
+    statement = _filtrar(
+        statement,
+        Categoria.id,
+        build_categoria_filters(search, estado),
+        get_categoria_sort_column(sort_by),
+        sort_order
+    )
+
+    def fila(r: Row) -> list:
+        return list(r)
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_productos(
+    search: Optional[str] = None,
+    categoria: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de los productos con su categoría, con los filtros del listado."""
+    headers = ["ID", "Código", "Nombre", "Unidad_medida", "Descripción", "Precio Unitario", "Categoria", "Estado"]
+    statement = (
+        select(
+            Producto.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            Producto.descripcion,
+            Producto.precio_unitario,
+            Categoria.nombre,
+            Producto.estado
+        )
+        .join(Categoria, Producto.categoria_id == Categoria.id)
+    )
+    statement = _filtrar(
+        statement,
+        Producto.id,
+        build_producto_filters(search, estado, categoria),
+        get_producto_sort_column(sort_by),
+        sort_order
+    )
+
+    def fila(r: Row) -> list:
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5], r[6], r[7]]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_usuarios(
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de los usuarios, con los filtros del listado."""
+    headers = ["ID", "Nombre", "Email", "Rol", "Estado"]
+    statement = (
+        select(
+            Usuario.id,
+            Usuario.nombre,
+            Usuario.email,
+            Usuario.rol_id,
+            Usuario.estado
+        )
+    )
+    statement = _filtrar(
+        statement,
+        Usuario.id,
+        build_usuario_filters(search, estado),
+        get_usuario_sort_column(sort_by),
+        sort_order
+    )
 
-    return _crear_excel(headers, rows)
+    def fila(r: Row) -> list:
+        rol_str = "Admin" if r[3] == 1 else "No-admin"
+        return [r[0], r[1], r[2], rol_str, r[4]]
 
+    return Consulta(headers, statement, fila)
 
-def exportar_ventas(db: Session):
-    """Exporta las ventas a un archivo Excel."""
-    headers = ["ID", "Identificación_cliente", "Cliente", "Vendedor", "Fecha", "Total", "Estado"]
-    rows = []
 
-    ventas = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario)
-            )
-        ).all()
-    
-    for venta in ventas:
-        # Restar 5 horas para convertir UTC a hora de Colombia
-        fecha_colombia = venta.fecha - timedelta(hours=5)
-        
-        rows.append(
-            [
-                venta.id,
-                venta.cliente.identificacion, 
-                venta.cliente.nombre, 
-                venta.usuario.nombre, 
-                fecha_colombia.strftime("%Y-%m-%d %H:%M:%S"), 
-                round(venta.total, 2),
-                venta.estado
-            ]
+def _consulta_movimientos(*filtros) -> Consulta:
+    """Columnas de movimientos por producto o por usuario."""
+    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Tipo Movimiento", "Cantidad", "Inventario_resultante", "Empleado", "Venta_id", "Fecha"]
+    statement = (
+        select(
+            MovimientoInventario.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            Producto.estado,
+            MovimientoInventario.tipo,
+            MovimientoInventario.cantidad,
+            MovimientoInventario.cantidad_inventario,
+            Usuario.nombre,
+            MovimientoInventario.venta_id,
+            MovimientoInventario.fecha
+        )
+        .join(Producto, MovimientoInventario.producto_id == Producto.id)
+        .join(Usuario, MovimientoInventario.usuario_id == Usuario.id)
+    )
+    statement = _filtrar(statement, MovimientoInventario.id, list(filtros))
+
+    def fila(r: Row) -> list:
+        venta_id = r[9] if r[9] else "N/A"
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5].value, r[6], r[7], r[8], venta_id, _fecha_colombia(r[10])]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_movimientos_por_producto(
+    producto_id: int,
+    tipo: Optional[TipoMovimientoEnum] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None
+) -> Consulta:
+    """Columnas de los movimientos de un producto específico, con filtro por tipo y fechas."""
+    return _consulta_movimientos(
+        MovimientoInventario.producto_id == producto_id,
+        *build_movimiento_filters(tipo, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    )
+
+
+def consulta_movimientos_por_usuario(
+    usuario_id: int,
+    tipo: Optional[TipoMovimientoEnum] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None
+) -> Consulta:
+    """Columnas de los movimientos de un usuario específico, con filtro por tipo y fechas."""
+    return _consulta_movimientos(
+        MovimientoInventario.usuario_id == usuario_id,
+        *build_movimiento_filters(tipo, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    )
+
+
+def consulta_detalle_venta_por_venta_id(venta_id: int) -> Consulta:
+    """Columnas del detalle de una venta específica."""
+    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Cantidad", "Precio Unitario", "Subtotal"]
+    statement = (
+        select(
+            DetalleVenta.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            Producto.estado,
+            DetalleVenta.cantidad,
+            DetalleVenta.precio_unitario
+        )
+        .join(Producto, DetalleVenta.producto_id == Producto.id)
+        .where(DetalleVenta.venta_id == venta_id)
+        .order_by(DetalleVenta.id)
+    )
+
+    def fila(r: Row) -> list:
+        subtotal = r[5] * r[6]
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5], r[6], round(subtotal, 2)]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_detalles_venta() -> Consulta:
+    """Columnas de los detalles de todas las ventas."""
+    headers = ["ID", "Venta_id", "Código_producto", "Producto", "Unidad_medida", "Cantidad", "Precio Unitario", "Subtotal"]
+    statement = (
+        select(
+            DetalleVenta.id,
+            DetalleVenta.venta_id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            DetalleVenta.cantidad,
+            DetalleVenta.precio_unitario
         )
+        .join(Producto, DetalleVenta.producto_id == Producto.id)
+        .order_by(DetalleVenta.id)
+    )
+
+    def fila(r: Row) -> list:
+        subtotal = r[5] * r[6]
+        return [r[0], r[1], r[2], r[3], r[4].value, r[5], r[6], round(subtotal, 2)]
+
+    return Consulta(headers, statement, fila)
+
+
+def consulta_movimientos_inventario(
+    tipo: Optional[TipoMovimientoEnum] = None,
+    search: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc"
+) -> Consulta:
+    """Columnas de los movimientos de inventario, con los filtros del listado."""
+    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Tipo Movimiento", "Vendedor", "Venta_id", "Cantidad", "Inventario_resultante", "Fecha"]
+    statement = (
+        select(
+            MovimientoInventario.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.unidad_medida,
+            Producto.estado,
+            MovimientoInventario.tipo,
+            Usuario.nombre,
+            MovimientoInventario.venta_id,
+            MovimientoInventario.cantidad,
+            MovimientoInventario.cantidad_inventario,
+            MovimientoInventario.fecha
+        )
+        .join(Producto, MovimientoInventario.producto_id == Producto.id)
+        .join(Usuario, MovimientoInventario.usuario_id == Usuario.id)
+    )
+    statement = _filtrar(
+        statement,
+        MovimientoInventario.id,
+        build_movimiento_filters(tipo, search, fecha_desde, fecha_hasta),
+        get_movimiento_sort_column(sort_by),
+        sort_order
+    )
 
-    return _crear_excel(headers, rows)
+    def fila(r: Row) -> list:
+        venta_id = r[7] if r[7] else "N/A"
+        return [r[0], r[1], r[2], r[3].value, r[4], r[5].value, r[6], venta_id, r[8], r[9], _fecha_colombia(r[10])]
 
+    return Consulta(headers, statement, fila)
 
-def exportar_ventas_por_cliente(db: Session, cliente_id: int):
-    """Exporta las ventas de un cliente específico a un archivo Excel."""
-    headers = ["ID", "Identificación_cliente", "Cliente", "Estado_cliente","Vendedor", "Fecha", "Total", "Estado_venta"]
-    rows = []
 
-    ventas = db.exec(
-        select(Venta)
-        .where(Venta.cliente_id == cliente_id)
-        .options(
-            selectinload(Venta.usuario),
-            selectinload(Venta.cliente)
-            )
-        ).all()
-
-    for venta in ventas:
-        rows.append(
-            [
-                venta.id, 
-                venta.cliente.identificacion,
-                venta.cliente.nombre,
-                venta.cliente.estado,
-                venta.usuario.nombre, 
-                venta.fecha.strftime("%Y-%m-%d %H:%M:%S"), 
-                round(venta.total, 2),
-                venta.estado
-                ]
-            )
+# -------------------------------
+# Exportaciones a Excel
+# -------------------------------
 
-    return _crear_excel(headers, rows)
+def exportar_inventario(db: Session):
+    """Exporta el inventario a un archivo Excel."""
+    return crear_excel(db, consulta_inventario())
+
+
+def exportar_ventas(db: Session):
+    """Exporta las ventas a un archivo Excel."""
+    return crear_excel(db, consulta_ventas())
+
+
+def exportar_ventas_por_cliente(db: Session, cliente_id: int):
+    """Exporta las ventas de un cliente específico a un archivo Excel."""
+    return crear_excel(db, consulta_ventas_por_cliente(cliente_id))
 
 
 def exportar_clientes(db: Session):
     """Exporta los clientes a un archivo Excel."""
-    headers = ["ID", "Identificación", "Nombre", "Tipo", "Email", "Teléfono", "Estado"]
-    rows = []
-
-    clientes = db.exec(select(Cliente)).all()
-    for cliente in clientes:
-        rows.append(
-            [
-                cliente.id,
-                cliente.identificacion,
-                cliente.nombre, 
-                cliente.tipo_persona.value, 
-                cliente.email, 
-                cliente.telefono,
-                cliente.estado
-                ]
-            )
-
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_clientes())
 
 
 def exportar_categorias(db: Session):
     """Exporta las categorias a un archivo Excel."""
-    headers = ["ID", "Nombre", "Descripción", "Estado"]
-    rows = []
-
-    categorias = db.exec(select(Categoria)).all()
-    for categoria in categorias:
-        rows.append(
-            [
-                categoria.id,
-                categoria.nombre, 
-                categoria.descripcion,
-                categoria.estado
-                ]
-            )
-
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_categorias())
 
 
 def exportar_productos(db: Session):
     """Exporta los productos a un archivo Excel."""
-    headers = ["ID", "Código", "Nombre", "Unidad_medida", "Descripción", "Precio Unitario", "Categoria", "Estado"]
-    rows = []
-
-    productos = db.exec(
-        select(Producto)
-        .options(
-            selectinload(Producto.categoria)
-            )
-        ).all()
-    for producto in productos:
-        rows.append(
-            [
-                producto.id, 
-                producto.codigo, 
-                producto.nombre, 
-                producto.unidad_medida.value,
-                producto.descripcion, 
-                producto.precio_unitario, 
-                producto.categoria.nombre,
-                producto.estado
-                ]
-            )
-
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_productos())
 
 
 def exportar_usuarios(db: Session):
     """Exporta los usuarios a un archivo Excel."""
-    headers = ["ID", "Nombre", "Email", "Rol", "Estado"]
-    rows = []
-
-    usuarios = db.exec(select(Usuario)).all()
-    for usuario in usuarios:
-        rol_str = "Admin" if usuario.rol_id == 1 else "No-admin"
-        rows.append(
-            [
-                usuario.id,
-                usuario.nombre, 
-                usuario.email, 
-                rol_str,
-                usuario.estado
-                ]
-            )
-
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_usuarios())
 
 
 def exportar_movimientos_por_producto(db: Session, producto_id: int):
     """Exporta los movimientos de un producto específico a un archivo Excel."""
-    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Tipo Movimiento", "Cantidad", "Inventario_resultante", "Empleado", "Venta_id", "Fecha"]
-    rows = []
-    movimientos = db.exec(
-        select(MovimientoInventario)
-        .where(MovimientoInventario.producto_id == producto_id)
-        .options(selectinload(MovimientoInventario.producto),
-                 selectinload(MovimientoInventario.usuario)
-                 )
-        ).all()
-
-    for movimiento in movimientos:
-        # Restar 5 horas para convertir UTC a hora de Colombia
-        fecha_colombia = movimiento.fecha - timedelta(hours=5)
-        venta_id = movimiento.venta_id if movimiento.venta_id else "N/A"
-        rows.append(
-            [
-                movimiento.id, 
-                movimiento.producto.codigo,
-                movimiento.producto.nombre, 
-                movimiento.producto.unidad_medida.value,
-                movimiento.producto.estado,
-                movimiento.tipo.value,
-                movimiento.cantidad,
-                movimiento.cantidad_inventario,
-                movimiento.usuario.nombre,
-                venta_id, 
-                fecha_colombia.strftime("%Y-%m-%d %H:%M:%S")
-                ]
-            )
-    
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_movimientos_por_producto(producto_id))
 
 
 def exportar_movimientos_por_usuario(db: Session, usuario_id: int):
     """Exporta los movimientos de un usuario específico a un archivo Excel."""
-    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Tipo Movimiento", "Cantidad", "Inventario_resultante", "Empleado", "Venta_id", "Fecha"]
-    rows = []
-    movimientos = db.exec(
-        select(MovimientoInventario)
-        .where(MovimientoInventario.usuario_id == usuario_id)
-        .options(selectinload(MovimientoInventario.producto),
-                 selectinload(MovimientoInventario.usuario)
-                 )
-        ).all()
-
-    for movimiento in movimientos:
-        # Restar 5 horas para convertir UTC a hora de Colombia
-        fecha_colombia = movimiento.fecha - timedelta(hours=5)
-        venta_id = movimiento.venta_id if movimiento.venta_id else "N/A"
-        rows.append(
-            [
-                movimiento.id, 
-                movimiento.producto.codigo,
-                movimiento.producto.nombre, 
-                movimiento.producto.unidad_medida.value,
-                movimiento.producto.estado,
-                movimiento.tipo.value,
-                movimiento.cantidad,
-                movimiento.cantidad_inventario,
-                movimiento.usuario.nombre,
-                venta_id, 
-                fecha_colombia.strftime("%Y-%m-%d %H:%M:%S")
-                ]
-            )
-    
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_movimientos_por_usuario(usuario_id))
 
 
 def exportar_detalle_venta_por_venta_id(db: Session, venta_id: int):
     """Exporta el detalle de una venta específica a un archivo Excel."""
-    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Cantidad", "Precio Unitario", "Subtotal"]
-    rows = []
-
-    detalles = db.exec(
-        select(DetalleVenta)
-        .where(DetalleVenta.venta_id == venta_id)
-        .options(selectinload(DetalleVenta.producto)
-                 )
-        ).all()
-    if detalles:
-        for detalle in detalles:
-            subtotal = detalle.cantidad * detalle.precio_unitario
-            rows.append(
-                [
-                    detalle.id,
-                    detalle.producto.codigo, 
-                    detalle.producto.nombre, 
-                    detalle.producto.unidad_medida.value,
-                    detalle.producto.estado,
-                    detalle.cantidad, 
-                    detalle.precio_unitario, 
-                    round(subtotal, 2)
-                    ]
-                )
-
-    return _crear_excel(headers, rows)
+    return crear_excel(db, consulta_detalle_venta_por_venta_id(venta_id))
 
 
 def exportar_movimientos_inventario(db: Session):
     """Exporta todos los movimientos de inventario a un archivo Excel."""
-    headers = ["ID", "Código_producto", "Producto", "Unidad_medida", "Estado_producto", "Tipo Movimiento", "Vendedor", "Venta_id", "Cantidad", "Inventario_resultante", "Fecha"]
-    rows = []
-
-    movimientos = db.exec(
-        select(MovimientoInventario)
-        .options(
-            selectinload(MovimientoInventario.producto),
-            selectinload(MovimientoInventario.usuario)
-            )
-        ).all()
-
-    for movimiento in movimientos:
-        # Restar 5 horas para convertir UTC a hora de Colombia
-        fecha_colombia = movimiento.fecha - timedelta(hours=5)
-        
-        venta_id = movimiento.venta_id if movimiento.venta_id else "N/A"
-        rows.append(
-            [
-                movimiento.id,
-                movimiento.producto.codigo, 
-                movimiento.producto.nombre, 
-                movimiento.producto.unidad_medida.value,
-                movimiento.producto.estado,
-                movimiento.tipo.value,
-                movimiento.usuario.nombre,
-                venta_id, 
-                movimiento.cantidad,
-                movimiento.cantidad_inventario,
-                fecha_colombia.strftime("%Y-%m-%d %H:%M:%S")
-                ]
-            )
-
-    return _crear_excel(headers, rows)
- 
\ No newline at end of file
+    return crear_excel(db, consulta_movimientos_inventario())
+
+
+
+# -------------------------------
+# Respaldo completo
+# -------------------------------
+
+HOJAS_RESPALDO = [
+    ("Inventario", consulta_inventario),
+    ("Productos", consulta_productos),
+    ("Categorias", consulta_categorias),
+    ("Clientes", consulta_clientes),
+    ("Ventas", consulta_ventas),
+    ("Detalles_venta", consulta_detalles_venta),
+    ("Movimientos_inventario", consulta_movimientos_inventario),
+    ("Usuarios", consulta_usuarios),
+]
+
+_FIN = object()
+
+
+def _leer_en_cola(bind: Engine, indice: int, consulta: Consulta, cola: queue.Queue, cancelado: threading.Event) -> None:
+    """
+    Lee una consulta con su propia sesión (y conexión del pool) y entrega
+    sus lotes a la cola. Se detiene si el escritor canceló el respaldo.
+    """
+    def entregar(item) -> bool:
+        while not cancelado.is_set():
+            try:
+                cola.put((indice, item), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        with Session(bind) as db:
+            for lote in _iterar_lotes(db, consulta):
+                if not entregar(lote):
+                    return
+    except Exception as e:
+        entregar(e)
+        return
+    entregar(_FIN)
+
+
+def _escribir_respaldo_excel(bind: Engine, destino) -> None:
+    """
+    Escribe un libro con una hoja por entidad. Las consultas se leen en
+    paralelo y un solo hilo escribe el libro, que no es seguro entre hilos.
+    """
+    wb = Workbook(write_only=True)
+    consultas = [constructor() for _, constructor in HOJAS_RESPALDO]
+    hojas = []
+    for (nombre, _), consulta in zip(HOJAS_RESPALDO, consultas):
+        ws = wb.create_sheet(title=nombre)
+        ws.append(consulta.headers)
+        hojas.append(ws)
+
+    # Cola acotada: si el escritor se atrasa, los lectores esperan
+    cola = queue.Queue(maxsize=settings.EXPORT_COMPLETO_WORKERS * 2)
+    cancelado = threading.Event()
+
+    try:
+        with ThreadPoolExecutor(max_workers=settings.EXPORT_COMPLETO_WORKERS) as executor:
+            for indice, consulta in enumerate(consultas):
+                executor.submit(_leer_en_cola, bind, indice, consulta, cola, cancelado)
+
+            try:
+                pendientes = len(consultas)
+                while pendientes:
+                    indice, item = cola.get()
+                    if item is _FIN:
+                        pendientes -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        for row in item:
+                            hojas[indice].append(row)
+            finally:
+                cancelado.set()
+    except BaseException:
+        _descartar_libro(wb)
+        raise
+
+    wb.save(destino)
+
+
+def _escribir_respaldo_zip(bind: Engine, formato: FormatoExportacion, destino) -> None:
+    """
+    Escribe un zip con un archivo por entidad. Cada archivo se genera en
+    paralelo en un directorio temporal y luego se agrega al zip.
+    """
+    def generar(nombre: str, consulta: Consulta, directorio: str) -> str:
+        ruta = os.path.join(directorio, f"{nombre}.{formato.value}")
+        with Session(bind) as db:
+            escribir_archivo(db, consulta, formato, ruta)
+        return ruta
+
+    with tempfile.TemporaryDirectory() as directorio:
+        with ThreadPoolExecutor(max_workers=settings.EXPORT_COMPLETO_WORKERS) as executor:
+            futuros = [
+                executor.submit(generar, nombre, constructor(), directorio)
+                for nombre, constructor in HOJAS_RESPALDO
+            ]
+            rutas = [futuro.result() for futuro in futuros]
+
+        with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+            for ruta in rutas:
+                archivo_zip.write(ruta, arcname=os.path.basename(ruta))
+
+
+def crear_respaldo(bind: Engine, formato: FormatoExportacion = FormatoExportacion.xlsx):
+    """
+    Genera el respaldo completo del sistema: un libro con una hoja por
+    entidad (xlsx) o un zip con un archivo por entidad (csv/ndjson).
+    Las consultas corren en paralelo, cada una con su propia conexión.
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        if formato == FormatoExportacion.xlsx:
+            _escribir_respaldo_excel(bind, output)
+        else:
+            _escribir_respaldo_zip(bind, formato, output)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
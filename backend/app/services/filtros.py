@@ -0,0 +1,22 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from app.core.config import COL_TZ
+
+
+def _inicio_dia_utc(fecha: date) -> datetime:
+    """Inicio del día en hora de Colombia expresado en UTC sin zona (como se almacena)."""
+    return datetime.combine(fecha, time.min, tzinfo=COL_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def build_fecha_filters(columna, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None) -> list:
+    """
+    Filtros por rango de fechas sobre una columna guardada en UTC.
+    Los días se interpretan en hora de Colombia y ambos extremos son inclusivos.
+    """
+    filters = []
+    if fecha_desde:
+        filters.append(columna >= _inicio_dia_utc(fecha_desde))
+    if fecha_hasta:
+        filters.append(columna < _inicio_dia_utc(fecha_hasta + timedelta(days=1)))
+    return filters
@@ -4,6 +4,8 @@ from typing import List, Optional
 from sqlalchemy.orm import selectinload
 
 from app.models.inventario import Inventario
+from app.models.inventario_franja import InventarioFranja
+from app.models.version_tabla import incrementar_versiones
 from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
 from app.models.producto import Producto
 from app.models.usuario import Usuario
@@ -12,26 +14,32 @@ from app.schemas.movimiento_inventario import (
     MovimientoInventarioCreate, 
     MovimientoInventarioDetailRead
 )
-from app.schemas.shared import PagedResponse
+from app.schemas.shared import EstrategiaTotal, PagedResponse
 from app.core.config import settings
-from app.schemas.inventario import InventarioCantidadCreate, InventarioReadDetail, InventarioRead, InventarioCantidadUpdate
+from app.services.filtros import build_fecha_filters
+from app.services.paginacion import paginar, paginar_por_cursor, respuesta_paginada
+from app.services.stock import descontar_stock, sumar_stock, fijar_stock, repartir_stock, registrar_franjas
+from app.services.transaccion import transaccional
+from app.schemas.inventario import (
+    InventarioCantidadCreate,
+    InventarioReadDetail,
+    InventarioRead,
+    InventarioCantidadUpdate,
+    InventarioFranjasUpdate
+)
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from fastapi import HTTPException
 
 
-
-def get_inventarios(
-    db: Session,
-    page: int = 1,
-    page_size: int = 10,
+def build_inventario_filters(
     search: Optional[str] = None,
-    estado: Optional[bool] = None,
-    sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
-) -> PagedResponse[InventarioRead]:
-    """Obtiene inventarios con productos asociados, con búsqueda, filtros, paginación y ordenamiento dinámico."""
-
+    estado: Optional[bool] = None
+) -> list:
+    """
+    Filtros del listado de inventarios, compartidos con la exportación.
+    La búsqueda requiere el join con Producto.
+    """
     filters = []
     if search:
         filters.append(
@@ -44,14 +52,97 @@ def get_inventarios(
     if estado is not None:
         filters.append(Inventario.estado == estado)
 
-    # --- Conteo total ---
-    count_stmt = select(func.count(Inventario.id)).join(Inventario.producto)
-    if filters:
-        count_stmt = count_stmt.where(*filters)
+    return filters
+
+
+def get_inventario_sort_column(sort_by: Optional[str]):
+    """Columna de ordenamiento de inventarios (propia o del producto), o None si no aplica."""
+    if not sort_by:
+        return None
+    # La cantidad se ordena por el total, incluidas las franjas
+    if sort_by == "cantidad":
+        return Inventario.cantidad_total
+    # Verificamos si el campo existe en Inventario o Producto
+    if hasattr(Inventario, sort_by):
+        return getattr(Inventario, sort_by)
+    if hasattr(Producto, sort_by):
+        return getattr(Producto, sort_by)
+    return None
+
+
+def build_movimiento_filters(
+    tipo: Optional[TipoMovimientoEnum] = None,
+    search: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None
+) -> list:
+    """
+    Filtros de los movimientos de inventario, compartidos con la exportación.
+    La búsqueda requiere los joins con Usuario y Producto.
+    """
+    filters = []
+
+    # --- Filtro por tipo de movimiento ---
+    if tipo:
+        filters.append(MovimientoInventario.tipo == tipo)
+
+    # --- Filtro de búsqueda ---
+    if search:
+        filters.append(
+            or_(
+                Usuario.nombre.ilike(f"%{search}%"),     
+                Producto.nombre.ilike(f"%{search}%"),     
+                Producto.codigo.ilike(f"%{search}%"),
+                MovimientoInventario.id.ilike(f"%{search}%")
+            )
+        )
+
+    filters.extend(build_fecha_filters(MovimientoInventario.fecha, fecha_desde, fecha_hasta))
+
+    return filters
+
 
-    total = db.exec(count_stmt).one()
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+def get_movimiento_sort_column(sort_by: Optional[str]):
+    """
+    Columna de ordenamiento de movimientos según sort_by, o None si no aplica.
+    usuario_nombre y producto_nombre requieren el join correspondiente.
+    """
+    if not sort_by:
+        return None
+    if hasattr(MovimientoInventario, sort_by):
+        return getattr(MovimientoInventario, sort_by)
+    if sort_by == "usuario_nombre":
+        return Usuario.nombre
+    if sort_by == "producto_nombre":
+        return Producto.nombre
+    return None
+
+
+def get_movimiento_sort_value(movimiento: MovimientoInventario, sort_by: Optional[str]):
+    """Valor de la columna de ordenamiento para un movimiento ya cargado (para el cursor)."""
+    if sort_by == "usuario_nombre":
+        return movimiento.usuario.nombre
+    if sort_by == "producto_nombre":
+        return movimiento.producto.nombre
+    if sort_by and hasattr(MovimientoInventario, sort_by):
+        return getattr(movimiento, sort_by)
+    return movimiento.fecha
+
+
+
+def get_inventarios(
+    db: Session,
+    page: int = 1,
+    page_size: int = 10,
+    search: Optional[str] = None,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
+) -> PagedResponse[InventarioRead]:
+    """Obtiene inventarios con productos asociados, con búsqueda, filtros, paginación y ordenamiento dinámico."""
+
+    filters = build_inventario_filters(search, estado)
 
     # --- Listado ---
     statement = select(Inventario).join(Inventario.producto).options(
@@ -61,14 +152,7 @@ def get_inventarios(
         statement = statement.where(*filters)
 
     # Ordenamiento dinámico
-    col = None
-    if sort_by:
-        # Verificamos si el campo existe en Inventario o Producto
-        if hasattr(Inventario, sort_by):
-            col = getattr(Inventario, sort_by)
-        elif hasattr(Producto, sort_by):
-            col = getattr(Producto, sort_by)
-
+    col = get_inventario_sort_column(sort_by)
     if col is not None:
         statement = statement.order_by(
             asc(col) if sort_order == "asc" else desc(col)
@@ -77,18 +161,10 @@ def get_inventarios(
         # Orden por defecto: nombre del producto
         statement = statement.order_by(asc(Producto.nombre))
 
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
-
-    items = db.exec(statement).all()
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=items
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def get_inventario_by_product_id(db: Session, producto_id: int) -> InventarioReadDetail:
@@ -103,6 +179,7 @@ def get_inventario_by_product_id(db: Session, producto_id: int) -> InventarioRea
     return db.exec(statement).first()
 
 
+@transaccional
 def register_inventario(db: Session, data: InventarioCantidadCreate) -> InventarioReadDetail:
     """Registrar un nuevo inventario."""
     producto_id = data.producto_id
@@ -133,11 +210,12 @@ def register_inventario(db: Session, data: InventarioCantidadCreate) -> Inventar
     
 
     db.add(nuevo)
+    incrementar_versiones(db, "inventario", "producto")
     db.commit()
-    db.refresh(nuevo)
     return nuevo
 
 
+@transaccional
 def register_entrada(
     db: Session,
     data: MovimientoInventarioCreate,
@@ -154,12 +232,12 @@ def register_entrada(
     if not inventario.estado:
         raise HTTPException(status_code=400, detail="El producto está inactivo")
 
-    inventario.cantidad += cantidad
+    cantidad_inventario = sumar_stock(db, producto_id, cantidad)
 
     movimiento = MovimientoInventario(
         tipo=TipoMovimientoEnum.ENTRADA,
         cantidad=cantidad,
-        cantidad_inventario=inventario.cantidad,
+        cantidad_inventario=cantidad_inventario,
         producto_id=producto_id,
         usuario_id=current_user.id, 
         fecha=datetime.now(timezone.utc)
@@ -167,12 +245,11 @@ def register_entrada(
 
     db.add(movimiento)
     db.commit()
-    db.refresh(inventario)
-    db.refresh(movimiento)
     
     return movimiento
 
 
+@transaccional
 def register_salida(
     db: Session,
     data: MovimientoInventarioCreate,
@@ -189,25 +266,22 @@ def register_salida(
     if not inventario.estado:
         raise HTTPException(status_code=400, detail="El producto está inactivo")
 
-    if inventario.cantidad < cantidad:
+    # Descontar solo si alcanza, sin leer y reescribir la cantidad
+    cantidad_inventario = descontar_stock(db, producto_id, cantidad)
+    if cantidad_inventario is None:
         raise HTTPException(status_code=400, detail="Stock insuficiente")
-    
-
-    inventario.cantidad -= cantidad
 
     movimiento = MovimientoInventario(
         producto_id=producto_id,
         tipo=TipoMovimientoEnum.SALIDA,
         cantidad=cantidad,
-        cantidad_inventario=inventario.cantidad,
+        cantidad_inventario=cantidad_inventario,
         usuario_id=current_user.id, 
         fecha=datetime.now(timezone.utc)
     )
 
     db.add(movimiento)
     db.commit()
-    db.refresh(inventario)
-    db.refresh(movimiento)
     return movimiento
 
 
@@ -216,38 +290,41 @@ def get_historial_movimientos_by_producto(
     producto_id: int,
     page: int = 1,
     page_size: int = 10,
-    tipo: Optional[TipoMovimientoEnum] = None
+    tipo: Optional[TipoMovimientoEnum] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estrategia_total: EstrategiaTotal = EstrategiaTotal.exacto
 ) -> PagedResponse[MovimientoInventarioDetailRead]:
-    """Obtener historial paginado de movimientos de inventario por producto con filtro opcional por tipo."""
-
-    offset = (page - 1) * page_size
+    """
+    Obtener historial paginado de movimientos de inventario por producto con filtro opcional por tipo y fechas.
+    Con `cursor` (el next_cursor de la respuesta anterior) se pagina por (fecha, id) en lugar de OFFSET.
+    El total es exacto salvo que se pida otra `estrategia_total` (ver EstrategiaTotal).
+    """
 
-    # Base query
+    # Base query con filtro opcional por tipo de movimiento y fechas
     statement = select(MovimientoInventario).where(
-        MovimientoInventario.producto_id == producto_id
+        MovimientoInventario.producto_id == producto_id,
+        *build_movimiento_filters(tipo, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
     )
 
-    # Filtro por tipo de movimiento
-    if tipo:
-        statement = statement.where(MovimientoInventario.tipo == tipo)
-
-    # Total de movimientos filtrados
-    total = db.exec(
-        statement.with_only_columns(func.count()).order_by(None)
-    ).one()
-
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-
-    movimientos = db.exec(
-        statement
-        .options(
+    pagina = paginar_por_cursor(
+        db,
+        statement.options(
             selectinload(MovimientoInventario.usuario),
             selectinload(MovimientoInventario.producto)
-        )
-        .order_by(MovimientoInventario.fecha.desc())
-        .offset(offset)
-        .limit(page_size)
-    ).all()
+        ),
+        MovimientoInventario.fecha,
+        MovimientoInventario.id,
+        lambda m: m.fecha,
+        sort_order="desc",
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia=estrategia_total
+    )
 
     items = [
         MovimientoInventarioDetailRead(
@@ -260,16 +337,10 @@ def get_historial_movimientos_by_producto(
             cantidad_inventario=m.cantidad_inventario,
             fecha=m.fecha
         )
-        for m in movimientos
+        for m in pagina.filas
     ]
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=items
-    )
+    return respuesta_paginada(pagina, page, page_size, items)
 
 
 def get_historial_movimientos_by_usuario(
@@ -277,36 +348,42 @@ def get_historial_movimientos_by_usuario(
     usuario_id: int,
     page: int = 1,
     page_size: int = 10,
-    tipo: Optional[TipoMovimientoEnum] = None
+    tipo: Optional[TipoMovimientoEnum] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estrategia_total: EstrategiaTotal = EstrategiaTotal.exacto
 ) -> PagedResponse[MovimientoInventarioDetailRead]:
-    """Obtener historial paginado de movimientos de un usuario con filtro opcional por tipo."""
-    offset = (page - 1) * page_size
+    """
+    Obtener historial paginado de movimientos de un usuario con filtro opcional por tipo y fechas.
+    Con `cursor` (el next_cursor de la respuesta anterior) se pagina por (fecha, id) en lugar de OFFSET.
+    El total es exacto salvo que se pida otra `estrategia_total` (ver EstrategiaTotal).
+    """
 
-    # Base query
+    # Base query con filtro opcional por tipo de movimiento y fechas
     statement = select(MovimientoInventario).where(
-        MovimientoInventario.usuario_id == usuario_id
+        MovimientoInventario.usuario_id == usuario_id,
+        *build_movimiento_filters(tipo, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
     )
 
-    # Filtro por tipo de movimiento
-    if tipo:
-        statement = statement.where(MovimientoInventario.tipo == tipo)
-
-    # Total de registros filtrados
-    total = db.exec(
-        statement.with_only_columns(func.count()).order_by(None)
-    ).one()
-
     # Movimientos filtrados y paginados
-    movimientos = db.exec(
-        statement
-        .options(
+    pagina = paginar_por_cursor(
+        db,
+        statement.options(
             selectinload(MovimientoInventario.usuario),
             selectinload(MovimientoInventario.producto)
-        )
-        .order_by(MovimientoInventario.fecha.desc())
-        .offset(offset)
-        .limit(page_size)
-    ).all()
+        ),
+        MovimientoInventario.fecha,
+        MovimientoInventario.id,
+        lambda m: m.fecha,
+        sort_order="desc",
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia=estrategia_total
+    )
 
     items = [
         MovimientoInventarioDetailRead(
@@ -319,18 +396,10 @@ def get_historial_movimientos_by_usuario(
             cantidad_inventario=m.cantidad_inventario,
             fecha=m.fecha
         )
-        for m in movimientos
+        for m in pagina.filas
     ]
 
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=items
-    )
+    return respuesta_paginada(pagina, page, page_size, items)
 
 
 def get_movimientos_inventario(
@@ -340,46 +409,27 @@ def get_movimientos_inventario(
     tipo: Optional[TipoMovimientoEnum] = None,
     search: Optional[str] = None,
     sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estrategia_total: EstrategiaTotal = EstrategiaTotal.exacto
 ) -> PagedResponse[MovimientoInventarioDetailRead]:
-    """Obtener movimientos de inventario con búsqueda, filtros, paginación y orden dinámico."""
-
-    filters = []
+    """
+    Obtener movimientos de inventario con búsqueda, filtros, rango de fechas, paginación y orden dinámico.
+    Con `cursor` (el next_cursor de la respuesta anterior) se pagina por la columna de orden más el id
+    en lugar de OFFSET; el cursor solo es válido con el mismo sort_by y sort_order.
+    El total es exacto salvo que se pida otra `estrategia_total` (ver EstrategiaTotal).
+    """
+
+    filters = build_movimiento_filters(tipo, search, fecha_desde, fecha_hasta)
     joins = []
 
-    # --- Filtro por tipo de movimiento ---
-    if tipo:
-        filters.append(MovimientoInventario.tipo == tipo)
-
-    # --- Filtro de búsqueda ---
+    # La búsqueda necesita los joins con usuario y producto
     if search:
-        filters.append(
-            or_(
-                Usuario.nombre.ilike(f"%{search}%"),     
-                Producto.nombre.ilike(f"%{search}%"),     
-                Producto.codigo.ilike(f"%{search}%"),
-                MovimientoInventario.id.ilike(f"%{search}%")
-            )
-        )
         joins.extend([MovimientoInventario.usuario, MovimientoInventario.producto])
 
-    # --- Query base ---
-    base_query = select(MovimientoInventario)
-
-    # Aplicar joins si se necesitan para búsqueda u ordenamiento
-    if joins:
-        for rel in joins:
-            base_query = base_query.join(rel)
-
-    if filters:
-        base_query = base_query.where(*filters)
-
-    # --- Conteo total separado ---
-    count_stmt = base_query.with_only_columns(func.count(MovimientoInventario.id)).order_by(None)
-    total = db.exec(count_stmt).one()
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
-
     # --- Query para items ---
     stmt_items = select(MovimientoInventario).options(
         selectinload(MovimientoInventario.usuario),
@@ -394,29 +444,30 @@ def get_movimientos_inventario(
         stmt_items = stmt_items.where(*filters)
 
     # --- Ordenamiento dinámico ---
-    col = None
-    if sort_by:
-        if hasattr(MovimientoInventario, sort_by):
-            col = getattr(MovimientoInventario, sort_by)
-        elif sort_by == "usuario_nombre":
-            stmt_items = stmt_items.join(MovimientoInventario.usuario)
-            col = Usuario.nombre
-        elif sort_by == "producto_nombre":
-            stmt_items = stmt_items.join(MovimientoInventario.producto)
-            col = Producto.nombre
+    col = get_movimiento_sort_column(sort_by)
+    if sort_by == "usuario_nombre" and not search:
+        stmt_items = stmt_items.join(MovimientoInventario.usuario)
+    elif sort_by == "producto_nombre" and not search:
+        stmt_items = stmt_items.join(MovimientoInventario.producto)
 
-    if col is not None:
-        stmt_items = stmt_items.order_by(
-            asc(col) if sort_order == "asc" else desc(col)
-        )
-    else:
+    if col is None:
         # Orden por defecto: fecha desc
-        stmt_items = stmt_items.order_by(desc(MovimientoInventario.fecha))
-
-    # Paginación
-    stmt_items = stmt_items.offset(offset).limit(page_size)
-
-    movimientos = db.exec(stmt_items).all()
+        col, sort_order = MovimientoInventario.fecha, "desc"
+
+    # Paginación (OFFSET o cursor) con el id como desempate
+    pagina = paginar_por_cursor(
+        db,
+        stmt_items,
+        col,
+        MovimientoInventario.id,
+        lambda m: get_movimiento_sort_value(m, sort_by),
+        sort_order=sort_order,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        include_total=include_total,
+        estrategia=estrategia_total
+    )
 
     # --- Mapeo a esquema ---
     items = [
@@ -430,16 +481,10 @@ def get_movimientos_inventario(
             cantidad_inventario=m.cantidad_inventario,
             fecha=m.fecha
         )
-        for m in movimientos
+        for m in pagina.filas
     ]
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=items
-    )
+    return respuesta_paginada(pagina, page, page_size, items)
 
 
 def get_inventarios_stock_bajo(
@@ -448,13 +493,14 @@ def get_inventarios_stock_bajo(
     page: int = 1,
     page_size: int = 10,
     sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
 ) -> PagedResponse[InventarioReadDetail]:
     """Retorna inventarios con stock por debajo del mínimo, con paginación y búsqueda."""
 
     # Filtros comunes
     filters = [
-        Inventario.cantidad < func.coalesce(
+        Inventario.cantidad_total < func.coalesce(
             Inventario.cantidad_minima, literal(settings.STOCK_MINIMO)
         )
     ]
@@ -467,17 +513,6 @@ def get_inventarios_stock_bajo(
             )
         )
 
-    # --- Consulta para contar total ---
-    count_stmt = select(func.count(Inventario.id)).join(Inventario.producto)
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-
-    total = db.exec(count_stmt).one()
-
-    # Calcular total_pages y offset
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
-
     # --- Consulta para obtener datos con joins y relaciones ---
     statement = (
         select(Inventario)
@@ -492,7 +527,9 @@ def get_inventarios_stock_bajo(
     if sort_by:
         col = None
 
-        if hasattr(Inventario, sort_by):
+        if sort_by == "cantidad":
+            col = Inventario.cantidad_total
+        elif hasattr(Inventario, sort_by):
             col = getattr(Inventario, sort_by)
         elif hasattr(Producto, sort_by):
             col = getattr(Producto, sort_by)
@@ -505,20 +542,13 @@ def get_inventarios_stock_bajo(
                 asc(col) if sort_order == "asc" else desc(col)
             )
 
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    items = db.exec(statement).all()
-
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=items
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
+@transaccional
 def update_inventario(
     db: Session, 
     inventario_id: int, 
@@ -526,19 +556,24 @@ def update_inventario(
     current_user: Usuario
 ) -> InventarioRead:
     """Actualizar un inventario existente y registrar movimiento si cambia la cantidad."""
+    # La cantidad se fija a un valor absoluto: se bloquea la fila para que
+    # la diferencia registrada no pise ventas o salidas concurrentes
     inventario = db.exec(
         select(Inventario)
         .where(Inventario.id == inventario_id)
         .options(selectinload(Inventario.producto))
+        .with_for_update(of=Inventario)
+        .execution_options(populate_existing=True)
     ).first()
     if not inventario:
         raise HTTPException(status_code=404, detail="Inventario no encontrado")
-    
-    # Guardar valores previos para comparar
-    cantidad_anterior = inventario.cantidad
-    
+
+    # La cantidad no versiona: la huella de la caché ya lee el stock
+    tablas = []
+
     # Cambiar estado
     if data.estado is not None:
+        tablas += ["inventario", "producto"]
         inventario.estado = data.estado
         # Sincronizar estado del producto
         
@@ -553,12 +588,16 @@ def update_inventario(
         if data.cantidad_minima < 0:
             raise HTTPException(status_code=400, detail="La cantidad mínima no puede ser negativa")
         inventario.cantidad_minima = data.cantidad_minima
+        tablas.append("inventario")
 
     # Validar y actualizar cantidad (con registro de movimiento si cambia)
     if data.cantidad is not None:
         if data.cantidad < 0:
             raise HTTPException(status_code=400, detail="La cantidad no puede ser negativa")
 
+        # Fijar el total (repartido entre las franjas si las tiene)
+        cantidad_anterior = fijar_stock(db, inventario, data.cantidad)
+
         if data.cantidad != cantidad_anterior:
             diferencia = data.cantidad - cantidad_anterior
             tipo_movimiento = (
@@ -575,15 +614,77 @@ def update_inventario(
             )
             db.add(movimiento)
 
-        inventario.cantidad = data.cantidad
+    db.add(inventario)
+    if tablas:
+        incrementar_versiones(db, *tablas)
+    db.commit()
+
+    return inventario
+
+
+@transaccional
+def configurar_franjas_inventario(
+    db: Session,
+    inventario_id: int,
+    data: InventarioFranjasUpdate
+) -> InventarioRead:
+    """
+    Activa o desactiva los contadores repartidos de un inventario.
+    Con franjas > 1 el stock se reparte entre esa cantidad de filas y las
+    ventas del producto dejan de competir por la misma; con 0 o 1 el stock
+    vuelve a la fila del inventario. El total no cambia.
+    """
+    if data.franjas < 0 or data.franjas > settings.STOCK_FRANJAS_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El número de franjas debe estar entre 0 y {settings.STOCK_FRANJAS_MAX}"
+        )
+
+    inventario = db.exec(
+        select(Inventario)
+        .where(Inventario.id == inventario_id)
+        .options(selectinload(Inventario.producto))
+        .with_for_update(of=Inventario)
+        .execution_options(populate_existing=True)
+    ).first()
+    if not inventario:
+        raise HTTPException(status_code=404, detail="Inventario no encontrado")
+
+    # Consolidar el stock actual y repartirlo entre las franjas pedidas
+    existentes = {
+        fila.franja: fila
+        for fila in db.exec(
+            select(InventarioFranja)
+            .where(InventarioFranja.inventario_id == inventario_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).all()
+    }
+    total = inventario.cantidad + sum(fila.cantidad for fila in existentes.values())
+    franjas = data.franjas if data.franjas > 1 else 0
+
+    # Las franjas que siguen se actualizan en su lugar y solo se agregan o
+    # borran las que sobran o faltan, sin chocar con UNIQUE(inventario_id, franja)
+    for franja, parte in enumerate(repartir_stock(total, franjas) if franjas else []):
+        fila = existentes.pop(franja, None)
+        if fila is None:
+            db.add(InventarioFranja(inventario_id=inventario_id, franja=franja, cantidad=parte))
+        else:
+            fila.cantidad = parte
+            db.add(fila)
+    for fila in existentes.values():
+        db.delete(fila)
+
+    inventario.cantidad = 0 if franjas else total
 
     db.add(inventario)
     db.commit()
-    db.refresh(inventario)
 
+    registrar_franjas(inventario.producto_id, inventario_id, data.franjas)
     return inventario
 
 
+@transaccional
 def change_estado_inventario(db: Session, inventario_id: int) -> InventarioReadDetail:
     """Desactiva un inventario en la base de datos."""
     inventario = db.get(Inventario, inventario_id)
@@ -600,8 +701,8 @@ def change_estado_inventario(db: Session, inventario_id: int) -> InventarioReadD
         producto.estado = inventario.estado
         db.add(producto)
 
+    incrementar_versiones(db, "inventario", "producto")
     db.commit()
-    db.refresh(inventario)
     
     return InventarioReadDetail.model_validate(inventario)
 
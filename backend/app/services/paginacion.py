@@ -0,0 +1,375 @@
+import base64
+import binascii
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, text
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.schemas.shared import EstrategiaTotal, PagedResponse
+
+
+class Pagina(NamedTuple):
+    """Filas de una página junto con el total (None si no se contó)."""
+    filas: List[Any]
+    total: Optional[int]
+    has_next: bool
+    next_cursor: Optional[str] = None
+    estrategia_total: Optional[EstrategiaTotal] = None
+
+
+# Totales recientes por firma del listado: clave -> (expira, total)
+_totales: Dict[str, Tuple[float, int]] = {}
+_lock = threading.Lock()
+_MAX_TOTALES = 1000
+
+
+# -------------------------------
+# Conteo de filas
+# -------------------------------
+
+def soporta_funciones_ventana(db: Session) -> bool:
+    """Indica si el motor admite COUNT(*) OVER() (MySQL 8+, MariaDB 10.2+, SQLite 3.25+)."""
+    dialect = db.get_bind().dialect
+    version = dialect.server_version_info or ()
+    if dialect.name == "mysql":
+        return version >= ((10, 2) if getattr(dialect, "is_mariadb", False) else (8, 0))
+    if dialect.name == "sqlite":
+        return version >= (3, 25)
+    return True
+
+
+def contar(db: Session, statement) -> int:
+    """Cuenta las filas del listado completo (sin orden ni paginación) en una consulta aparte."""
+    subquery = statement.order_by(None).offset(None).limit(None).subquery()
+    return db.exec(select(func.count()).select_from(subquery)).one()
+
+
+# -------------------------------
+# Totales aproximados
+# -------------------------------
+
+def _firma(statement) -> str:
+    """Firma del listado: consulta sin orden ni paginación más sus parámetros (los filtros)."""
+    compilado = statement.order_by(None).offset(None).limit(None).compile()
+    parametros = sorted(compilado.params.items())
+    return hashlib.sha256(f"{compilado}|{parametros}".encode("utf-8")).hexdigest()
+
+
+def _total_en_cache(clave: str) -> Optional[int]:
+    with _lock:
+        entrada = _totales.get(clave)
+    if entrada and entrada[0] > time.monotonic():
+        return entrada[1]
+    return None
+
+
+def _guardar_total(clave: str, total: int) -> None:
+    ahora = time.monotonic()
+    with _lock:
+        if len(_totales) >= _MAX_TOTALES:
+            for vencida in [c for c, (expira, _) in _totales.items() if expira <= ahora]:
+                del _totales[vencida]
+        if len(_totales) >= _MAX_TOTALES:
+            # Sin entradas vencidas: se descarta la más antigua
+            del _totales[next(iter(_totales))]
+        _totales[clave] = (ahora + settings.PAGINACION_TOTAL_CACHE_TTL, total)
+
+
+def limpiar_cache_totales() -> None:
+    """Descarta los totales guardados (p. ej. entre pruebas)."""
+    with _lock:
+        _totales.clear()
+
+
+def estimar_total(db: Session, statement) -> Optional[int]:
+    """
+    Filas de la tabla principal según las estadísticas del motor. Solo aplica
+    a listados sin filtros; devuelve None si el motor no ofrece estadísticas
+    o si la tabla es pequeña (contarla exacto es barato y la estimación imprecisa).
+    """
+    if statement.whereclause is not None:
+        return None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        consulta = text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"
+        )
+    elif dialect == "postgresql":
+        consulta = text("SELECT reltuples::bigint FROM pg_class WHERE relname = :tabla")
+    else:
+        return None
+
+    tabla = statement.column_descriptions[0]["entity"].__tablename__
+    estimado = db.exec(consulta.bindparams(tabla=tabla)).scalar()
+    if estimado is None or estimado < settings.PAGINACION_ESTIMADO_MINIMO:
+        return None
+    return int(estimado)
+
+
+def _total_aproximado(db: Session, statement, estrategia: EstrategiaTotal) -> Tuple[Optional[int], Optional[EstrategiaTotal]]:
+    """
+    Total sin contar, si la estrategia lo permite: estimado para listados sin
+    filtros y, si no, el último total exacto guardado para los mismos filtros.
+    """
+    if estrategia == EstrategiaTotal.estimado:
+        total = estimar_total(db, statement)
+        if total is not None:
+            return total, EstrategiaTotal.estimado
+    if estrategia in (EstrategiaTotal.cache, EstrategiaTotal.estimado):
+        total = _total_en_cache(_firma(statement))
+        if total is not None:
+            return total, EstrategiaTotal.cache
+    return None, None
+
+
+def total_listado(db: Session, statement, estrategia: EstrategiaTotal = EstrategiaTotal.exacto) -> Tuple[int, EstrategiaTotal]:
+    """Total del listado completo según la estrategia, contando en una consulta aparte si hace falta."""
+    total, usada = _total_aproximado(db, statement, estrategia)
+    if total is not None:
+        return total, usada
+
+    total = contar(db, statement)
+    if estrategia != EstrategiaTotal.exacto:
+        _guardar_total(_firma(statement), total)
+    return total, EstrategiaTotal.exacto
+
+
+# -------------------------------
+# Paginación por número de página
+# -------------------------------
+
+def _pagina_sin_total(db: Session, statement, page_size: int) -> Pagina:
+    """Página sin contar: se pide una fila extra solo para saber si hay página siguiente."""
+    filas = db.exec(statement.limit(page_size + 1)).all()
+    return Pagina(list(filas[:page_size]), None, len(filas) > page_size)
+
+
+def paginar(
+    db: Session,
+    statement,
+    page: int = 1,
+    page_size: int = 10,
+    include_total: bool = True,
+    estrategia: EstrategiaTotal = EstrategiaTotal.exacto
+) -> Pagina:
+    """
+    Ejecuta un listado ya filtrado y ordenado y devuelve la página pedida.
+
+    El total exacto se obtiene en la misma consulta con COUNT(*) OVER(), que
+    se calcula antes del LIMIT; si el motor no admite funciones de ventana se
+    cuenta con una consulta aparte. Con las estrategias cache y estimado se
+    evita contar cuando hay un total reciente para los mismos filtros o
+    estadísticas de la tabla. Con include_total=False no se cuenta.
+    """
+    statement = statement.offset((page - 1) * page_size)
+
+    if not include_total:
+        return _pagina_sin_total(db, statement, page_size)
+
+    total, usada = _total_aproximado(db, statement, estrategia)
+    if total is not None:
+        pagina = _pagina_sin_total(db, statement, page_size)
+        return pagina._replace(total=total, estrategia_total=usada)
+
+    if soporta_funciones_ventana(db):
+        # execute (no exec) para recibir la entidad y el total en cada fila
+        resultado = db.execute(
+            statement.add_columns(func.count().over().label("total")).limit(page_size)
+        ).all()
+        filas = [row[0] for row in resultado]
+        if resultado:
+            total = resultado[0].total
+        else:
+            # Página fuera de rango: el total no viaja en ninguna fila
+            total = contar(db, statement) if page > 1 else 0
+    else:
+        total = contar(db, statement)
+        filas = list(db.exec(statement.limit(page_size)).all())
+
+    if estrategia != EstrategiaTotal.exacto:
+        _guardar_total(_firma(statement), total)
+
+    return Pagina(filas, total, page * page_size < total, estrategia_total=EstrategiaTotal.exacto)
+
+
+def respuesta_paginada(pagina: Pagina, page: int, page_size: int, items: Optional[list] = None) -> PagedResponse:
+    """Arma el PagedResponse de una página; items permite entregar las filas ya mapeadas."""
+    total = pagina.total
+    if total is None:
+        total_pages = None
+    else:
+        total_pages = (total + page_size - 1) // page_size if total > 0 else 1
+
+    return PagedResponse(
+        total=total,
+        page_size=page_size,
+        current_page=page,
+        total_pages=total_pages,
+        total_strategy=pagina.estrategia_total,
+        items=pagina.filas if items is None else items,
+        has_next=pagina.has_next,
+        next_cursor=pagina.next_cursor
+    )
+
+
+# -------------------------------
+# Paginación por cursor (keyset)
+# -------------------------------
+
+def _serializar_valor(valor: Any) -> Any:
+    """Convierte el valor de la columna de orden a un tipo representable en JSON."""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, Enum):
+        return valor.value
+    return valor
+
+
+def _deserializar_valor(valor: Any, columna) -> Any:
+    """Reconstruye el valor del cursor con el tipo Python de la columna."""
+    if valor is None:
+        return None
+    tipo = columna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is Decimal:
+        return Decimal(valor)
+    if issubclass(tipo, Enum):
+        return tipo(valor)
+    return valor
+
+
+def _orden_cursor(columna, sort_order: Optional[str]) -> str:
+    """Firma del orden que el cursor debe respetar (columna y dirección)."""
+    return f"{columna}:{'asc' if sort_order == 'asc' else 'desc'}"
+
+
+def encode_cursor(valor: Any, id: int, orden: str) -> str:
+    """Cursor opaco con el valor de orden y el id de la última fila entregada."""
+    payload = json.dumps({"v": _serializar_valor(valor), "id": id, "o": orden}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columna, orden: str) -> Tuple[Any, int]:
+    """
+    Decodifica un cursor generado por encode_cursor. Se rechaza si está
+    malformado o si fue emitido para otro ordenamiento.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if payload["o"] != orden:
+            raise ValueError("Orden distinto")
+        return _deserializar_valor(payload["v"], columna), int(payload["id"])
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _condicion_despues_de(columna, id_columna, valor: Any, id: int, descendente: bool):
+    """
+    Filas posteriores a (valor, id) en el orden (columna, id) con nulos al final.
+    Equivale a una comparación de tuplas que el índice (columna, id) puede resolver.
+    """
+    if valor is None:
+        return and_(columna.is_(None), id_columna < id if descendente else id_columna > id)
+
+    posteriores = [
+        columna < valor if descendente else columna > valor,
+        and_(columna == valor, id_columna < id if descendente else id_columna > id),
+    ]
+    if getattr(columna, "nullable", False):
+        posteriores.append(columna.is_(None))
+    return or_(*posteriores)
+
+
+def paginar_por_cursor(
+    db: Session,
+    statement,
+    columna,
+    id_columna,
+    valor_orden: Callable[[Any], Any],
+    sort_order: Optional[str] = "desc",
+    page: int = 1,
+    page_size: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estrategia: EstrategiaTotal = EstrategiaTotal.exacto
+) -> Pagina:
+    """
+    Ejecuta el listado ordenado por (columna, id) y devuelve la página junto
+    con el cursor de la siguiente (None si no hay más resultados).
+
+    Sin cursor se pagina con OFFSET a partir de `page`; con cursor se filtra
+    por las filas posteriores a la última entregada, de modo que cualquier
+    página cuesta lo mismo que la primera. `valor_orden` obtiene el valor de
+    la columna de orden a partir de una fila (p. ej. m.usuario.nombre).
+    """
+    descendente = sort_order != "asc"
+    orden = _orden_cursor(columna, sort_order)
+
+    # Nulos al final en cualquier motor (MySQL no admite NULLS LAST)
+    if getattr(columna, "nullable", False):
+        statement = statement.order_by(columna.is_(None))
+    if descendente:
+        statement = statement.order_by(columna.desc(), id_columna.desc())
+    else:
+        statement = statement.order_by(columna.asc(), id_columna.asc())
+
+    if cursor:
+        valor, ultimo_id = decode_cursor(cursor, columna, orden)
+        # El total es del listado completo, no de lo que queda después del cursor
+        total, usada = total_listado(db, statement, estrategia) if include_total else (None, None)
+        statement = statement.where(_condicion_despues_de(columna, id_columna, valor, ultimo_id, descendente))
+        pagina = _pagina_sin_total(db, statement, page_size)._replace(total=total, estrategia_total=usada)
+    else:
+        pagina = paginar(db, statement, page, page_size, include_total, estrategia)
+
+    if not pagina.has_next:
+        return pagina
+
+    ultima = pagina.filas[-1]
+    return pagina._replace(next_cursor=encode_cursor(valor_orden(ultima), ultima.id, orden))
+
+
+def paginar_por_nombre(
+    db: Session,
+    statement,
+    modelo,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Pagina:
+    """
+    Listados de scroll infinito ordenados por (nombre, id).
+
+    Con `cursor` (el next_cursor de la página anterior, que guarda el nombre
+    y el id de la última fila entregada) se continúan las filas posteriores
+    en lugar de saltar `skip` filas. El costo no crece con el scroll, y si esa
+    fila se renombra o se elimina, la página siguiente no repite ni omite filas.
+    """
+    orden = _orden_cursor(modelo.nombre, "asc")
+    if cursor:
+        nombre, ultimo_id = decode_cursor(cursor, modelo.nombre, orden)
+        statement = statement.where(_condicion_despues_de(modelo.nombre, modelo.id, nombre, ultimo_id, False))
+    else:
+        statement = statement.offset(skip)
+
+    pagina = _pagina_sin_total(db, statement.order_by(modelo.nombre, modelo.id), limit)
+    if not pagina.has_next:
+        return pagina
+
+    ultima = pagina.filas[-1]
+    return pagina._replace(next_cursor=encode_cursor(ultima.nombre, ultima.id, orden))
@@ -3,10 +3,13 @@ from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
 from typing import Optional
 from sqlalchemy import func, or_, asc, desc, exists
-from typing import List, Optional
+from typing import Optional
 from app.models.producto import Producto
 from app.models.categoria import Categoria
 from app.models.inventario import Inventario
+from app.models.detalle_venta import DetalleVenta
+from app.models.movimiento_inventario import MovimientoInventario
+from app.models.version_tabla import incrementar_versiones
 from app.schemas.producto import (
     ProductoCreate, 
     ProductoUpdate, 
@@ -18,28 +21,19 @@ from app.schemas.producto import (
 )
 from app.services.inventario_service import get_inventario_by_product_id
 from app.schemas.shared import PagedResponse
+from app.services.paginacion import Pagina, paginar, paginar_por_nombre, respuesta_paginada
+from app.services.relaciones import verificar_sin_relaciones
 
 
-def get_productos(
-    db: Session,
+def build_producto_filters(
     search: Optional[str] = None,
-    categoria: Optional[str] = None,
-    page: int = 1,
-    page_size: int = 10,
     estado: Optional[bool] = None,
-    sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
-) -> PagedResponse[ProductoRead]:
+    categoria: Optional[str] = None
+) -> list:
     """
-    Obtiene productos con filtros, paginación y ordenamiento.
-    Filtros disponibles:
-      - search: busca en nombre y código.
-      - categoria: filtra por categoria.
-      - estado: filtra por estado activo/inactivo.
-    Soporta ordenamiento dinámico mediante sort_by y sort_order.
+    Filtros del listado de productos, compartidos con la exportación.
+    El filtro por categoría requiere que la consulta incluya el join con Categoria.
     """
-
-    # Construir filtros comunes para ambas consultas     
     filters = []
 
     if search:
@@ -53,53 +47,71 @@ def get_productos(
     if estado is not None:
         filters.append(Producto.estado == estado)
 
-    # Consulta para contar total
-    count_stmt = select(func.count(Producto.id))
     if categoria:
-        count_stmt = count_stmt.join(Producto.categoria).where(Categoria.nombre.ilike(f"%{categoria}%"))
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-    total = db.exec(count_stmt).one()
+        filters.append(Categoria.nombre.ilike(f"%{categoria}%"))
+
+    return filters
+
+
+def get_producto_sort_column(sort_by: Optional[str]):
+    """
+    Columna de ordenamiento de productos según sort_by, o None si no aplica.
+    categoria_nombre requiere el join con Categoria.
+    """
+    if not sort_by:
+        return None
+    if hasattr(Producto, sort_by):
+        return getattr(Producto, sort_by)
+    if sort_by == "categoria_nombre":
+        return Categoria.nombre
+    return None
 
-    # Calcular páginas
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+
+def get_productos(
+    db: Session,
+    search: Optional[str] = None,
+    categoria: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 10,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
+) -> PagedResponse[ProductoRead]:
+    """
+    Obtiene productos con filtros, paginación y ordenamiento.
+    Filtros disponibles:
+      - search: busca en nombre y código.
+      - categoria: filtra por categoria.
+      - estado: filtra por estado activo/inactivo.
+    Soporta ordenamiento dinámico mediante sort_by y sort_order.
+    """
+
+    # Construir filtros
+    filters = build_producto_filters(search, estado, categoria)
 
     # Consulta para obtener items con joins y relaciones
     statement = select(Producto).options(selectinload(Producto.categoria))
 
     if categoria:
-        statement = statement.join(Producto.categoria).where(Categoria.nombre.ilike(f"%{categoria}%"))
+        statement = statement.join(Producto.categoria)
     if filters:
         statement = statement.where(*filters)
 
     # Orden
-    if sort_by:
-        col = None
-
-        if hasattr(Producto, sort_by):
-            col = getattr(Producto, sort_by)
-        elif sort_by == "categoria_nombre":
-            statement = statement.join(Producto.categoria)
-            col = Categoria.nombre
-
-        if col is not None:
-            statement = statement.order_by(
-                asc(col) if sort_order == "asc" else desc(col)
-            )
+    col = get_producto_sort_column(sort_by)
+    if sort_by == "categoria_nombre" and not categoria:
+        statement = statement.join(Producto.categoria)
 
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
+    if col is not None:
+        statement = statement.order_by(
+            asc(col) if sort_order == "asc" else desc(col)
+        )
 
-    productos = db.exec(statement).all()
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=productos
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def get_numero_total_productos(db: Session) -> ProductoTotalResponse:
@@ -147,17 +159,11 @@ def create_producto(db: Session, producto_create: ProductoCreate) -> ProductoDet
     
     producto = Producto.model_validate(producto_create)
     db.add(producto)
+    incrementar_versiones(db, "producto")
     db.commit()
-    db.refresh(producto)
-    
-    # Volver a consultar el producto con la relación categoria precargada
-    producto_con_categoria = db.exec(
-        select(Producto)
-        .options(selectinload(Producto.categoria))
-        .where(Producto.id == producto.id)
-    ).one()
 
-    return producto_con_categoria
+    # La categoría se toma de la sesión si ya está cargada
+    return producto
 
 
 def update_producto(db: Session, producto_id: int, producto_update: ProductoUpdate) -> Optional[Producto]:
@@ -178,6 +184,7 @@ def update_producto(db: Session, producto_id: int, producto_update: ProductoUpda
     update_data = producto_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(producto, key, value)
+    tablas = ["producto"]
 
     if "estado" in update_data:
         inventario = db.exec(
@@ -189,34 +196,36 @@ def update_producto(db: Session, producto_id: int, producto_update: ProductoUpda
         if inventario:
             inventario.estado = update_data["estado"]
             db.add(inventario)
+            tablas.append("inventario")
+
+    # Si cambió la categoría, la relación se vuelve a cargar al leerla
+    if "categoria_id" in update_data:
+        db.expire(producto, ["categoria"])
 
     db.add(producto)
+    incrementar_versiones(db, *tablas)
     db.commit()
-    db.refresh(producto)
     return producto
 
 
 def delete_producto(db: Session, producto_id: int) -> bool:
     """Elimina un producto por su ID."""
-    producto = db.exec(
-        select(Producto)
-        .where(Producto.id == producto_id)
-        .options(
-            selectinload(Producto.inventario),
-            selectinload(Producto.detalles_venta),
-            selectinload(Producto.movimientos)
-            )
-        ).first()
+    producto = db.get(Producto, producto_id)
     
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
     # Relaciones que bloquean el borrado
-    if producto.inventario or producto.detalles_venta or producto.movimientos:
-        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
+    verificar_sin_relaciones(
+        db,
+        Inventario.producto_id == producto_id,
+        DetalleVenta.producto_id == producto_id,
+        MovimientoInventario.producto_id == producto_id
+    )
 
     # Eliminar el producto
     db.delete(producto)
+    incrementar_versiones(db, "producto")
     db.commit()
 
     return True
@@ -238,8 +247,8 @@ def change_estado_producto(db: Session, producto_id: int) -> ProductoDetailRead:
         inventario.estado = producto.estado
         db.add(inventario)
 
+    incrementar_versiones(db, "producto", "inventario")
     db.commit()
-    db.refresh(producto)
     
     return ProductoDetailRead.model_validate(producto)
 
@@ -248,11 +257,13 @@ def get_productos_infinito_inventario(
     db: Session,
     skip: int = 0,
     limit: int = 50,
-    search: Optional[str] = None
-) -> List[ProductoInfinito]:
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Pagina:
     """
     Obtiene productos activos para infinite scroll que no están en inventarios.
     Devuelve solo id y nombre, donde nombre = "[codigo]: [nombre]".
+    Con `cursor` (next_cursor de la página anterior) continúa por (nombre, id) en lugar de skip.
     """
     # Subquery: inventario con el mismo producto
     subq = select(1).where(Producto.id == Inventario.producto_id)
@@ -274,29 +285,29 @@ def get_productos_infinito_inventario(
         ~exists(subq)
     )
 
-    # Orden alfabético por nombre
-    statement = statement.order_by(Producto.nombre).offset(skip).limit(limit)
+    # Orden alfabético por nombre con el id como desempate
+    pagina = paginar_por_nombre(db, statement, Producto, skip=skip, limit=limit, cursor=cursor)
 
-    rows = db.exec(statement).all()
-
-    return [
+    return pagina._replace(filas=[
         ProductoInfinito(
             id=row.id,
             nombre=f"{row.codigo}: {row.nombre}"
         )
-        for row in rows
-    ]
+        for row in pagina.filas
+    ])
     
 
 def get_productos_infinito_movimiento(
     db: Session,
     skip: int = 0,
     limit: int = 50,
-    search: Optional[str] = None
-) -> List[ProductoInfinito]:
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Pagina:
     """
     Obtiene productos activos para infinite scroll.
     Devuelve solo id y nombre, donde nombre = "[codigo]: [nombre]".
+    Con `cursor` (next_cursor de la página anterior) continúa por (nombre, id) en lugar de skip.
     """
 
     statement = select(Producto)
@@ -313,15 +324,13 @@ def get_productos_infinito_movimiento(
     # Solo entidades activas
     statement = statement.where(Producto.estado == True)
 
-    # Orden alfabético por nombre
-    statement = statement.order_by(Producto.nombre).offset(skip).limit(limit)
-
-    rows = db.exec(statement).all()
+    # Orden alfabético por nombre con el id como desempate
+    pagina = paginar_por_nombre(db, statement, Producto, skip=skip, limit=limit, cursor=cursor)
 
-    return [
+    return pagina._replace(filas=[
         ProductoInfinito(
             id=row.id,
             nombre=f"{row.codigo}: {row.nombre}"
         )
-        for row in rows
-    ]
+        for row in pagina.filas
+    ])
@@ -0,0 +1,18 @@
+from fastapi import HTTPException
+from sqlalchemy import exists, or_
+from sqlmodel import Session, select
+
+
+def tiene_relaciones(db: Session, *condiciones) -> bool:
+    """
+    Indica si alguna tabla relacionada tiene filas que cumplan las condiciones
+    (p. ej. `DetalleVenta.producto_id == 5`). Se resuelve en una sola consulta
+    con un EXISTS por condición, sin cargar las filas relacionadas.
+    """
+    return db.execute(select(or_(*(exists().where(condicion) for condicion in condiciones)))).scalar_one()
+
+
+def verificar_sin_relaciones(db: Session, *condiciones) -> None:
+    """Impide el borrado si existe alguna fila relacionada."""
+    if tiene_relaciones(db, *condiciones):
+        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
@@ -0,0 +1,112 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.detalle_venta import DetalleVenta
+from app.models.reserva_stock import ReservaStock
+from app.models.venta import Venta
+from app.services.stock import sumar_stock
+from app.services.transaccion import transaccional
+
+
+logger = logging.getLogger(__name__)
+
+_detener = threading.Event()
+_hilo: Optional[threading.Thread] = None
+
+
+def vencimiento_reserva() -> datetime:
+    """Momento en que vence una reserva creada o renovada ahora."""
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.RESERVA_STOCK_TTL_SECONDS)
+
+
+@transaccional
+def liberar_reservas_vencidas(db: Session, ahora: Optional[datetime] = None) -> int:
+    """
+    Libera en bloque las reservas vencidas: devuelve el stock (una
+    actualización por producto), elimina las líneas en borrador y recalcula
+    el total de sus ventas. Retorna cuántas líneas se liberaron.
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+
+    # Las reservas que se están confirmando en otra transacción se omiten
+    reservas = db.exec(
+        select(ReservaStock)
+        .where(ReservaStock.expira < ahora)
+        .order_by(ReservaStock.id)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not reservas:
+        return 0
+
+    devoluciones: Dict[int, int] = defaultdict(int)
+    for reserva in reservas:
+        devoluciones[reserva.producto_id] += reserva.cantidad
+
+    # En orden de producto para bloquear los inventarios siempre en el mismo orden
+    for producto_id, cantidad in sorted(devoluciones.items()):
+        sumar_stock(db, producto_id, cantidad)
+
+    db.execute(
+        delete(ReservaStock)
+        .where(ReservaStock.id.in_([reserva.id for reserva in reservas]))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(DetalleVenta)
+        .where(DetalleVenta.id.in_([reserva.detalle_venta_id for reserva in reservas]))
+        .execution_options(synchronize_session=False)
+    )
+
+    total_detalles = (
+        select(func.coalesce(func.sum(DetalleVenta.precio_unitario * DetalleVenta.cantidad), 0))
+        .where(DetalleVenta.venta_id == Venta.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Venta)
+        .where(Venta.id.in_({reserva.venta_id for reserva in reservas}))
+        .values(total=total_detalles)
+        .execution_options(synchronize_session=False)
+    )
+
+    db.commit()
+    return len(reservas)
+
+
+def _barrer() -> None:
+    while not _detener.wait(settings.RESERVA_STOCK_BARRIDO_SECONDS):
+        try:
+            with Session(engine) as db:
+                liberar_reservas_vencidas(db)
+        except Exception:
+            # Un fallo puntual no detiene el barrido; se reintenta en la siguiente vuelta
+            logger.exception("Error liberando reservas vencidas")
+
+
+def iniciar_barrido_reservas() -> None:
+    """Arranca el hilo que libera periódicamente las reservas vencidas."""
+    global _hilo
+
+    if _hilo is not None and _hilo.is_alive():
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_barrer, name="barrido-reservas", daemon=True)
+    _hilo.start()
+
+
+def detener_barrido_reservas() -> None:
+    """Detiene el hilo de barrido; se llama al cerrar la aplicación."""
+    global _hilo
+
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join()
+        _hilo = None
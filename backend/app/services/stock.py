@@ -0,0 +1,237 @@
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import exists, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.inventario import Inventario
+from app.models.inventario_franja import InventarioFranja
+
+
+# Productos con contadores repartidos: producto_id -> (inventario_id, franjas).
+# Solo decide por dónde se intenta primero; si está desactualizado, el
+# descuento fallido se reintenta por el otro camino tras recargar.
+_franjas: Dict[int, Tuple[int, int]] = {}
+_franjas_cargadas: Optional[float] = None
+_lock = threading.Lock()
+
+
+def _cargar_franjas(db: Session) -> None:
+    """Recarga qué productos tienen el stock repartido en franjas."""
+    global _franjas_cargadas
+
+    filas = db.execute(
+        select(Inventario.producto_id, InventarioFranja.inventario_id, InventarioFranja.franja)
+        .join(Inventario, Inventario.id == InventarioFranja.inventario_id)
+    ).all()
+
+    franjas: Dict[int, Tuple[int, int]] = {}
+    for producto_id, inventario_id, franja in filas:
+        _, maxima = franjas.get(producto_id, (inventario_id, 0))
+        franjas[producto_id] = (inventario_id, max(maxima, franja + 1))
+
+    with _lock:
+        _franjas.clear()
+        _franjas.update(franjas)
+        _franjas_cargadas = time.monotonic()
+
+
+def _franjas_de(db: Session, producto_id: int) -> Optional[Tuple[int, int]]:
+    if _franjas_cargadas is None or time.monotonic() - _franjas_cargadas >= settings.STOCK_FRANJAS_REFRESH_SECONDS:
+        _cargar_franjas(db)
+    with _lock:
+        return _franjas.get(producto_id)
+
+
+def registrar_franjas(producto_id: int, inventario_id: int, franjas: int) -> None:
+    """Aplica de inmediato la activación o desactivación del reparto en este proceso."""
+    with _lock:
+        if franjas > 1:
+            _franjas[producto_id] = (inventario_id, franjas)
+        else:
+            _franjas.pop(producto_id, None)
+
+
+def limpiar_cache_franjas() -> None:
+    """Vacía la caché; se recarga en el siguiente cambio de stock."""
+    global _franjas_cargadas
+
+    with _lock:
+        _franjas.clear()
+        _franjas_cargadas = None
+
+
+def repartir_stock(cantidad: int, franjas: int) -> List[int]:
+    """Reparte la cantidad en partes lo más iguales posible."""
+    base, resto = divmod(cantidad, franjas)
+    return [base + (1 if i < resto else 0) for i in range(franjas)]
+
+
+def _actualizar_cantidad(
+    db: Session,
+    producto_id: int,
+    diferencia: int,
+    minimo: Optional[int] = None
+) -> Optional[int]:
+    """
+    Suma `diferencia` a la cantidad del inventario con un único UPDATE y
+    retorna la cantidad resultante, o None si no se actualizó ninguna fila.
+    Con `minimo` solo se actualiza si la cantidad actual lo alcanza. Si el
+    inventario tiene franjas no se actualiza: su stock vive en las franjas.
+    """
+    statement = (
+        update(Inventario)
+        .where(
+            Inventario.producto_id == producto_id,
+            ~exists().where(InventarioFranja.inventario_id == Inventario.id)
+        )
+        .values(cantidad=Inventario.cantidad + diferencia)
+        .execution_options(synchronize_session=False)
+    )
+    if minimo is not None:
+        statement = statement.where(Inventario.cantidad >= minimo)
+
+    if db.get_bind().dialect.update_returning:
+        return db.execute(statement.returning(Inventario.cantidad)).scalar_one_or_none()
+
+    # Sin RETURNING (MySQL): la fila queda bloqueada por el UPDATE hasta el commit
+    if db.execute(statement).rowcount == 0:
+        return None
+    return stock_disponible(db, producto_id)
+
+
+def _actualizar_franja(
+    db: Session,
+    inventario_id: int,
+    franja: int,
+    diferencia: int,
+    minimo: Optional[int] = None
+) -> bool:
+    """Como _actualizar_cantidad, sobre una sola franja."""
+    statement = (
+        update(InventarioFranja)
+        .where(InventarioFranja.inventario_id == inventario_id, InventarioFranja.franja == franja)
+        .values(cantidad=InventarioFranja.cantidad + diferencia)
+        .execution_options(synchronize_session=False)
+    )
+    if minimo is not None:
+        statement = statement.where(InventarioFranja.cantidad >= minimo)
+    return db.execute(statement).rowcount > 0
+
+
+def _descontar_de_franjas(db: Session, inventario_id: int, franjas: int, cantidad: int) -> bool:
+    """
+    Descuenta de una franja al azar. Si esa franja no alcanza, bloquea todas
+    las del inventario y descuenta de varias mientras el total alcance.
+    """
+    if _actualizar_franja(db, inventario_id, random.randrange(franjas), -cantidad, minimo=cantidad):
+        return True
+
+    filas = db.exec(
+        select(InventarioFranja)
+        .where(InventarioFranja.inventario_id == inventario_id)
+        .order_by(InventarioFranja.franja)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).all()
+    if not filas or sum(fila.cantidad for fila in filas) < cantidad:
+        return False
+
+    pendiente = cantidad
+    for fila in filas:
+        tomado = min(fila.cantidad, pendiente)
+        fila.cantidad -= tomado
+        pendiente -= tomado
+        db.add(fila)
+        if not pendiente:
+            break
+    db.flush()
+    return True
+
+
+def descontar_stock(db: Session, producto_id: int, cantidad: int) -> Optional[int]:
+    """
+    Descuenta stock solo si alcanza, sin leerlo antes en Python
+    (UPDATE ... SET cantidad = cantidad - n WHERE cantidad >= n).
+    Retorna la cantidad que queda, o None si no hay stock suficiente o no
+    existe el inventario. No bloquea más que la fila afectada.
+
+    Si el producto tiene el stock repartido en franjas se descuenta de una de
+    ellas; la cantidad retornada es entonces el total leído tras descontar.
+    """
+    franjas = _franjas_de(db, producto_id)
+    if franjas is None:
+        restante = _actualizar_cantidad(db, producto_id, -cantidad, minimo=cantidad)
+        if restante is not None:
+            return restante
+        # Puede que otro proceso haya activado las franjas del producto
+        _cargar_franjas(db)
+        franjas = _franjas_de(db, producto_id)
+        if franjas is None:
+            return None
+
+    if _descontar_de_franjas(db, *franjas, cantidad):
+        return stock_disponible(db, producto_id)
+
+    # Sin franjas (se desactivaron en otro proceso): la fila tiene todo el stock
+    _cargar_franjas(db)
+    if _franjas_de(db, producto_id) is None:
+        return _actualizar_cantidad(db, producto_id, -cantidad, minimo=cantidad)
+    return None
+
+
+def sumar_stock(db: Session, producto_id: int, cantidad: int) -> Optional[int]:
+    """
+    Suma stock de forma atómica; retorna la cantidad resultante o None si no
+    existe el inventario. Si el producto tiene franjas siempre se suma a una
+    de ellas, nunca a la fila del inventario, donde no se podría vender.
+    """
+    for _ in range(2):
+        franjas = _franjas_de(db, producto_id)
+        if franjas is None:
+            restante = _actualizar_cantidad(db, producto_id, cantidad)
+            if restante is not None:
+                return restante
+        else:
+            inventario_id, total_franjas = franjas
+            if _actualizar_franja(db, inventario_id, random.randrange(total_franjas), cantidad):
+                return stock_disponible(db, producto_id)
+        # Las franjas cambiaron en otro proceso: se recargan dentro de la
+        # transacción y se intenta por el camino que corresponda
+        _cargar_franjas(db)
+    return None
+
+
+def fijar_stock(db: Session, inventario: Inventario, cantidad: int) -> int:
+    """
+    Fija el stock total del inventario (la fila debe estar bloqueada) y retorna
+    el total anterior. Con franjas, la nueva cantidad se reparte entre ellas.
+    """
+    filas = db.exec(
+        select(InventarioFranja)
+        .where(InventarioFranja.inventario_id == inventario.id)
+        .order_by(InventarioFranja.franja)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).all()
+    anterior = inventario.cantidad + sum(fila.cantidad for fila in filas)
+
+    if filas:
+        for fila, parte in zip(filas, repartir_stock(cantidad, len(filas))):
+            fila.cantidad = parte
+            db.add(fila)
+        inventario.cantidad = 0
+    else:
+        inventario.cantidad = cantidad
+
+    return anterior
+
+
+def stock_disponible(db: Session, producto_id: int) -> Optional[int]:
+    """Cantidad total actual en la base de datos (sin usar la copia de la sesión)."""
+    return db.exec(
+        select(Inventario.cantidad_total).where(Inventario.producto_id == producto_id)
+    ).first()
@@ -0,0 +1,100 @@
+import functools
+import random
+import threading
+import time
+from typing import Callable, Dict, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+# Errores por los que se repite la transacción completa:
+# MySQL 1213 (deadlock) y 1205 (lock wait timeout); SQLSTATE 40001
+# (serialization failure) y 40P01 (deadlock en PostgreSQL)
+_CODIGOS_MYSQL = {1213, 1205}
+_SQLSTATES = {"40001", "40P01"}
+
+# Reintentos por servicio: nombre -> {"reintentos": n, "agotados": n}
+_estadisticas: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def es_error_reintentable(error: DBAPIError) -> bool:
+    """Indica si el error es un conflicto de concurrencia que se resuelve repitiendo."""
+    original = error.orig
+
+    codigo = getattr(original, "errno", None)
+    if codigo is None and getattr(original, "args", None):
+        codigo = original.args[0]
+    if codigo in _CODIGOS_MYSQL:
+        return True
+
+    sqlstate = getattr(original, "sqlstate", None) or getattr(original, "pgcode", None)
+    if sqlstate in _SQLSTATES:
+        return True
+
+    # SQLite: otra conexión tiene el archivo bloqueado
+    return "database is locked" in str(original)
+
+
+def _espera(intento: int) -> float:
+    """Backoff exponencial con jitter completo, en segundos."""
+    tope = min(settings.DB_RETRY_MAX_MS, settings.DB_RETRY_BASE_MS * 2 ** (intento - 1))
+    return random.uniform(0, tope) / 1000
+
+
+def _registrar(servicio: str, clave: str) -> None:
+    with _lock:
+        contadores = _estadisticas.setdefault(servicio, {"reintentos": 0, "agotados": 0})
+        contadores[clave] += 1
+
+
+def transaccional(servicio: Callable[..., T]) -> Callable[..., T]:
+    """
+    Repite el servicio completo si la base de datos aborta la transacción por
+    un deadlock o un timeout de bloqueo, con rollback y espera aleatoria entre
+    intentos. El servicio recibe la sesión como primer argumento o como `db`.
+    Si se agotan los intentos responde 503 en vez de un error 500.
+    """
+    nombre = servicio.__name__
+
+    @functools.wraps(servicio)
+    def envoltura(*args, **kwargs) -> T:
+        db = kwargs["db"] if "db" in kwargs else args[0]
+        intento = 1
+        while True:
+            try:
+                return servicio(*args, **kwargs)
+            except DBAPIError as error:
+                if not es_error_reintentable(error):
+                    raise
+                db.rollback()
+
+                if intento >= settings.DB_RETRY_MAX_INTENTOS:
+                    _registrar(nombre, "agotados")
+                    raise HTTPException(
+                        status_code=503,
+                        detail="La base de datos está ocupada, intente de nuevo"
+                    ) from error
+
+                _registrar(nombre, "reintentos")
+                time.sleep(_espera(intento))
+                intento += 1
+
+    return envoltura
+
+
+def estadisticas_reintentos() -> Dict[str, Dict[str, int]]:
+    """Reintentos y transacciones agotadas por servicio desde el arranque."""
+    with _lock:
+        return {servicio: dict(contadores) for servicio, contadores in _estadisticas.items()}
+
+
+def limpiar_estadisticas_reintentos() -> None:
+    """Reinicia los contadores."""
+    with _lock:
+        _estadisticas.clear()
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.usuario import Usuario
+
+
+# Usuarios autenticados por subject del token (email): email -> (expira, usuario)
+# El usuario guardado es una copia desligada de cualquier sesión.
+_usuarios: "OrderedDict[str, Tuple[float, Usuario]]" = OrderedDict()
+_estadisticas: Dict[str, int] = {"hits": 0, "misses": 0, "invalidaciones": 0}
+_lock = threading.Lock()
+
+
+def obtener_usuario_cacheado(db: Session, email: str) -> Optional[Usuario]:
+    """
+    Retorna el usuario del token si está en la caché y no ha expirado, ya
+    asociado a la sesión de la petición sin consultar la base de datos.
+    """
+    if not settings.AUTH_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        entrada = _usuarios.get(email)
+        if entrada and entrada[0] > time.monotonic():
+            _usuarios.move_to_end(email)
+            _estadisticas["hits"] += 1
+            usuario = entrada[1]
+        else:
+            if entrada:
+                del _usuarios[email]
+            _estadisticas["misses"] += 1
+            return None
+
+    # merge sin load: copia el estado guardado a una instancia de esta sesión
+    return db.merge(usuario, load=False)
+
+
+def guardar_usuario_cacheado(email: str, usuario: Usuario) -> None:
+    """Guarda una copia desligada del usuario, expulsando el menos usado si se llena."""
+    if not settings.AUTH_CACHE_ENABLED:
+        return
+
+    copia = Usuario(**usuario.model_dump())
+    make_transient_to_detached(copia)
+
+    with _lock:
+        _usuarios[email] = (time.monotonic() + settings.AUTH_CACHE_TTL_SECONDS, copia)
+        _usuarios.move_to_end(email)
+        while len(_usuarios) > settings.AUTH_CACHE_MAX_ENTRIES:
+            _usuarios.popitem(last=False)
+
+
+def invalidar_usuario_cacheado(*emails: Optional[str]) -> None:
+    """Descarta de la caché los usuarios indicados (p. ej. al editarlos o eliminarlos)."""
+    with _lock:
+        for email in emails:
+            if email and _usuarios.pop(email, None) is not None:
+                _estadisticas["invalidaciones"] += 1
+
+
+def limpiar_cache_usuarios() -> None:
+    """Vacía la caché y reinicia los contadores."""
+    with _lock:
+        _usuarios.clear()
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+
+
+def estadisticas_cache_usuarios() -> Dict[str, int]:
+    """Contadores de aciertos, fallos e invalidaciones, y tamaño actual de la caché."""
+    with _lock:
+        return {**_estadisticas, "entradas": len(_usuarios)}
@@ -1,8 +1,14 @@
 from sqlmodel import Session, select
 from sqlalchemy import func, or_, asc, desc
 from app.models.usuario import Usuario
+from app.models.venta import Venta
+from app.models.movimiento_inventario import MovimientoInventario
 from app.schemas.usuario import UsuarioCreate, UsuarioUpdate, UsuarioRead
 from app.schemas.shared import PagedResponse 
+from app.services.paginacion import paginar, respuesta_paginada
+from app.services.relaciones import verificar_sin_relaciones
+from app.services.usuario_cache_service import invalidar_usuario_cacheado
+from app.services.usuario_token_service import actualizar_usuario_token, revocar_usuario_token
 from app.core.security import get_password_hash
 from typing import Optional, List
 from fastapi import HTTPException
@@ -24,6 +30,34 @@ def get_usuario_by_id(db: Session, usuario_id: int) -> Optional[Usuario]:
     return db.get(Usuario, usuario_id)
 
 
+def build_usuario_filters(
+    search: Optional[str] = None,
+    estado: Optional[bool] = None
+) -> list:
+    """Filtros del listado de usuarios, compartidos con la exportación."""
+    filters = []
+
+    if search:
+        filters.append(
+            or_(
+                Usuario.nombre.ilike(f"%{search}%"),
+                Usuario.email.ilike(f"%{search}%")
+            )
+        )
+
+    if estado is not None:
+        filters.append(Usuario.estado == estado)
+
+    return filters
+
+
+def get_usuario_sort_column(sort_by: Optional[str]):
+    """Columna de ordenamiento de usuarios según sort_by, o None si no aplica."""
+    if sort_by and hasattr(Usuario, sort_by):
+        return getattr(Usuario, sort_by)
+    return None
+
+
 def get_usuarios(
     db: Session,
     page: int = 1,
@@ -31,7 +65,8 @@ def get_usuarios(
     search: Optional[str] = None,
     estado: Optional[bool] = None,
     sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
 ) -> PagedResponse[UsuarioRead]:
     """
     Obtiene usuarios con filtros, paginación y ordenamiento.
@@ -41,29 +76,8 @@ def get_usuarios(
     Soporta ordenamiento dinámico mediante sort_by y sort_order.
     """
 
-    # Construir filtros comunes para ambas consultas
-    filters = []
-
-    if search:
-        filters.append(
-            or_(
-                Usuario.nombre.ilike(f"%{search}%"),
-                Usuario.email.ilike(f"%{search}%")
-            )
-        )
-
-    if estado is not None:
-        filters.append(Usuario.estado == estado)
-
-    # Consulta para contar total
-    count_stmt = select(func.count(Usuario.id))
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-    total = db.exec(count_stmt).one()
-
-    # Calcular páginas
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+    # Construir filtros
+    filters = build_usuario_filters(search, estado)
 
     # Consulta para obtener los usuarios
     statement = select(Usuario)
@@ -71,28 +85,16 @@ def get_usuarios(
         statement = statement.where(*filters)
 
     # Ordenamiento dinámico
-    if sort_by:
-        col = None
-        if hasattr(Usuario, sort_by):
-            col = getattr(Usuario, sort_by)
-
-        if col is not None:
-            statement = statement.order_by(
-                asc(col) if sort_order == "asc" else desc(col)
-            )
-
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
+    col = get_usuario_sort_column(sort_by)
+    if col is not None:
+        statement = statement.order_by(
+            asc(col) if sort_order == "asc" else desc(col)
+        )
 
-    usuarios = db.exec(statement).all()
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=usuarios
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
@@ -115,7 +117,6 @@ def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
 
     db.add(nuevo_usuario)
     db.commit()
-    db.refresh(nuevo_usuario)
     return nuevo_usuario
 
 
@@ -125,6 +126,8 @@ def update_usuario(db: Session, usuario_id: int, datos: UsuarioUpdate) -> Option
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    email_anterior = usuario.email
+
     if datos.nombre is not None:
         usuario.nombre = datos.nombre
     # Verificar si el email ya está en uso
@@ -142,7 +145,20 @@ def update_usuario(db: Session, usuario_id: int, datos: UsuarioUpdate) -> Option
 
     db.add(usuario)
     db.commit()
-    db.refresh(usuario)
+
+    invalidar_usuario_cacheado(email_anterior, usuario.email)
+    actualizar_usuario_token(usuario)
+    return usuario
+
+
+def actualizar_hash_contrasena(db: Session, usuario: Usuario, nuevo_hash: str) -> Usuario:
+    """Reemplaza el hash de la contraseña por uno con el costo configurado."""
+    usuario.contrasena = nuevo_hash
+
+    db.add(usuario)
+    db.commit()
+
+    invalidar_usuario_cacheado(usuario.email)
     return usuario
 
 
@@ -154,13 +170,20 @@ def delete_usuario(db: Session, usuario_id: int) -> bool:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     # Relaciones que bloquean el borrado
-    if usuario.ventas or usuario.movimientos:
-        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
+    verificar_sin_relaciones(
+        db,
+        Venta.usuario_id == usuario_id,
+        MovimientoInventario.usuario_id == usuario_id
+    )
 
     # Eliminar el usuario
+    email = usuario.email
     db.delete(usuario)
     db.commit()
 
+    invalidar_usuario_cacheado(email)
+    revocar_usuario_token(usuario_id)
+
     return True
 
 
@@ -175,7 +198,9 @@ def change_estado_usuario(db: Session, usuario_id: int) -> UsuarioRead:
     usuario.estado = not usuario.estado
 
     db.commit()
-    db.refresh(usuario)
+
+    invalidar_usuario_cacheado(usuario.email)
+    actualizar_usuario_token(usuario)
 
     return UsuarioRead.model_validate(usuario)
     
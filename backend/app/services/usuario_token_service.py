@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.usuario import Usuario
+
+
+# Estado vigente de cada usuario para validar los claims del token sin consultar
+# la tabla usuario en cada petición: id -> (rol_id, version) de los usuarios activos.
+# None marca un usuario inactivo o eliminado.
+_tabla: Dict[int, Optional[Tuple[Optional[int], str]]] = {}
+_refrescada: Optional[float] = None
+_lock = threading.Lock()
+
+
+def version_token(usuario: Usuario) -> str:
+    """
+    Versión de los tokens del usuario. Cambia al cambiar su email o contraseña,
+    lo que revoca los tokens emitidos antes.
+    """
+    return hashlib.sha256(f"{usuario.email}:{usuario.contrasena}".encode()).hexdigest()[:16]
+
+
+def claims_token(usuario: Usuario) -> dict:
+    """Claims con los que se autoriza al usuario sin consultarlo en cada petición."""
+    return {
+        "sub": usuario.email,
+        "uid": usuario.id,
+        "rol_id": usuario.rol_id,
+        "ver": version_token(usuario),
+    }
+
+
+def _estado(usuario: Usuario) -> Optional[Tuple[Optional[int], str]]:
+    return (usuario.rol_id, version_token(usuario)) if usuario.estado else None
+
+
+def refrescar_tabla_tokens(db: Session) -> None:
+    """Recarga el estado de todos los usuarios desde la base de datos."""
+    global _refrescada
+
+    filas = db.execute(
+        select(Usuario.id, Usuario.email, Usuario.contrasena, Usuario.rol_id, Usuario.estado)
+    ).all()
+
+    tabla = {fila.id: _estado(fila) for fila in filas}
+    with _lock:
+        _tabla.clear()
+        _tabla.update(tabla)
+        _refrescada = time.monotonic()
+
+
+def _vencida() -> bool:
+    return _refrescada is None or time.monotonic() - _refrescada >= settings.AUTH_REVOCACION_REFRESH_SECONDS
+
+
+def token_vigente(db: Session, usuario_id: int, rol_id: Optional[int], version: str) -> bool:
+    """
+    Indica si los claims del token siguen vigentes: el usuario existe, está
+    activo, conserva el rol y no ha cambiado sus credenciales.
+    """
+    if _vencida():
+        refrescar_tabla_tokens(db)
+
+    with _lock:
+        conocido = usuario_id in _tabla
+        estado = _tabla.get(usuario_id)
+
+    # Usuario creado después del último refresco
+    if not conocido:
+        usuario = db.get(Usuario, usuario_id)
+        estado = _estado(usuario) if usuario else None
+        with _lock:
+            _tabla[usuario_id] = estado
+
+    return estado is not None and estado == (rol_id, version)
+
+
+def actualizar_usuario_token(usuario: Usuario) -> None:
+    """Aplica de inmediato un cambio del usuario, sin esperar al siguiente refresco."""
+    with _lock:
+        _tabla[usuario.id] = _estado(usuario)
+
+
+def revocar_usuario_token(usuario_id: int) -> None:
+    """Revoca de inmediato los tokens de un usuario eliminado."""
+    with _lock:
+        _tabla[usuario_id] = None
+
+
+def limpiar_tabla_tokens() -> None:
+    """Vacía la tabla; se recarga en la siguiente validación."""
+    global _refrescada
+
+    with _lock:
+        _tabla.clear()
+        _refrescada = None
@@ -1,32 +1,56 @@
 from typing import List, Optional
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import or_, func, asc, desc
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import or_, func, asc, desc, insert, update, delete, bindparam, exists
 from fastapi import HTTPException, status
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 from app.models.venta import Venta
 from app.models.cliente import Cliente
 from app.models.detalle_venta import DetalleVenta
 from app.models.inventario import Inventario
+from app.models.inventario_franja import InventarioFranja
 from app.models.producto import Producto
 from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
 from app.models.usuario import Usuario
+from app.models.reserva_stock import ReservaStock
 from app.schemas.venta import (
     VentaUpdate, 
     VentaRequest, 
+    VentaCompletaRequest,
     VentaTotalResponse,
     VentaDetailRead,
     VentaListRead,
     VentaUpdateRead
 )
 from app.schemas.detalle_venta import DetalleVentaCreate, DetalleVentaUpdate, DetalleVentaRead
-from app.schemas.shared import PagedResponse
+from app.schemas.shared import EstrategiaTotal, PagedResponse
 from app.models.movimiento_inventario import MovimientoInventario
+from app.services.filtros import build_fecha_filters
+from app.services.paginacion import paginar, paginar_por_cursor, respuesta_paginada
+from app.services.relaciones import verificar_sin_relaciones
+from app.services.reserva_service import vencimiento_reserva
+from app.services.stock import descontar_stock, sumar_stock, stock_disponible
+from app.services.transaccion import transaccional
 
 from decimal import Decimal
 
  
+def _cargar_venta(db: Session, venta_id: int) -> Optional[Venta]:
+    """Venta con cliente, usuario y líneas con su producto: todo lo que necesita VentaDetailRead."""
+    return db.exec(
+        select(Venta)
+        .options(
+            selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
+            selectinload(Venta.cliente),
+            selectinload(Venta.usuario)
+        )
+        .where(Venta.id == venta_id)
+    ).first()
+
+
+@transaccional
 def create_venta(
     db: Session, 
     venta_data: VentaRequest, 
@@ -44,72 +68,191 @@ def create_venta(
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    # Crear venta vacía
+    # Crear venta vacía; la respuesta se arma con los objetos ya cargados
     venta = Venta(
-        cliente_id=venta_data.cliente_id,
-        usuario_id=usuario_id,
+        cliente=cliente,
+        usuario=db.get(Usuario, usuario_id),
         fecha=datetime.now(timezone.utc),
         total=Decimal(0)
     )
 
     db.add(venta)
     db.commit()
-    db.refresh(venta)
-    
-    # Volver a consultar con relaciones cargadas
-    venta_full = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario),
-            selectinload(Venta.detalle_ventas)
-                .selectinload(DetalleVenta.producto)
+    set_committed_value(venta, "detalle_ventas", [])
+
+    return venta
+
+
+@transaccional
+def create_venta_completa(
+    db: Session,
+    venta_data: VentaCompletaRequest,
+    usuario_id: int
+) -> VentaDetailRead:
+    """
+    Crea una venta con todos sus detalles en una sola transacción.
+    Los inventarios se consultan juntos y los detalles, movimientos y
+    descuentos de stock se insertan/actualizan por lotes, con un único commit.
+    """
+
+    # Validar que el cliente exista
+    cliente = db.get(Cliente, venta_data.cliente_id)
+    if not cliente:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+
+    # Cantidad requerida por producto (un producto puede venir en varias líneas).
+    # Una cantidad negativa sumaría stock en el descuento por lote.
+    requerido: dict = {}
+    for detalle in venta_data.detalles:
+        if detalle.cantidad <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"La cantidad debe ser mayor a 0 para producto=ID {detalle.producto_id}"
+            )
+        requerido[detalle.producto_id] = requerido.get(detalle.producto_id, 0) + detalle.cantidad
+
+    # 1. Obtener todos los inventarios con su producto en una consulta,
+    # bloqueando sus filas (en orden de id) hasta el commit
+    con_franjas = exists().where(InventarioFranja.inventario_id == Inventario.id)
+    inventarios = {
+        inventario.producto_id: (inventario, producto, repartido)
+        for inventario, producto, repartido in db.exec(
+            select(Inventario, Producto, con_franjas)
+            .join(Producto, Producto.id == Inventario.producto_id)
+            .where(Inventario.producto_id.in_(list(requerido)))
+            .order_by(Inventario.id)
+            .with_for_update(of=Inventario)
+            .execution_options(populate_existing=True)
+        ).all()
+    }
+
+    # 2. Validar existencia, estado y stock antes de escribir
+    for producto_id, cantidad in requerido.items():
+        if producto_id not in inventarios:
+            raise HTTPException(status_code=404, detail=f"Inventario no encontrado para producto=ID {producto_id}")
+
+        inventario, producto, _ = inventarios[producto_id]
+        if not inventario.estado or not producto.estado:
+            raise HTTPException(status_code=400, detail=f"Producto: {producto.nombre} inactivo")
+
+        if inventario.cantidad_total < cantidad:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Stock insuficiente para producto={producto.nombre}. Disponible: {inventario.cantidad_total}, requerido: {cantidad}"
+            )
+
+    # 3. Descontar el stock: en lote sobre las filas bloqueadas y, para los
+    # productos con contadores repartidos, de sus franjas
+    en_lote = [producto_id for producto_id in requerido if not inventarios[producto_id][2]]
+    if en_lote:
+        db.execute(
+            update(Inventario.__table__)
+            .where(Inventario.__table__.c.id == bindparam("inventario_id"))
+            .values(cantidad=Inventario.__table__.c.cantidad - bindparam("vendido")),
+            [
+                {"inventario_id": inventarios[producto_id][0].id, "vendido": requerido[producto_id]}
+                for producto_id in en_lote
+            ]
         )
-        .where(Venta.id == venta.id)
-    ).first()
 
-    return venta_full
+    for producto_id in requerido:
+        if inventarios[producto_id][2] and descontar_stock(db, producto_id, requerido[producto_id]) is None:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Stock insuficiente para producto={inventarios[producto_id][1].nombre}"
+            )
+
+    # 4. Líneas con su precio y el stock que queda tras cada una
+    fecha = datetime.now(timezone.utc)
+    restante = {producto_id: inventarios[producto_id][0].cantidad_total for producto_id in requerido}
+    lineas = []
+    total = Decimal(0)
+    for detalle in venta_data.detalles:
+        # Si no se especifica precio unitario, usar el del producto
+        precio = detalle.precio_unitario
+        if precio is None:
+            precio = inventarios[detalle.producto_id][1].precio_unitario
+
+        restante[detalle.producto_id] -= detalle.cantidad
+        total += Decimal(precio * detalle.cantidad)
+        lineas.append((detalle, precio, restante[detalle.producto_id]))
+
+    # 5. Crear la venta con el total ya calculado
+    venta = Venta(
+        cliente=cliente,
+        usuario=db.get(Usuario, usuario_id),
+        fecha=fecha,
+        total=total
+    )
+    db.add(venta)
+    db.flush()
+    venta_id = venta.id
+
+    # 6. Detalles y movimientos por lotes. Los detalles vuelven del INSERT
+    # con RETURNING donde el motor lo admite; si no (MySQL) se leen una vez
+    filas_detalle = [
+        {
+            "venta_id": venta_id,
+            "producto_id": detalle.producto_id,
+            "cantidad": detalle.cantidad,
+            "precio_unitario": precio
+        }
+        for detalle, precio, _ in lineas
+    ]
+    if db.get_bind().dialect.insert_executemany_returning:
+        detalles = sorted(
+            db.scalars(insert(DetalleVenta).returning(DetalleVenta), filas_detalle),
+            key=lambda detalle: detalle.id
+        )
+    else:
+        db.execute(insert(DetalleVenta), filas_detalle)
+        detalles = list(db.exec(
+            select(DetalleVenta).where(DetalleVenta.venta_id == venta_id).order_by(DetalleVenta.id)
+        ).all())
+
+    db.execute(insert(MovimientoInventario), [
+        {
+            "producto_id": detalle.producto_id,
+            "tipo": TipoMovimientoEnum.VENTA,
+            "cantidad": detalle.cantidad,
+            "cantidad_inventario": cantidad_inventario,
+            "fecha": fecha,
+            "usuario_id": usuario_id,
+            "venta_id": venta_id
+        }
+        for detalle, _, cantidad_inventario in lineas
+    ])
+
+    db.commit()
+
+    # 7. Armar la respuesta con los objetos de la sesión, sin recargar
+    for detalle in detalles:
+        set_committed_value(detalle, "producto", inventarios[detalle.producto_id][1])
+    set_committed_value(venta, "detalle_ventas", detalles)
+
+    return venta
 
 
 def get_venta_by_id(db: Session, venta_id: int) -> VentaDetailRead:
     """Obtiene una venta por su ID con detalles y productos."""
-    venta = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.detalle_ventas)
-            .selectinload(DetalleVenta.producto),
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario)
-        )
-        .where(Venta.id == venta_id)
-    ).first()
+    venta = _cargar_venta(db, venta_id)
 
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     return venta
 
 
-def get_ventas(
-    db: Session,
+def build_venta_filters(
     search: Optional[str] = None,
-    page: int = 1,
-    page_size: int = 10,
     estado: Optional[bool] = None,
-    sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
-) -> PagedResponse[VentaListRead]:
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None
+) -> list:
     """
-    Obtiene ventas con filtros, búsqueda, paginación y ordenamiento dinámico.
-    Filtros disponibles:
-      - search: busca en nombre de cliente, nombre de vendedor o ID de venta.
-      - estado: filtra por estado de la venta.
-    Soporta ordenamiento por:
-      - Campos propios de Venta.
-      - cliente_nombre (Cliente.nombre).
-      - usuario_nombre (Usuario.nombre).
+    Filtros del listado de ventas, compartidos con la exportación.
+    La búsqueda requiere los joins con Cliente y Usuario.
     """
-
-    # Construir filtros comunes
     filters = []
 
     if search:
@@ -125,20 +268,66 @@ def get_ventas(
     if estado is not None:
         filters.append(Venta.estado == estado)
 
-    # Consulta para contar total
-    count_stmt = (
-        select(func.count(Venta.id))
-        .join(Venta.cliente)
-        .join(Venta.usuario)
-    )
-    if filters:
-        count_stmt = count_stmt.where(*filters)
+    filters.extend(build_fecha_filters(Venta.fecha, fecha_desde, fecha_hasta))
 
-    total = db.exec(count_stmt).one()
+    return filters
 
-    # Calcular páginas
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+
+def get_venta_sort_column(sort_by: Optional[str]):
+    """Columna de ordenamiento de ventas según sort_by, o None si no aplica."""
+    if not sort_by:
+        return None
+    if hasattr(Venta, sort_by):
+        return getattr(Venta, sort_by)
+    if sort_by == "cliente_nombre":
+        return Cliente.nombre
+    if sort_by == "usuario_nombre":
+        return Usuario.nombre
+    return None
+
+
+def get_venta_sort_value(venta: Venta, sort_by: Optional[str]):
+    """Valor de la columna de ordenamiento para una venta ya cargada (para el cursor)."""
+    if sort_by == "cliente_nombre":
+        return venta.cliente.nombre
+    if sort_by == "usuario_nombre":
+        return venta.usuario.nombre
+    if sort_by and hasattr(Venta, sort_by):
+        return getattr(venta, sort_by)
+    return venta.fecha
+
+
+def get_ventas(
+    db: Session,
+    search: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 10,
+    estado: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "asc",
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estrategia_total: EstrategiaTotal = EstrategiaTotal.exacto
+) -> PagedResponse[VentaListRead]:
+    """
+    Obtiene ventas con filtros, búsqueda, paginación y ordenamiento dinámico.
+    Filtros disponibles:
+      - search: busca en nombre de cliente, nombre de vendedor o ID de venta.
+      - estado: filtra por estado de la venta.
+      - fecha_desde / fecha_hasta: rango de fechas (inclusive).
+    Soporta ordenamiento por:
+      - Campos propios de Venta.
+      - cliente_nombre (Cliente.nombre).
+      - usuario_nombre (Usuario.nombre).
+    Con `cursor` (el next_cursor de la respuesta anterior) se pagina por la
+    columna de orden más el id en lugar de OFFSET. El total es exacto salvo
+    que se pida otra `estrategia_total` (ver EstrategiaTotal).
+    """
+
+    # Construir filtros comunes
+    filters = build_venta_filters(search, estado, fecha_desde, fecha_hasta)
 
     # Consulta para obtener listado
     statement = (
@@ -155,36 +344,29 @@ def get_ventas(
         statement = statement.where(*filters)
 
     # Ordenamiento dinámico
-    col = None
-    if sort_by:
-        if hasattr(Venta, sort_by):
-            col = getattr(Venta, sort_by)
-        elif sort_by == "cliente_nombre":
-            col = Cliente.nombre
-        elif sort_by == "usuario_nombre":
-            col = Usuario.nombre
-
-    if col is not None:
-        statement = statement.order_by(
-            asc(col) if sort_order == "asc" else desc(col)
-        )
-    else:
-        statement = statement.order_by(desc(Venta.fecha))
-
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
-
-    ventas = db.exec(statement).all()
-
-    return PagedResponse(
-        total=total,
+    col = get_venta_sort_column(sort_by)
+    if col is None:
+        col, sort_order = Venta.fecha, "desc"
+
+    # Paginación (OFFSET o cursor) con el id como desempate
+    pagina = paginar_por_cursor(
+        db,
+        statement,
+        col,
+        Venta.id,
+        lambda v: get_venta_sort_value(v, sort_by),
+        sort_order=sort_order,
+        page=page,
         page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=ventas
+        cursor=cursor,
+        include_total=include_total,
+        estrategia=estrategia_total
     )
 
+    return respuesta_paginada(pagina, page, page_size)
+
 
+@transaccional
 def update_venta(db: Session, venta_id: int, venta_data: VentaUpdate) -> VentaUpdateRead:
     """Actualiza una venta existente."""
     venta = db.exec(
@@ -200,35 +382,32 @@ def update_venta(db: Session, venta_id: int, venta_data: VentaUpdate) -> VentaUp
         ).first()
         if not cliente:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        venta.cliente_id = cliente.id
+        venta.cliente = cliente
     if venta_data.estado is not None:
         venta.estado = venta_data.estado
 
     db.add(venta)
     db.commit()
-    db.refresh(venta)
     return venta
 
 
+@transaccional
 def delete_venta(db: Session, venta_id: int, current_user: Usuario) -> bool:
     """
     Elimina una venta y todos sus detalles,
     devolviendo el stock al inventario.
     """
-    # Cargar venta con detalles y productos
-    venta = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.detalle_ventas)
-        )
-        .where(Venta.id == venta_id)
-    ).first()
+    venta = db.get(Venta, venta_id)
 
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
-    
-    if venta.detalle_ventas:
-        raise HTTPException(status_code=400, detail="No se puede eliminar, tiene relaciones activas")
+
+    # Relaciones que bloquean el borrado; los movimientos guardan la venta
+    verificar_sin_relaciones(
+        db,
+        DetalleVenta.venta_id == venta_id,
+        MovimientoInventario.venta_id == venta_id
+    )
 
     # Eliminar la venta
     db.delete(venta)
@@ -267,10 +446,11 @@ def get_numero_ventas_ultimos_30_dias(db: Session) -> VentaTotalResponse:
     return VentaTotalResponse(total=cantidad)
 
 
+@transaccional
 def change_estado_venta(db: Session, venta_id: int) -> VentaDetailRead:
     
     """Desactiva un venta en la base de datos."""
-    venta = db.get(Venta, venta_id)
+    venta = _cargar_venta(db, venta_id)
     
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
@@ -279,14 +459,194 @@ def change_estado_venta(db: Session, venta_id: int) -> VentaDetailRead:
     venta.estado = not venta.estado
 
     db.commit()
-    db.refresh(venta)
 
     return VentaDetailRead.model_validate(venta)
 
+@transaccional
+def anular_venta(db: Session, venta_id: int, current_user: Usuario) -> VentaDetailRead:
+    """
+    Anula la venta completa en una sola transacción: devuelve el stock de todas
+    sus líneas con un único UPDATE unido a los detalles agrupados por producto,
+    registra las anulaciones por lote, elimina las líneas y desactiva la venta.
+    El número de consultas no depende de cuántas líneas tenga.
+    """
+    venta = db.exec(
+        select(Venta)
+        .options(selectinload(Venta.cliente), selectinload(Venta.usuario))
+        .where(Venta.id == venta_id)
+        .with_for_update(of=Venta)
+        .execution_options(populate_existing=True)
+    ).first()
+
+    if not venta:
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
+
+    if not venta.estado:
+        raise HTTPException(status_code=400, detail="Venta inactiva")
+
+    # 1. Líneas con su reserva (si están en borrador) y si el producto tiene franjas
+    con_franjas = exists().where(InventarioFranja.inventario_id == Inventario.id)
+    lineas = db.exec(
+        select(DetalleVenta.producto_id, DetalleVenta.cantidad, ReservaStock.id, con_franjas)
+        .outerjoin(Inventario, Inventario.producto_id == DetalleVenta.producto_id)
+        .outerjoin(ReservaStock, ReservaStock.detalle_venta_id == DetalleVenta.id)
+        .where(DetalleVenta.venta_id == venta_id)
+        .order_by(DetalleVenta.id)
+    ).all()
+
+    if lineas:
+        repartidos: dict = {}
+        for producto_id, cantidad, _, repartido in lineas:
+            if repartido:
+                repartidos[producto_id] = repartidos.get(producto_id, 0) + cantidad
+
+        # 2. Devolver el stock: UPDATE inventario ... JOIN (detalles agrupados);
+        # los productos con contadores repartidos lo reciben en una franja
+        devoluciones = (
+            select(DetalleVenta.producto_id, func.sum(DetalleVenta.cantidad).label("cantidad"))
+            .where(DetalleVenta.venta_id == venta_id)
+            .group_by(DetalleVenta.producto_id)
+        )
+        if repartidos:
+            devoluciones = devoluciones.where(DetalleVenta.producto_id.not_in(list(repartidos)))
+        devoluciones = devoluciones.subquery()
+
+        db.execute(
+            update(Inventario)
+            .where(Inventario.producto_id == devoluciones.c.producto_id)
+            .values(cantidad=Inventario.cantidad + devoluciones.c.cantidad)
+            .execution_options(synchronize_session=False)
+        )
+        for producto_id in sorted(repartidos):
+            sumar_stock(db, producto_id, repartidos[producto_id])
+
+        # 3. Anulaciones por lote; las líneas en borrador no registraron la venta
+        confirmadas = [(producto_id, cantidad) for producto_id, cantidad, reserva_id, _ in lineas if reserva_id is None]
+        if confirmadas:
+            stock = dict(db.exec(
+                select(Inventario.producto_id, Inventario.cantidad_total)
+                .where(Inventario.producto_id.in_({producto_id for producto_id, _ in confirmadas}))
+            ).all())
+
+            # Cada línea registra el stock tras devolverla, en el orden de las
+            # líneas: el total final menos lo que devuelven las siguientes
+            posterior: dict = {}
+            cantidades_inventario = []
+            for producto_id, cantidad, reserva_id, _ in reversed(lineas):
+                if reserva_id is None:
+                    cantidades_inventario.append(stock[producto_id] - posterior.get(producto_id, 0))
+                posterior[producto_id] = posterior.get(producto_id, 0) + cantidad
+            cantidades_inventario.reverse()
+
+            fecha = datetime.now(timezone.utc)
+            db.execute(insert(MovimientoInventario), [
+                {
+                    "producto_id": producto_id,
+                    "tipo": TipoMovimientoEnum.ANULACIÓN_VENTA,
+                    "cantidad": cantidad,
+                    "cantidad_inventario": cantidad_inventario,
+                    "fecha": fecha,
+                    "usuario_id": current_user.id,
+                    "venta_id": venta_id
+                }
+                for (producto_id, cantidad), cantidad_inventario in zip(confirmadas, cantidades_inventario)
+            ])
+
+        # 4. Eliminar reservas y líneas
+        if len(confirmadas) < len(lineas):
+            db.execute(
+                delete(ReservaStock)
+                .where(ReservaStock.venta_id == venta_id)
+                .execution_options(synchronize_session=False)
+            )
+        db.execute(
+            delete(DetalleVenta)
+            .where(DetalleVenta.venta_id == venta_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    # 5. Cerrar la venta
+    venta.total = Decimal(0)
+    venta.estado = False
+    db.add(venta)
+    db.commit()
+    set_committed_value(venta, "detalle_ventas", [])
+
+    return VentaDetailRead.model_validate(venta)
+
+def _sumar_al_total(db: Session, venta: Venta, diferencia: Decimal) -> None:
+    """
+    Ajusta el total de la venta en la base de datos
+    (UPDATE venta SET total = total + :diferencia), sin cargar sus líneas,
+    y deja en el objeto el total resultante para la respuesta.
+    """
+    if not diferencia:
+        return
+    statement = (
+        update(Venta)
+        .where(Venta.id == venta.id)
+        .values(total=func.coalesce(Venta.total, 0) + diferencia)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.get_bind().dialect.update_returning:
+        total = db.execute(statement.returning(Venta.total)).scalar_one()
+    else:
+        # Sin RETURNING (MySQL): la fila queda bloqueada por el UPDATE hasta el commit
+        db.execute(statement)
+        total = db.exec(select(Venta.total).where(Venta.id == venta.id)).one()
+
+    set_committed_value(venta, "total", total)
+
+
+def recalcular_totales(db: Session) -> int:
+    """
+    Corrige el total de todas las ventas que no coincide con la suma de sus
+    líneas: un UPDATE unido a los detalles agrupados por venta y otro para las
+    ventas sin líneas. Retorna cuántas ventas se corrigieron.
+    """
+    sumas = (
+        select(
+            DetalleVenta.venta_id,
+            func.sum(DetalleVenta.precio_unitario * DetalleVenta.cantidad).label("total")
+        )
+        .group_by(DetalleVenta.venta_id)
+        .subquery()
+    )
+    corregidas = db.execute(
+        update(Venta)
+        .where(Venta.id == sumas.c.venta_id)
+        .where(or_(Venta.total.is_(None), Venta.total != sumas.c.total))
+        .values(total=sumas.c.total)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    corregidas += db.execute(
+        update(Venta)
+        .where(or_(Venta.total.is_(None), Venta.total != 0))
+        .where(~exists().where(DetalleVenta.venta_id == Venta.id))
+        .values(total=Decimal(0))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    db.commit()
+    return corregidas
+
 # CRUD para DetalleVenta
 
-def add_detalle_venta(db: Session, venta_id: int, detalle_data: DetalleVentaCreate, current_user: Usuario) -> Venta:
-    """Agrega un nuevo detalle a una venta, actualiza inventario, total y registra el movimiento."""
+@transaccional
+def add_detalle_venta(
+    db: Session,
+    venta_id: int,
+    detalle_data: DetalleVentaCreate,
+    current_user: Usuario,
+    reservar: bool = False
+) -> Venta:
+    """
+    Agrega un nuevo detalle a una venta, actualiza inventario, total y registra el movimiento.
+    Con `reservar` la línea queda en borrador: el stock se aparta hasta que la
+    venta se confirme o la reserva venza, sin registrar movimiento todavía.
+    """
 
     # 1. Obtener inventario del producto
     inventario = db.exec(
@@ -294,12 +654,13 @@ def add_detalle_venta(db: Session, venta_id: int, detalle_data: DetalleVentaCrea
         .where(Inventario.producto_id == detalle_data.producto_id)
         .options(selectinload(Inventario.producto))
     ).first()
-    
-    venta = db.exec(
-        select(Venta)
-        .where(Venta.id == venta_id)
-    ).first()
-    
+
+    # La venta se carga con todo lo que necesita la respuesta
+    venta = _cargar_venta(db, venta_id)
+
+    if not venta:
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
+
     if not venta.estado:
         raise HTTPException(status_code=400, detail="Venta inactiva")
 
@@ -311,16 +672,17 @@ def add_detalle_venta(db: Session, venta_id: int, detalle_data: DetalleVentaCrea
     if not inventario.estado or not inventario.producto.estado:
         raise HTTPException(status_code=400, detail=f"Producto: {producto_nombre} inactivo")
 
-    # 2. Validar stock
-    if inventario.cantidad < detalle_data.cantidad:
+    # 2. Descontar stock solo si alcanza (un único UPDATE condicional)
+    cantidad_inventario = descontar_stock(db, detalle_data.producto_id, detalle_data.cantidad)
+    if cantidad_inventario is None:
         raise HTTPException(
             status_code=400,
-            detail=f"Stock insuficiente para producto={producto_nombre}. Disponible: {inventario.cantidad}, requerido: {detalle_data.cantidad}"
+            detail=f"Stock insuficiente para producto={producto_nombre}. Disponible: {stock_disponible(db, detalle_data.producto_id)}, requerido: {detalle_data.cantidad}"
         )
 
     # Si no se especifica precio unitario, usar el del producto
     if detalle_data.precio_unitario is None:
-        precio = inventario.producto.precio_unitario
+        precio = Decimal(str(inventario.producto.precio_unitario))
     else:
         precio = detalle_data.precio_unitario
     
@@ -329,59 +691,63 @@ def add_detalle_venta(db: Session, venta_id: int, detalle_data: DetalleVentaCrea
         venta_id=venta_id,
         producto_id=detalle_data.producto_id,
         cantidad=detalle_data.cantidad,
-        precio_unitario=precio
-    )
-
-    # 4. Actualizar inventario
-    inventario.cantidad -= detalle_data.cantidad
-
-    # 5. Actualizar total de la venta
-    venta = db.exec(select(Venta).where(Venta.id == venta_id)).first()
-    if not venta:
-        raise HTTPException(status_code=404, detail="Venta no encontrada")
-
-    venta.total = (venta.total or Decimal(0)) + Decimal(precio * detalle_data.cantidad)
-
-    # 6. Registrar movimiento de inventario
-    movimiento = MovimientoInventario(
-        producto_id=detalle_data.producto_id,
-        tipo=TipoMovimientoEnum.VENTA,
-        cantidad=detalle_data.cantidad,
-        cantidad_inventario=inventario.cantidad,
-        fecha=datetime.now(timezone.utc),
-        usuario_id=current_user.id,
-        venta_id=venta_id 
+        precio_unitario=precio,
+        producto=inventario.producto
     )
+    venta.detalle_ventas.append(nuevo_detalle)
+
+    # 4. Actualizar total de la venta
+    _sumar_al_total(db, venta, Decimal(precio * detalle_data.cantidad))
+
+    # 5. Registrar movimiento de inventario, o reservar el stock si es un borrador
+    if reservar:
+        db.flush()
+        expira = vencimiento_reserva()
+        # Cada línea nueva renueva la vigencia de todo el borrador
+        db.execute(
+            update(ReservaStock)
+            .where(ReservaStock.venta_id == venta_id)
+            .values(expira=expira)
+            .execution_options(synchronize_session=False)
+        )
+        db.add(ReservaStock(
+            venta_id=venta_id,
+            detalle_venta_id=nuevo_detalle.id,
+            producto_id=detalle_data.producto_id,
+            cantidad=detalle_data.cantidad,
+            cantidad_inventario=cantidad_inventario,
+            expira=expira
+        ))
+    else:
+        db.add(MovimientoInventario(
+            producto_id=detalle_data.producto_id,
+            tipo=TipoMovimientoEnum.VENTA,
+            cantidad=detalle_data.cantidad,
+            cantidad_inventario=cantidad_inventario,
+            fecha=datetime.now(timezone.utc),
+            usuario_id=current_user.id,
+            venta_id=venta_id
+        ))
 
-    # 7. Guardar cambios
-    db.add(nuevo_detalle)
-    db.add(inventario)
-    db.add(venta)
-    db.add(movimiento)
+    # 6. Guardar cambios
     db.commit()
 
-    # 8. Recargar la venta con todos los datos
-    venta = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario)
-        )
-        .where(Venta.id == venta_id)
-    ).first()
-
     return venta
 
 
+@transaccional
 def update_detalle_venta(db: Session, detalle_id: int, detalle_data: DetalleVentaUpdate, current_user: Usuario) -> Venta:
     """Actualiza un detalle de venta, ajusta inventario, total y registra movimientos."""
 
-    # 1. Obtener el detalle existente
+    # 1. Obtener el detalle existente con la venta completa para la respuesta
     detalle = db.exec(
         select(DetalleVenta)
         .where(DetalleVenta.id == detalle_id)
-        .options(selectinload(DetalleVenta.producto), selectinload(DetalleVenta.venta))
+        .options(
+            selectinload(DetalleVenta.venta).selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
+            selectinload(DetalleVenta.venta).selectinload(Venta.cliente),
+            selectinload(DetalleVenta.venta).selectinload(Venta.usuario)
+        )
     ).first()
 
     if not detalle:
@@ -405,76 +771,87 @@ def update_detalle_venta(db: Session, detalle_id: int, detalle_data: DetalleVent
     if not inventario:
         raise HTTPException(status_code=404, detail="Inventario no encontrado para producto actual")
 
+    # Las líneas en borrador ajustan su reserva en vez de registrar movimientos
+    reserva = db.exec(
+        select(ReservaStock).where(ReservaStock.detalle_venta_id == detalle_id)
+    ).first()
+    movimientos: List[MovimientoInventario] = []
+    # Stock que deja el último descuento del producto de la línea
+    cantidad_reserva: Optional[int] = None
+
     cantidad_original = detalle.cantidad
+    subtotal_original = detalle.precio_unitario * cantidad_original
     nueva_cantidad = detalle_data.cantidad if detalle_data.cantidad is not None else cantidad_original
 
     # 2. Si cambia de producto
     if detalle_data.producto_id and detalle_data.producto_id != detalle.producto_id:
-        # Devolver stock original y registrar movimiento
-        inventario.cantidad += cantidad_original
-        db.add(inventario)
-        db.add(MovimientoInventario(
-            producto_id=detalle.producto_id,
-            tipo=TipoMovimientoEnum.ANULACIÓN_VENTA,
-            cantidad=cantidad_original,
-            cantidad_inventario=inventario.cantidad,
-            fecha=datetime.now(timezone.utc),
-            usuario_id=current_user.id,
-            venta_id=venta.id
-        ))
-
-        # Restar stock del nuevo producto y registrar movimiento
         nuevo_inventario = db.exec(
-            select(Inventario).where(Inventario.producto_id == detalle_data.producto_id)
+            select(Inventario)
+            .where(Inventario.producto_id == detalle_data.producto_id)
+            .options(selectinload(Inventario.producto))
         ).first()
         if not nuevo_inventario:
             raise HTTPException(status_code=404, detail="Inventario no encontrado para nuevo producto")
 
-        if nuevo_inventario.cantidad < nueva_cantidad:
+        # Restar stock del nuevo producto primero: si no alcanza no se ha escrito nada
+        cantidad_nuevo = descontar_stock(db, detalle_data.producto_id, nueva_cantidad)
+        if cantidad_nuevo is None:
             raise HTTPException(status_code=400, detail="Stock insuficiente para el nuevo producto")
+        cantidad_reserva = cantidad_nuevo
 
-        nuevo_inventario.cantidad -= nueva_cantidad
-        db.add(nuevo_inventario)
-        db.add(MovimientoInventario(
+        # Devolver stock original y registrar ambos movimientos
+        cantidad_original_inventario = sumar_stock(db, detalle.producto_id, cantidad_original)
+        movimientos.append(MovimientoInventario(
+            producto_id=detalle.producto_id,
+            tipo=TipoMovimientoEnum.ANULACIÓN_VENTA,
+            cantidad=cantidad_original,
+            cantidad_inventario=cantidad_original_inventario,
+            fecha=datetime.now(timezone.utc),
+            usuario_id=current_user.id,
+            venta_id=venta.id
+        ))
+        movimientos.append(MovimientoInventario(
             producto_id=detalle_data.producto_id,
             tipo=TipoMovimientoEnum.VENTA,
             cantidad=nueva_cantidad,
-            cantidad_inventario=nuevo_inventario.cantidad,
+            cantidad_inventario=cantidad_nuevo,
             fecha=datetime.now(timezone.utc),
             usuario_id=current_user.id,
             venta_id=venta.id
         ))
 
         detalle.producto_id = detalle_data.producto_id
+        detalle.producto = nuevo_inventario.producto
 
     else:
         # 3. Si es el mismo producto y cambia cantidad
         diferencia_cantidad = nueva_cantidad - cantidad_original
         if diferencia_cantidad > 0:
-            if inventario.cantidad < diferencia_cantidad:
+            cantidad_inventario = descontar_stock(db, detalle.producto_id, diferencia_cantidad)
+            if cantidad_inventario is None:
                 raise HTTPException(status_code=400, detail="Stock insuficiente para incrementar cantidad")
-            inventario.cantidad -= diferencia_cantidad
-            db.add(MovimientoInventario(
+            cantidad_reserva = cantidad_inventario
+            movimientos.append(MovimientoInventario(
                 producto_id=detalle.producto_id,
                 tipo=TipoMovimientoEnum.VENTA,
                 cantidad=diferencia_cantidad,
-                cantidad_inventario=inventario.cantidad,
+                cantidad_inventario=cantidad_inventario,
                 fecha=datetime.now(timezone.utc),
                 usuario_id=current_user.id,
                 venta_id=venta.id
             ))
         elif diferencia_cantidad < 0:
-            inventario.cantidad += abs(diferencia_cantidad)
-            db.add(MovimientoInventario(
+            cantidad_inventario = sumar_stock(db, detalle.producto_id, abs(diferencia_cantidad))
+            cantidad_reserva = cantidad_inventario
+            movimientos.append(MovimientoInventario(
                 producto_id=detalle.producto_id,
                 tipo=TipoMovimientoEnum.ANULACIÓN_VENTA,
                 cantidad=abs(diferencia_cantidad),
-                cantidad_inventario=inventario.cantidad,
+                cantidad_inventario=cantidad_inventario,
                 fecha=datetime.now(timezone.utc),
                 usuario_id=current_user.id,
                 venta_id=venta.id
             ))
-        db.add(inventario)
 
     # 4. Actualizar campos del detalle
     if detalle_data.cantidad is not None:
@@ -482,37 +859,38 @@ def update_detalle_venta(db: Session, detalle_id: int, detalle_data: DetalleVent
     if detalle_data.precio_unitario is not None:
         detalle.precio_unitario = detalle_data.precio_unitario
 
-    # 5. Recalcular total
-    venta.total = sum(
-        d.precio_unitario * d.cantidad for d in venta.detalle_ventas
-    )
+    if reserva:
+        reserva.producto_id = detalle.producto_id
+        reserva.cantidad = detalle.cantidad
+        if cantidad_reserva is not None:
+            reserva.cantidad_inventario = cantidad_reserva
+        reserva.expira = vencimiento_reserva()
+        db.add(reserva)
+    else:
+        db.add_all(movimientos)
+
+    # 5. Ajustar el total con la diferencia del subtotal de la línea
+    _sumar_al_total(db, venta, detalle.precio_unitario * detalle.cantidad - subtotal_original)
 
     db.add(detalle)
-    db.add(venta)
     db.commit()
 
-    # 6. Recargar venta completa para respuesta
-    venta = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario)
-        )
-        .where(Venta.id == venta.id)
-    ).first()
-
     return venta
 
 
+@transaccional
 def delete_detalle_venta(db: Session, detalle_id: int, current_user: Usuario) -> Venta:
     """Elimina un detalle de venta, devuelve el stock, recalcula el total y registra el movimiento."""
 
-    # 1. Obtener el detalle existente
+    # 1. Obtener el detalle existente con la venta completa para la respuesta
     detalle = db.exec(
         select(DetalleVenta)
         .where(DetalleVenta.id == detalle_id)
-        .options(selectinload(DetalleVenta.producto), selectinload(DetalleVenta.venta))
+        .options(
+            selectinload(DetalleVenta.venta).selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
+            selectinload(DetalleVenta.venta).selectinload(Venta.cliente),
+            selectinload(DetalleVenta.venta).selectinload(Venta.usuario)
+        )
     ).first()
 
     if not detalle:
@@ -526,48 +904,82 @@ def delete_detalle_venta(db: Session, detalle_id: int, current_user: Usuario) ->
         raise HTTPException(satatus_code=400, detail="Venta inactiva")
 
     # 2. Devolver stock del producto
-    inventario = db.exec(
-        select(Inventario).where(Inventario.producto_id == detalle.producto_id)
-    ).first()
-    if inventario:
-        inventario.cantidad += detalle.cantidad
-        db.add(inventario)
-
-    # 3. Registrar movimiento de inventario (anulación de venta)
-    movimiento = MovimientoInventario(
-        producto_id=detalle.producto_id,
-        tipo=TipoMovimientoEnum.ANULACIÓN_VENTA,
-        cantidad=detalle.cantidad,
-        cantidad_inventario=inventario.cantidad,
-        fecha=datetime.now(timezone.utc),
-        usuario_id=current_user.id,
-        venta_id=venta.id
-    )
-    db.add(movimiento)
+    cantidad_inventario = sumar_stock(db, detalle.producto_id, detalle.cantidad)
+
+    # 3. Registrar movimiento de inventario (anulación de venta); una línea en
+    # borrador no registró la venta, solo se libera su reserva
+    reservada = db.execute(
+        delete(ReservaStock)
+        .where(ReservaStock.detalle_venta_id == detalle_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not reservada:
+        db.add(MovimientoInventario(
+            producto_id=detalle.producto_id,
+            tipo=TipoMovimientoEnum.ANULACIÓN_VENTA,
+            cantidad=detalle.cantidad,
+            cantidad_inventario=cantidad_inventario,
+            fecha=datetime.now(timezone.utc),
+            usuario_id=current_user.id,
+            venta_id=venta.id
+        ))
 
     # 4. Eliminar detalle de la venta
+    venta.detalle_ventas.remove(detalle)
     db.delete(detalle)
 
-    # 5. Recalcular total de la venta
-    venta.total = sum(
-        d.precio_unitario * d.cantidad
-        for d in venta.detalle_ventas
-        if d.id != detalle_id  # evitar usar el detalle eliminado
-    )
+    # 5. Descontar la línea del total de la venta
+    _sumar_al_total(db, venta, -(detalle.precio_unitario * detalle.cantidad))
 
-    db.add(venta)
     db.commit()
 
-    # 6. Recargar venta completa para respuesta
-    venta = db.exec(
-        select(Venta)
-        .options(
-            selectinload(Venta.detalle_ventas).selectinload(DetalleVenta.producto),
-            selectinload(Venta.cliente),
-            selectinload(Venta.usuario)
-        )
-        .where(Venta.id == venta.id)
-    ).first()
+    return venta
+
+
+@transaccional
+def confirmar_venta(db: Session, venta_id: int, current_user: Usuario) -> Venta:
+    """
+    Confirma las líneas en borrador de la venta: convierte sus reservas en
+    movimientos de venta con una sola inserción y elimina las reservas.
+    """
+    venta = _cargar_venta(db, venta_id)
+    if not venta:
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
+
+    if not venta.estado:
+        raise HTTPException(status_code=400, detail="Venta inactiva")
+
+    # Bloquear las reservas para que el barrido no las libere mientras tanto
+    reservas = db.exec(
+        select(ReservaStock)
+        .where(ReservaStock.venta_id == venta_id)
+        .order_by(ReservaStock.id)
+        .with_for_update()
+    ).all()
+    if not reservas:
+        raise HTTPException(status_code=400, detail="La venta no tiene líneas reservadas")
+
+    # El stock ya se descontó al reservar: cada movimiento registra el valor
+    # que retornó el UPDATE condicional de su propia reserva
+    fecha = datetime.now(timezone.utc)
+    db.execute(insert(MovimientoInventario), [
+        {
+            "producto_id": reserva.producto_id,
+            "tipo": TipoMovimientoEnum.VENTA,
+            "cantidad": reserva.cantidad,
+            "cantidad_inventario": reserva.cantidad_inventario,
+            "fecha": fecha,
+            "usuario_id": current_user.id,
+            "venta_id": venta_id
+        }
+        for reserva in reservas
+    ])
+    db.execute(
+        delete(ReservaStock)
+        .where(ReservaStock.venta_id == venta_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
 
     return venta
 
@@ -579,7 +991,8 @@ def get_detalles_venta_by_venta_id(
     page: int = 1,
     page_size: int = 10,
     sort_by: Optional[str] = None,
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    include_total: bool = True
 ) -> PagedResponse[DetalleVentaRead]:
     """
     Obtiene ventas con filtros, búsqueda, paginación y ordenamiento dinámico.
@@ -610,20 +1023,6 @@ def get_detalles_venta_by_venta_id(
             )
         )
 
-    # Consulta para contar total
-    count_stmt = (
-        select(func.count(DetalleVenta.id))
-        .join(DetalleVenta.producto)
-    )
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-
-    total = db.exec(count_stmt).one()
-
-    # Calcular páginas
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
-
     # Consulta para obtener listado
     statement = (
         select(DetalleVenta)
@@ -651,18 +1050,10 @@ def get_detalles_venta_by_venta_id(
     else:
         statement = statement.order_by(desc(DetalleVenta.id))
 
-    # Paginación
-    statement = statement.offset(offset).limit(page_size)
-
-    detalles_venta = db.exec(statement).all()
+    # Paginación con el total en la misma consulta
+    pagina = paginar(db, statement, page, page_size, include_total)
 
-    return PagedResponse(
-        total=total,
-        page_size=page_size,
-        current_page=page,
-        total_pages=total_pages,
-        items=detalles_venta
-    )
+    return respuesta_paginada(pagina, page, page_size)
 
 
 def get_detalle_venta_by_id(db: Session, detalle_id: int) -> DetalleVentaRead:
@@ -1,4 +1,7 @@
 import pytest
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
 
 from app.models.cliente import Cliente, TipoPersona
@@ -11,6 +14,11 @@ from app.models.venta import Venta
 from app.models.detalle_venta import DetalleVenta
 from app.models.categoria import Categoria
 from app.core.security import get_password_hash
+from app.services.paginacion import limpiar_cache_totales
+from app.services.usuario_cache_service import limpiar_cache_usuarios
+from app.services.usuario_token_service import limpiar_tabla_tokens
+from app.services.transaccion import limpiar_estadisticas_reintentos
+from app.services.stock import limpiar_cache_franjas
 
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -31,11 +39,63 @@ def session(engine):
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
 
-    with Session(engine) as session:
+    # Los totales de los listados y los usuarios autenticados se guardan entre llamadas
+    limpiar_cache_totales()
+    limpiar_cache_usuarios()
+    limpiar_tabla_tokens()
+    limpiar_estadisticas_reintentos()
+    limpiar_cache_franjas()
+
+    # Igual que get_session: los objetos no se expiran al hacer commit
+    with Session(engine, expire_on_commit=False) as session:
         yield session
         session.close()
 
 
+# -------------------------------
+# Conteo de consultas
+# -------------------------------
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL que emite el motor de pruebas durante un bloque."""
+
+    def __init__(self, engine, session: Session):
+        self.engine = engine
+        self.session = session
+
+    @contextmanager
+    def maximo(self, limite: int) -> Iterator[List[str]]:
+        """
+        Falla si el bloque emite más de `limite` sentencias. El presupuesto
+        cubre el servicio y la serialización de su respuesta, donde aparecen
+        las cargas perezosas (N+1). Entrega la lista de sentencias emitidas.
+
+        El bloque empieza con la sesión vacía, como una petición nueva: si los
+        objetos de los fixtures siguieran en ella, las cargas perezosas se
+        resolverían sin consultar y el presupuesto no las vería.
+        """
+        self.session.expunge_all()
+        sentencias: List[str] = []
+
+        def registrar(conn, cursor, statement, *args):
+            sentencias.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", registrar)
+        try:
+            yield sentencias
+        finally:
+            event.remove(self.engine, "before_cursor_execute", registrar)
+
+        detalle = "\n".join(f"  {' '.join(sql.split())}" for sql in sentencias)
+        assert len(sentencias) <= limite, f"{len(sentencias)} consultas, presupuesto {limite}:\n{detalle}"
+
+
+@pytest.fixture
+def consultas(engine, session) -> ContadorConsultas:
+    """Presupuestos de consultas por llamada: `with consultas.maximo(3): servicio(...)`."""
+    return ContadorConsultas(engine, session)
+
+
 # -------------------------------
 # Fixtures entidades
 # -------------------------------
@@ -384,7 +384,7 @@ class TestGetCategoriasInfinito:
     
     def test_get_categorias_infinito_basico(self, session: Session, categoria_fixture):
         """Debe devolver categorías activas para infinite scroll."""
-        result = get_categorias_infinito(session)
+        result = get_categorias_infinito(session).filas
         
         assert len(result) == 1
         assert result[0].id == categoria_fixture.id
@@ -401,28 +401,28 @@ class TestGetCategoriasInfinito:
         session.add_all(categorias)
         session.commit()
         
-        result = get_categorias_infinito(session)
+        result = get_categorias_infinito(session).filas
         
         assert len(result) == 1
         assert result[0].nombre == "Activa"
     
     def test_get_categorias_infinito_busqueda(self, session: Session, categorias_fixture):
         """Debe filtrar categorías por búsqueda."""
-        result = get_categorias_infinito(session, search="Herram")
+        result = get_categorias_infinito(session, search="Herram").filas
         
         assert len(result) == 1
         assert result[0].nombre == "Herramientas"
     
     def test_get_categorias_infinito_busqueda_case_insensitive(self, session: Session, categorias_fixture):
         """Debe buscar sin considerar mayúsculas/minúsculas."""
-        result = get_categorias_infinito(session, search="epp")
+        result = get_categorias_infinito(session, search="epp").filas
         
         assert len(result) == 1
         assert result[0].nombre == "EPP"
     
     def test_get_categorias_infinito_orden_alfabetico(self, session: Session, categorias_fixture):
         """Debe devolver categorías en orden alfabético."""
-        result = get_categorias_infinito(session)
+        result = get_categorias_infinito(session).filas
         
         nombres = [cat.nombre for cat in result]
         assert nombres == sorted(nombres)
@@ -431,7 +431,7 @@ class TestGetCategoriasInfinito:
     
     def test_get_categorias_infinito_paginacion(self, session: Session, categorias_fixture):
         """Debe paginar correctamente con skip y limit."""
-        result = get_categorias_infinito(session, skip=1, limit=2)
+        result = get_categorias_infinito(session, skip=1, limit=2).filas
         
         assert len(result) == 2
         # Como están ordenadas alfabéticamente: EPP, Herramientas, Materiales
@@ -441,9 +441,42 @@ class TestGetCategoriasInfinito:
         assert "Materiales" in nombres
         assert "EPP" not in nombres
     
+    def test_get_categorias_infinito_cursor(self, session: Session, categorias_fixture):
+        """Con cursor debe continuar después de la última categoría recibida."""
+        primera = get_categorias_infinito(session, limit=2)
+        assert primera.next_cursor
+        siguiente = get_categorias_infinito(session, limit=2, cursor=primera.next_cursor)
+
+        assert [cat.nombre for cat in primera.filas + siguiente.filas] == ["EPP", "Herramientas", "Materiales"]
+        assert siguiente.next_cursor is None
+
+    def test_get_categorias_infinito_cursor_fila_renombrada_o_eliminada(self, session: Session, categorias_fixture):
+        """El cursor guarda el nombre: cambiar o borrar la última fila entregada no altera la siguiente página."""
+        primera = get_categorias_infinito(session, limit=1)
+        (epp,) = primera.filas
+
+        categoria = session.get(Categoria, epp.id)
+        categoria.nombre = "Zapatos"
+        session.add(categoria)
+        session.commit()
+        siguiente = get_categorias_infinito(session, limit=2, cursor=primera.next_cursor)
+        assert [cat.nombre for cat in siguiente.filas] == ["Herramientas", "Materiales"]
+
+        session.delete(categoria)
+        session.commit()
+        siguiente = get_categorias_infinito(session, limit=2, cursor=primera.next_cursor)
+        assert [cat.nombre for cat in siguiente.filas] == ["Herramientas", "Materiales"]
+
+    def test_get_categorias_infinito_cursor_invalido(self, session: Session, categorias_fixture):
+        """Debe rechazar un cursor malformado."""
+        with pytest.raises(HTTPException) as exc:
+            get_categorias_infinito(session, cursor="no-es-un-cursor")
+
+        assert exc.value.status_code == 400
+
     def test_get_categorias_infinito_limite(self, session: Session, categorias_fixture):
         """Debe respetar el límite establecido."""
-        result = get_categorias_infinito(session, limit=1)
+        result = get_categorias_infinito(session, limit=1).filas
         
         assert len(result) == 1
         # Primera en orden alfabético
@@ -451,7 +484,7 @@ class TestGetCategoriasInfinito:
     
     def test_get_categorias_infinito_skip_mayor_que_total(self, session: Session, categoria_fixture):
         """Debe devolver lista vacía cuando skip es mayor que el total."""
-        result = get_categorias_infinito(session, skip=10)
+        result = get_categorias_infinito(session, skip=10).filas
         
         assert len(result) == 0
     
@@ -461,6 +494,6 @@ class TestGetCategoriasInfinito:
         session.add(categoria_inactiva)
         session.commit()
         
-        result = get_categorias_infinito(session)
+        result = get_categorias_infinito(session).filas
         
         assert len(result) == 0
\ No newline at end of file
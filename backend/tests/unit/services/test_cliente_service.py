@@ -24,9 +24,10 @@ from app.services.cliente_service import (
 class TestGetClientes:
     """Tests para la función get_clientes"""
     
-    def test_get_clientes_sin_filtros(self, session: Session, clientes_fixture):
+    def test_get_clientes_sin_filtros(self, session: Session, consultas, clientes_fixture):
         """Test obtener todos los clientes sin filtros"""
-        result = get_clientes(session)
+        with consultas.maximo(1):
+            result = get_clientes(session)
         
         assert result.total == 2
         assert result.current_page == 1
@@ -405,7 +406,7 @@ class TestGetClientesInfinito:
     
     def test_get_clientes_infinito_sin_filtros(self, session: Session, clientes_fixture):
         """Test obtener clientes para scroll infinito sin filtros"""
-        result = get_clientes_infinito(session)
+        result = get_clientes_infinito(session).filas
         
         assert len(result) == 2
         assert all(isinstance(cliente, ClienteReadSimple) for cliente in result)
@@ -417,7 +418,7 @@ class TestGetClientesInfinito:
     
     def test_get_clientes_infinito_con_search(self, session: Session, clientes_fixture):
         """Test filtro de búsqueda en scroll infinito"""
-        result = get_clientes_infinito(session, search="Juan")
+        result = get_clientes_infinito(session, search="Juan").filas
         
         assert len(result) == 1
         assert result[0].nombre == "Juan Pérez"
@@ -435,7 +436,7 @@ class TestGetClientesInfinito:
         session.add(cliente_inactivo)
         session.commit()
         
-        result = get_clientes_infinito(session)
+        result = get_clientes_infinito(session).filas
         
         assert len(result) == 2  # Solo los activos
         nombres = [cliente.nombre for cliente in result]
@@ -443,16 +444,38 @@ class TestGetClientesInfinito:
     
     def test_get_clientes_infinito_paginacion(self, session: Session, clientes_fixture):
         """Test paginación en scroll infinito"""
-        result_page1 = get_clientes_infinito(session, skip=0, limit=1)
-        result_page2 = get_clientes_infinito(session, skip=1, limit=1)
+        result_page1 = get_clientes_infinito(session, skip=0, limit=1).filas
+        result_page2 = get_clientes_infinito(session, skip=1, limit=1).filas
         
         assert len(result_page1) == 1
         assert len(result_page2) == 1
         assert result_page1[0].id != result_page2[0].id
     
+    def test_get_clientes_infinito_cursor_con_nombres_repetidos(self, session: Session, clientes_fixture):
+        """Test el cursor desempata por id cuando hay nombres repetidos"""
+        session.add_all([
+            Cliente(
+                nombre="Juan Pérez",
+                tipo_persona=TipoPersona.natural,
+                identificacion=f"55500{i}",
+                estado=True
+            )
+            for i in range(2)
+        ])
+        session.commit()
+
+        ids, cursor = [], None
+        for _ in range(4):
+            pagina = get_clientes_infinito(session, limit=1, cursor=cursor)
+            ids.extend(cliente.id for cliente in pagina.filas)
+            cursor = pagina.next_cursor
+
+        assert len(set(ids)) == 4
+        assert cursor is None
+
     def test_get_clientes_infinito_vacio(self, session: Session):
         """Test scroll infinito cuando no hay clientes"""
-        result = get_clientes_infinito(session)
+        result = get_clientes_infinito(session).filas
         
         assert len(result) == 0
         assert isinstance(result, list)
\ No newline at end of file
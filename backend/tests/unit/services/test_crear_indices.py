@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+
+from app.db.crear_indices import crear_indices_faltantes
+
+
+def _indices(engine, tabla: str) -> set:
+    return {indice["name"] for indice in inspect(engine).get_indexes(tabla)}
+
+
+class TestCrearIndices:
+    """Tests para la creación de índices sobre una base de datos existente."""
+
+    def _base_sin_indices(self, *tablas: str):
+        """Base con todas las tablas, a la que se le quitan los índices de las indicadas."""
+        engine = create_engine("sqlite:///:memory:")
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for tabla in tablas:
+                for indice in SQLModel.metadata.tables[tabla].indexes:
+                    conn.execute(text(f"DROP INDEX {indice.name}"))
+        return engine
+
+    def test_crea_los_faltantes(self):
+        """Crea solo los índices que no existen y una segunda ejecución no hace nada."""
+        engine = self._base_sin_indices("movimiento_inventario", "venta")
+
+        creados, omitidos = crear_indices_faltantes(engine)
+
+        assert "ix_movimiento_inventario_producto_id_fecha" in creados
+        assert "ix_venta_cliente_id_fecha" in creados
+        assert "ix_detalle_venta_venta_id" not in creados
+        assert omitidos == []
+        assert "ix_venta_fecha" in _indices(engine, "venta")
+        assert crear_indices_faltantes(engine) == ([], [])
+
+    def test_unico_con_duplicados(self):
+        """Si hay duplicados el índice único se omite y los demás se crean."""
+        engine = self._base_sin_indices("inventario")
+        with engine.begin() as conn:
+            conn.execute(text("PRAGMA foreign_keys = OFF"))
+            conn.execute(text(
+                "INSERT INTO inventario (producto_id, cantidad, estado) VALUES (1, 5, 1), (1, 7, 1)"
+            ))
+
+        creados, omitidos = crear_indices_faltantes(engine)
+
+        assert omitidos == ["ix_inventario_producto_id"]
+        assert creados == ["ix_inventario_estado"]
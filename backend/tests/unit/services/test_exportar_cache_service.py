@@ -0,0 +1,146 @@
+import os
+import pytest
+from decimal import Decimal
+
+from app.services.exportar_cache_service import obtener_exportacion, huella_datos
+from sqlmodel import Session
+
+from app.services.exportar_service import consulta_productos, consulta_ventas_por_cliente, consulta_inventario
+from app.services.categoria_service import update_categoria
+from app.services.producto_service import update_producto
+from app.services.stock import descontar_stock, sumar_stock
+from app.schemas.categoria import CategoriaUpdate
+from app.schemas.producto import ProductoUpdate
+from app.schemas.exportar import FormatoExportacion
+from app.core.config import settings
+from app.models.inventario import Inventario
+from app.models.producto import Producto, UnidadMedida
+from app.models.version_tabla import incrementar_versiones
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    """Usa un directorio temporal como caché de exportaciones"""
+    monkeypatch.setattr(settings, "EXPORT_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _leer(archivo) -> bytes:
+    with archivo:
+        return archivo.read()
+
+
+def _archivos(directorio) -> list:
+    return sorted(p.name for p in directorio.iterdir())
+
+
+# -------------------------------
+# Tests
+# -------------------------------
+
+class TestExportarCache:
+
+    def test_reutiliza_archivo_sin_cambios(self, session, producto_fixture, cache_dir):
+        primero = _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+        segundo = _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+
+        assert primero == segundo
+        assert len(_archivos(cache_dir)) == 1
+
+    def test_formato_distinto_genera_otro_archivo(self, session, producto_fixture, cache_dir):
+        _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+        _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.xlsx))
+
+        assert len(_archivos(cache_dir)) == 2
+
+    def test_parametros_distintos_generan_otro_archivo(self, session, producto_fixture, cache_dir):
+        _leer(obtener_exportacion(session, consulta_productos(search="a"), FormatoExportacion.csv))
+        _leer(obtener_exportacion(session, consulta_productos(search="b"), FormatoExportacion.csv))
+
+        assert len(_archivos(cache_dir)) == 2
+
+    def test_consulta_sin_version_no_se_cachea(self, session, venta_fixture, cache_dir):
+        with pytest.raises(ValueError):
+            obtener_exportacion(session, consulta_ventas_por_cliente(venta_fixture.cliente_id), FormatoExportacion.csv)
+
+    def test_actualizacion_invalida_cache(self, session, producto_fixture, cache_dir):
+        huella = huella_datos(session, consulta_productos())
+        _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+
+        update_producto(session, producto_fixture.id, ProductoUpdate(precio_unitario=999.99))
+
+        assert huella_datos(session, consulta_productos()) != huella
+        contenido = _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+        assert b"999.99" in contenido
+
+    def test_descuento_de_stock_invalida_cache(self, session, inventario_fixture, cache_dir):
+        huella = huella_datos(session, consulta_inventario())
+
+        descontar_stock(session, inventario_fixture.producto_id, 1)
+        session.commit()
+
+        assert huella_datos(session, consulta_inventario()) != huella
+
+    def test_stock_movido_entre_productos_invalida_cache(self, session, inventario_fixture, categoria_fixture, cache_dir):
+        """Sacar de un producto y sumar lo mismo a otro deja igual el total, no la huella."""
+        otro = Producto(codigo="P002", nombre="Otro", precio_unitario=Decimal("5"), unidad_medida=UnidadMedida.UNIDAD, categoria_id=categoria_fixture.id)
+        session.add(otro)
+        session.flush()
+        session.add(Inventario(producto_id=otro.id, cantidad=10))
+        session.commit()
+        huella = huella_datos(session, consulta_inventario())
+
+        descontar_stock(session, inventario_fixture.producto_id, 3)
+        sumar_stock(session, otro.id, 3)
+        session.commit()
+
+        assert huella_datos(session, consulta_inventario()) != huella
+
+    def test_venta_no_escribe_versiones(self, session, inventario_fixture, consultas, cache_dir):
+        """Los cambios de stock no tocan version_tabla: la huella los lee al exportar."""
+        with consultas.maximo(2) as sentencias:
+            descontar_stock(session, inventario_fixture.producto_id, 1)
+            session.commit()
+
+        assert not any("version_tabla" in sentencia for sentencia in sentencias)
+
+    def test_categoria_invalida_cache_de_productos(self, session, producto_fixture, cache_dir):
+        huella = huella_datos(session, consulta_productos())
+
+        update_categoria(session, producto_fixture.categoria_id, CategoriaUpdate(nombre="Renombrada"))
+
+        assert huella_datos(session, consulta_productos()) != huella
+
+    def test_escritura_de_otro_proceso_invalida_cache(self, session, engine, producto_fixture, cache_dir):
+        huella = huella_datos(session, consulta_productos())
+        session.commit()
+
+        # La versión vive en la base de datos: otro worker la ve igual
+        with Session(engine) as otra:
+            update_producto(otra, producto_fixture.id, ProductoUpdate(nombre="Renombrado"))
+
+        assert huella_datos(session, consulta_productos()) != huella
+
+    def test_rollback_no_invalida_cache(self, session, producto_fixture, cache_dir):
+        huella = huella_datos(session, consulta_productos())
+
+        producto_fixture.precio_unitario = Decimal("999.99")
+        session.add(producto_fixture)
+        incrementar_versiones(session, "producto")
+        session.rollback()
+
+        assert huella_datos(session, consulta_productos()) == huella
+
+    def test_expulsa_archivos_menos_usados(self, session, producto_fixture, cache_dir, monkeypatch):
+        _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.csv))
+        (antiguo,) = _archivos(cache_dir)
+        os.utime(cache_dir / antiguo, (0, 0))
+        monkeypatch.setattr(settings, "EXPORT_CACHE_MAX_BYTES", 1)
+
+        _leer(obtener_exportacion(session, consulta_productos(), FormatoExportacion.ndjson))
+
+        assert antiguo not in _archivos(cache_dir)
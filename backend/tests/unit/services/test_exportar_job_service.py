@@ -0,0 +1,165 @@
+import os
+import csv
+import io
+import pytest
+from concurrent.futures import Executor, Future
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+
+from app.services import exportar_job_service
+from app.services.exportar_job_service import (
+    crear_trabajo_exportacion,
+    get_trabajo_exportacion,
+    get_archivo_trabajo
+)
+from app.services.exportar_service import escribir_archivo, consulta_clientes
+from app.schemas.exportar import (
+    EstadoTrabajo,
+    FormatoExportacion,
+    TipoExportacion,
+    TrabajoExportacionCreate,
+    FiltrosExportacion
+)
+from app.core.config import settings
+from app.models.usuario import Usuario
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+
+class _EjecutorSincrono(Executor):
+    """Ejecuta cada trabajo en el mismo hilo para poder verificar el resultado"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def trabajos(monkeypatch, tmp_path, engine):
+    """Configura el servicio de trabajos con el motor de pruebas y un directorio temporal"""
+    monkeypatch.setattr(exportar_job_service, "engine", engine)
+    monkeypatch.setattr(exportar_job_service, "_executor", _EjecutorSincrono())
+    monkeypatch.setattr(exportar_job_service, "_trabajos", {})
+    monkeypatch.setattr(settings, "EXPORT_DIR", str(tmp_path))
+    return exportar_job_service._trabajos
+
+
+def _otro_usuario() -> Usuario:
+    return Usuario(id=999, nombre="Vendedor", email="vendedor@test.com", contrasena="x", rol_id=2, estado=True)
+
+
+# -------------------------------
+# Tests
+# -------------------------------
+
+class TestEscribirArchivo:
+
+    def test_escribir_archivo_csv(self, session, clientes_fixture, tmp_path):
+        ruta = tmp_path / "clientes.csv"
+        avances = []
+
+        escribir_archivo(session, consulta_clientes(), FormatoExportacion.csv, str(ruta), progreso=avances.append)
+
+        filas = list(csv.reader(io.StringIO(ruta.read_text(encoding="utf-8-sig"))))
+        assert len(filas) == len(clientes_fixture) + 1
+        assert avances[-1] == len(clientes_fixture)
+
+    def test_escribir_archivo_xlsx(self, session, cliente_fixture, tmp_path):
+        ruta = tmp_path / "clientes.xlsx"
+
+        escribir_archivo(session, consulta_clientes(), FormatoExportacion.xlsx, str(ruta))
+
+        assert ruta.stat().st_size > 0
+
+
+class TestTrabajosExportacion:
+
+    def test_crear_trabajo_completado(self, trabajos, session, clientes_fixture, usuario_fixture):
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.clientes, formato=FormatoExportacion.csv)
+
+        creado = crear_trabajo_exportacion(data, usuario_fixture)
+        trabajo = get_trabajo_exportacion(creado.id, usuario_fixture)
+
+        assert trabajo.estado == EstadoTrabajo.completado
+        assert trabajo.procesadas == len(clientes_fixture)
+        assert trabajo.total == len(clientes_fixture)
+        assert trabajo.progreso == 100.0
+        assert trabajo.tamano_bytes > 0
+
+        archivo = get_archivo_trabajo(creado.id, usuario_fixture)
+        assert os.path.exists(archivo.ruta)
+
+    def test_crear_trabajo_con_filtros(self, trabajos, session, clientes_fixture, usuario_fixture):
+        data = TrabajoExportacionCreate(
+            tipo=TipoExportacion.clientes,
+            formato=FormatoExportacion.csv,
+            filtros=FiltrosExportacion(search="Juan", fecha_desde="2024-01-01")
+        )
+
+        creado = crear_trabajo_exportacion(data, usuario_fixture)
+        trabajo = get_trabajo_exportacion(creado.id, usuario_fixture)
+
+        # fecha_desde no aplica a clientes y se ignora
+        assert trabajo.estado == EstadoTrabajo.completado
+        assert trabajo.total == 1
+
+    def test_trabajo_con_error(self, trabajos, session, usuario_fixture, monkeypatch):
+        def _falla():
+            raise RuntimeError("falló la consulta")
+
+        monkeypatch.setitem(exportar_job_service.CONSULTAS_TRABAJO, TipoExportacion.ventas, _falla)
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.ventas)
+
+        creado = crear_trabajo_exportacion(data, usuario_fixture)
+        trabajo = get_trabajo_exportacion(creado.id, usuario_fixture)
+
+        assert trabajo.estado == EstadoTrabajo.error
+        assert "falló la consulta" in trabajo.error
+
+        with pytest.raises(HTTPException) as exc:
+            get_archivo_trabajo(creado.id, usuario_fixture)
+        assert exc.value.status_code == 409
+
+    def test_usuarios_requiere_admin(self, trabajos):
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.usuarios)
+
+        with pytest.raises(HTTPException) as exc:
+            crear_trabajo_exportacion(data, _otro_usuario())
+        assert exc.value.status_code == 403
+
+    def test_trabajo_de_otro_usuario(self, trabajos, session, usuario_fixture):
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.categorias)
+        creado = crear_trabajo_exportacion(data, usuario_fixture)
+
+        with pytest.raises(HTTPException) as exc:
+            get_trabajo_exportacion(creado.id, _otro_usuario())
+        assert exc.value.status_code == 404
+
+    def test_trabajo_expirado(self, trabajos, session, usuario_fixture):
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.categorias)
+        creado = crear_trabajo_exportacion(data, usuario_fixture)
+        ruta = trabajos[creado.id].ruta
+        trabajos[creado.id].finalizado = datetime.now(timezone.utc) - timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS + 1)
+
+        with pytest.raises(HTTPException) as exc:
+            get_trabajo_exportacion(creado.id, usuario_fixture)
+        assert exc.value.status_code == 404
+        assert not os.path.exists(ruta)
+
+    def test_limite_de_tamano(self, trabajos, session, clientes_fixture, usuario_fixture, monkeypatch):
+        data = TrabajoExportacionCreate(tipo=TipoExportacion.clientes, formato=FormatoExportacion.csv)
+        primero = crear_trabajo_exportacion(data, usuario_fixture)
+        trabajos[primero.id].finalizado -= timedelta(seconds=10)
+        monkeypatch.setattr(settings, "EXPORT_JOB_MAX_BYTES", trabajos[primero.id].tamano_bytes)
+
+        segundo = crear_trabajo_exportacion(data, usuario_fixture)
+        exportar_job_service._limpiar_trabajos()
+
+        assert primero.id not in trabajos
+        assert segundo.id in trabajos
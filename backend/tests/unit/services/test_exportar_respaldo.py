@@ -0,0 +1,66 @@
+import io
+import csv
+import zipfile
+import pytest
+from contextlib import closing
+from openpyxl import load_workbook
+from openpyxl.worksheet._writer import ALL_TEMP_FILES
+from sqlalchemy import column, table
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, create_engine, select
+
+from app.services.exportar_service import Consulta, crear_respaldo, HOJAS_RESPALDO
+from app.schemas.exportar import FormatoExportacion
+
+
+# El respaldo lee cada entidad desde otra conexión (en otro hilo), por lo que
+# necesita una base de datos en archivo en lugar de SQLite en memoria.
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("respaldo") / "respaldo.db"
+    engine = create_engine(f"sqlite:///{ruta}", echo=False)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+class TestRespaldoCompleto:
+
+    def test_respaldo_excel_una_hoja_por_entidad(self, engine, session, inventario_fixture, detalle_venta_fixture, movimiento_fixture):
+        with closing(crear_respaldo(engine)) as archivo:
+            wb = load_workbook(archivo)
+
+        assert wb.sheetnames == [nombre for nombre, _ in HOJAS_RESPALDO]
+        assert wb["Inventario"].max_row == 2
+        assert wb["Detalles_venta"].max_row == 2
+        assert wb["Movimientos_inventario"].max_row == 2
+        assert wb["Usuarios"]["C2"].value == "usuario@test.com"
+
+    def test_respaldo_excel_sin_datos(self, engine, session):
+        with closing(crear_respaldo(engine)) as archivo:
+            wb = load_workbook(archivo)
+
+        for ws in wb.worksheets:
+            assert ws.max_row == 1
+
+    def test_respaldo_zip_csv(self, engine, session, clientes_fixture, producto_fixture):
+        with closing(crear_respaldo(engine, FormatoExportacion.csv)) as archivo, zipfile.ZipFile(archivo) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            clientes = archivo_zip.read("Clientes.csv").decode("utf-8")
+
+        assert sorted(nombres) == sorted(f"{nombre}.csv" for nombre, _ in HOJAS_RESPALDO)
+        assert len(list(csv.reader(io.StringIO(clientes)))) == len(clientes_fixture) + 1
+
+    def test_respaldo_error_en_consulta(self, engine, session, monkeypatch):
+        def _tabla_inexistente():
+            return Consulta(["ID"], select(column("id")).select_from(table("no_existe")), list)
+
+        monkeypatch.setattr("app.services.exportar_service.HOJAS_RESPALDO", HOJAS_RESPALDO + [("Error", _tabla_inexistente)])
+
+        temporales = list(ALL_TEMP_FILES)
+
+        with pytest.raises(OperationalError):
+            crear_respaldo(engine)
+
+        # El libro a medio escribir se descarta sin dejar temporales
+        assert ALL_TEMP_FILES == temporales
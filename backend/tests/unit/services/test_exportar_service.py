@@ -1,5 +1,14 @@
 import io
+import csv
+import json
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+import pytest
 from openpyxl import load_workbook
+from openpyxl.worksheet._writer import ALL_TEMP_FILES
+from sqlalchemy import column, table
+from sqlalchemy.exc import OperationalError
+from sqlmodel import select
 
 from app.services.exportar_service import (
     exportar_clientes,
@@ -13,7 +22,19 @@ from app.services.exportar_service import (
     exportar_movimientos_por_usuario,
     exportar_detalle_venta_por_venta_id,
     exportar_movimientos_inventario,
+    crear_excel,
+    Consulta,
+    iterar_archivo,
+    generar_csv,
+    generar_ndjson,
+    consulta_clientes,
+    consulta_ventas,
+    consulta_movimientos_inventario,
+    consulta_productos,
+    consulta_movimientos_por_producto,
 )
+from app.models.movimiento_inventario import TipoMovimientoEnum
+from app.core.config import settings
 from app.models.cliente import Cliente, TipoPersona
 from app.models.categoria import  Categoria
 from app.models.producto import Producto, UnidadMedida
@@ -24,9 +45,16 @@ from app.models.producto import Producto, UnidadMedida
 # Helpers
 # -------------------------------
 
+def _contenido(archivo) -> bytes:
+    """Lee el contenido completo del archivo exportado y lo rebobina"""
+    contenido = archivo.read()
+    archivo.seek(0)
+    return contenido
+
 def _load_excel(bytes_io: io.BytesIO):
-    """Carga un Excel de BytesIO y devuelve workbook y worksheet activo"""
-    wb = load_workbook(bytes_io)
+    """Carga un Excel de un archivo en memoria o temporal, lo cierra y devuelve workbook y worksheet activo"""
+    with closing(bytes_io):
+        wb = load_workbook(bytes_io)
     return wb, wb.active
 
 def _get_headers(ws):
@@ -39,8 +67,8 @@ def _get_row_count(ws):
 
 def _validate_excel_structure(excel_bytes, expected_headers):
     """Valida la estructura básica del Excel"""
-    assert isinstance(excel_bytes, io.BytesIO)
-    assert excel_bytes.getvalue(), "El archivo Excel está vacío"
+    assert excel_bytes.readable()
+    assert _contenido(excel_bytes), "El archivo Excel está vacío"
     
     wb, ws = _load_excel(excel_bytes)
     headers = _get_headers(ws)
@@ -368,7 +396,7 @@ class TestExportarMovimientos:
         """Test exportar movimientos por producto"""
         excel_bytes = exportar_movimientos_por_producto(session, movimiento_fixture.producto_id)
         
-        assert isinstance(excel_bytes, io.BytesIO)
+        assert excel_bytes.readable()
         wb, ws = _load_excel(excel_bytes)
         headers = _get_headers(ws)
         
@@ -382,7 +410,7 @@ class TestExportarMovimientos:
         """Test exportar movimientos por usuario"""
         excel_bytes = exportar_movimientos_por_usuario(session, movimiento_fixture.usuario_id)
         
-        assert isinstance(excel_bytes, io.BytesIO)
+        assert excel_bytes.readable()
         wb, ws = _load_excel(excel_bytes)
         headers = _get_headers(ws)
         
@@ -396,7 +424,7 @@ class TestExportarMovimientos:
         """Test exportar todos los movimientos de inventario"""
         excel_bytes = exportar_movimientos_inventario(session)
         
-        assert isinstance(excel_bytes, io.BytesIO)
+        assert excel_bytes.readable()
         wb, ws = _load_excel(excel_bytes)
         headers = _get_headers(ws)
         
@@ -410,7 +438,7 @@ class TestExportarMovimientos:
         """Test exportar movimientos de producto sin movimientos"""
         excel_bytes = exportar_movimientos_por_producto(session, producto_fixture.id)
         
-        assert isinstance(excel_bytes, io.BytesIO)
+        assert excel_bytes.readable()
         wb, ws = _load_excel(excel_bytes)
         
         # Debe tener headers pero no datos
@@ -496,9 +524,8 @@ class TestIntegridadExportacion:
     
     def test_excel_file_size_reasonable(self, session, clientes_fixture):
         """Test que el tamaño del archivo Excel sea razonable"""
-        excel_bytes = exportar_clientes(session)
-        
-        file_size = len(excel_bytes.getvalue())
+        with closing(exportar_clientes(session)) as excel_bytes:
+            file_size = len(_contenido(excel_bytes))
         
         # El archivo no debe estar vacío ni ser excesivamente grande
         assert file_size > 1000, "El archivo es muy pequeño, podría estar corrupto"
@@ -514,4 +541,133 @@ class TestIntegridadExportacion:
         
         # Verificar que la hoja activa tiene el formato esperado
         assert ws.max_column >= 7  # Número de columnas esperadas para clientes
-        assert ws.max_row >= 1     # Al menos el header
\ No newline at end of file
+        assert ws.max_row >= 1     # Al menos el header
+
+    def test_exportar_por_lotes(self, session, clientes_fixture, monkeypatch):
+        """Test que la exportación por lotes incluye todas las filas aunque el lote sea menor"""
+        monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 1)
+
+        excel_bytes = exportar_clientes(session)
+        wb, ws = _load_excel(excel_bytes)
+
+        assert _get_row_count(ws) == len(clientes_fixture)
+
+    def test_iterar_archivo_por_bloques(self, session, clientes_fixture):
+        """Test que iterar_archivo entrega el archivo completo y lo cierra al terminar"""
+        excel_bytes = exportar_clientes(session)
+        esperado = _contenido(excel_bytes)
+
+        bloques = list(iterar_archivo(excel_bytes, chunk_size=512))
+
+        assert len(bloques) > 1
+        assert b"".join(bloques) == esperado
+        assert excel_bytes.closed
+
+    def test_excel_con_error_no_deja_temporales(self, session):
+        """Test que un error a mitad de la exportación cierra el libro y borra sus temporales"""
+        consulta = Consulta(["ID"], select(column("id")).select_from(table("no_existe")), list)
+        temporales = list(ALL_TEMP_FILES)
+
+        with pytest.raises(OperationalError):
+            crear_excel(session, consulta)
+
+        assert ALL_TEMP_FILES == temporales
+
+
+# -------------------------------
+# Tests para CSV y NDJSON
+# -------------------------------
+
+class TestExportarFormatosTexto:
+    """Tests para exportación en CSV y NDJSON por bloques"""
+
+    def test_generar_csv_clientes(self, session, clientes_fixture):
+        """Test que el CSV tiene encabezados y una fila por cliente"""
+        contenido = b"".join(generar_csv(session, consulta_clientes())).decode("utf-8")
+        filas = list(csv.reader(io.StringIO(contenido)))
+
+        assert filas[0] == TestExportarClientes.EXPECTED_HEADERS
+        assert len(filas) == len(clientes_fixture) + 1
+        assert {fila[2] for fila in filas[1:]} == {c.nombre for c in clientes_fixture}
+
+    def test_generar_csv_primer_bloque_son_encabezados(self, session, clientes_fixture):
+        """Test que el primer bloque se entrega antes de leer datos"""
+        primer_bloque = next(generar_csv(session, consulta_clientes()))
+
+        assert primer_bloque.decode("utf-8").strip() == ",".join(TestExportarClientes.EXPECTED_HEADERS)
+
+    def test_generar_csv_por_lotes(self, session, clientes_fixture, monkeypatch):
+        """Test que se genera un bloque por cada lote leído"""
+        monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 1)
+
+        bloques = list(generar_csv(session, consulta_clientes()))
+
+        # Encabezados + un bloque por cliente
+        assert len(bloques) == len(clientes_fixture) + 1
+
+    def test_generar_csv_sin_datos(self, session):
+        """Test que sin datos solo se entregan los encabezados"""
+        contenido = b"".join(generar_csv(session, consulta_clientes())).decode("utf-8")
+
+        assert len(list(csv.reader(io.StringIO(contenido)))) == 1
+
+    def test_generar_ndjson_ventas(self, session, venta_fixture):
+        """Test que cada línea es un objeto JSON con los encabezados como claves"""
+        contenido = b"".join(generar_ndjson(session, consulta_ventas())).decode("utf-8")
+        lineas = contenido.splitlines()
+
+        assert len(lineas) == 1
+        venta = json.loads(lineas[0])
+        assert venta["ID"] == venta_fixture.id
+        assert venta["Cliente"] == venta_fixture.cliente.nombre
+        assert venta["Total"] == 0
+
+    def test_generar_ndjson_movimientos(self, session, movimiento_fixture):
+        """Test exportar movimientos en NDJSON con caracteres especiales"""
+        contenido = b"".join(generar_ndjson(session, consulta_movimientos_inventario())).decode("utf-8")
+        movimiento = json.loads(contenido.splitlines()[0])
+
+        assert movimiento["Código_producto"] == movimiento_fixture.producto.codigo
+        assert movimiento["Venta_id"] == "N/A"
+
+
+
+class TestExportarConFiltros:
+    """Pruebas de exportaciones con los filtros de los listados"""
+
+    def _filas(self, session, consulta):
+        contenido = b"".join(generar_csv(session, consulta)).decode("utf-8")
+        return list(csv.reader(io.StringIO(contenido)))[1:]
+
+    def test_exportar_clientes_con_busqueda(self, session, clientes_fixture):
+        """Test que la búsqueda del listado se aplica a la exportación"""
+        filas = self._filas(session, consulta_clientes(search="Juan"))
+
+        assert len(filas) == 1
+        assert filas[0][2] == "Juan Pérez"
+
+    def test_exportar_clientes_con_orden(self, session, clientes_fixture):
+        """Test que el orden solicitado se respeta en la exportación"""
+        filas = self._filas(session, consulta_clientes(sort_by="nombre", sort_order="desc"))
+        nombres = [f[2] for f in filas]
+
+        assert nombres == sorted(nombres, reverse=True)
+
+    def test_exportar_productos_por_categoria(self, session, producto_fixture):
+        """Test filtrar productos por nombre de categoría"""
+        assert len(self._filas(session, consulta_productos(categoria=producto_fixture.categoria.nombre))) == 1
+        assert self._filas(session, consulta_productos(categoria="inexistente")) == []
+
+    def test_exportar_ventas_rango_de_fechas(self, session, venta_fixture):
+        """Test filtrar ventas por rango de fechas"""
+        hoy = datetime.now(timezone.utc).date()
+
+        assert len(self._filas(session, consulta_ventas(fecha_desde=hoy - timedelta(days=1)))) == 1
+        assert self._filas(session, consulta_ventas(fecha_hasta=hoy - timedelta(days=2))) == []
+
+    def test_exportar_movimientos_por_tipo(self, session, movimiento_fixture):
+        """Test filtrar movimientos de un producto por tipo"""
+        producto_id = movimiento_fixture.producto_id
+
+        assert len(self._filas(session, consulta_movimientos_por_producto(producto_id, TipoMovimientoEnum.ENTRADA))) == 1
+        assert self._filas(session, consulta_movimientos_por_producto(producto_id, TipoMovimientoEnum.SALIDA)) == []
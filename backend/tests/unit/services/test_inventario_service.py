@@ -9,9 +9,11 @@ from app.models.movimiento_inventario import MovimientoInventario, TipoMovimient
 
 from app.schemas.inventario import (
     InventarioCantidadCreate, 
-    InventarioCantidadUpdate
+    InventarioCantidadUpdate,
+    InventarioRead,
+    InventarioReadDetail
 )
-from app.schemas.movimiento_inventario import MovimientoInventarioCreate
+from app.schemas.movimiento_inventario import MovimientoInventarioCreate, MovimientoInventarioRead
 from app.services.inventario_service import (
     get_inventarios,
     get_inventario_by_product_id,
@@ -32,9 +34,11 @@ from app.services.inventario_service import (
 class TestGetInventarios:
     """Tests para la función get_inventarios."""
     
-    def test_get_inventarios_sin_filtros(self, session: Session, inventario_fixture):
+    def test_get_inventarios_sin_filtros(self, session: Session, consultas, inventario_fixture):
         """Debe devolver todos los inventarios sin filtros aplicados."""
-        result = get_inventarios(session)
+        with consultas.maximo(2):
+            result = get_inventarios(session)
+            [InventarioRead.model_validate(item) for item in result.items]
         
         assert result.total == 1
         assert len(result.items) == 1
@@ -96,6 +100,72 @@ class TestGetInventarios:
         
         cantidades = [item.cantidad for item in result.items]
         assert cantidades == sorted(cantidades)
+
+    def test_get_movimientos_inventario_cursor_con_orden(self, session: Session, producto_fixture, usuario_fixture):
+        """El cursor debe continuar el orden solicitado con el id como desempate."""
+        session.add_all([
+            MovimientoInventario(
+                producto_id=producto_fixture.id,
+                tipo=TipoMovimientoEnum.ENTRADA,
+                cantidad=cantidad,
+                usuario_id=usuario_fixture.id
+            )
+            for cantidad in [5, 15, 5, 10]
+        ])
+        session.commit()
+
+        primera = get_movimientos_inventario(session, page_size=2, sort_by="cantidad", sort_order="desc")
+        segunda = get_movimientos_inventario(
+            session, page_size=2, sort_by="cantidad", sort_order="desc", cursor=primera.next_cursor
+        )
+
+        assert [m.cantidad for m in primera.items + segunda.items] == [15, 10, 5, 5]
+        assert segunda.items[0].id > segunda.items[1].id
+        assert segunda.next_cursor is None
+
+    def test_get_movimientos_inventario_cursor_columna_con_nulos(self, session: Session, venta_fixture, producto_fixture, usuario_fixture):
+        """Con una columna nullable, los nulos van al final y el cursor los recorre."""
+        session.add_all([
+            MovimientoInventario(
+                producto_id=producto_fixture.id,
+                tipo=TipoMovimientoEnum.VENTA,
+                cantidad=1,
+                usuario_id=usuario_fixture.id,
+                venta_id=venta_id
+            )
+            for venta_id in [None, venta_fixture.id, None]
+        ])
+        session.commit()
+
+        ventas, cursor = [], None
+        for _ in range(3):
+            result = get_movimientos_inventario(
+                session, page_size=1, sort_by="venta_id", sort_order="asc", cursor=cursor
+            )
+            ventas.extend(m.venta_id for m in result.items)
+            cursor = result.next_cursor
+
+        assert ventas == [venta_fixture.id, None, None]
+        assert cursor is None
+
+    def test_get_movimientos_inventario_cursor_invalido(self, session: Session, movimiento_fixture):
+        """Debe rechazar cursores malformados o emitidos para otro orden."""
+        with pytest.raises(HTTPException) as exc:
+            get_movimientos_inventario(session, cursor="no-es-un-cursor")
+        assert exc.value.status_code == 400
+
+        session.add(MovimientoInventario(
+            producto_id=movimiento_fixture.producto_id,
+            tipo=TipoMovimientoEnum.SALIDA,
+            cantidad=1,
+            usuario_id=movimiento_fixture.usuario_id
+        ))
+        session.commit()
+        otro_orden = get_movimientos_inventario(session, page_size=1, sort_by="cantidad")
+
+        with pytest.raises(HTTPException) as exc:
+            get_movimientos_inventario(session, page_size=1, cursor=otro_orden.next_cursor)
+        assert exc.value.status_code == 400
     
     def test_get_inventarios_paginacion(self, session: Session, categoria_fixture, inventario_fixture):
         """Debe paginar correctamente."""
@@ -219,7 +289,7 @@ class TestRegisterInventario:
 class TestRegisterEntrada:
     """Tests para la función register_entrada."""
     
-    def test_register_entrada_exitosa(self, session: Session, inventario_fixture, usuario_fixture):
+    def test_register_entrada_exitosa(self, session: Session, consultas, inventario_fixture, usuario_fixture):
         """Debe registrar una entrada correctamente."""
         cantidad_inicial = inventario_fixture.cantidad
         data = MovimientoInventarioCreate(
@@ -227,7 +297,9 @@ class TestRegisterEntrada:
             cantidad=25
         )
         
-        result = register_entrada(session, data, usuario_fixture)
+        with consultas.maximo(6):
+            result = register_entrada(session, data, usuario_fixture)
+            MovimientoInventarioRead.model_validate(result)
         
         assert result.tipo == TipoMovimientoEnum.ENTRADA
         assert result.cantidad == 25
@@ -235,9 +307,9 @@ class TestRegisterEntrada:
         assert result.usuario_id == usuario_fixture.id
         
         # Verificar que se actualizó el inventario
-        session.refresh(inventario_fixture)
-        assert inventario_fixture.cantidad == cantidad_inicial + 25
-        assert result.cantidad_inventario == inventario_fixture.cantidad
+        inventario = session.get(Inventario, inventario_fixture.id)
+        assert inventario.cantidad == cantidad_inicial + 25
+        assert result.cantidad_inventario == inventario.cantidad
     
     def test_register_entrada_producto_no_en_inventario(self, session: Session, usuario_fixture):
         """Debe lanzar excepción cuando el producto no está en inventario."""
@@ -282,7 +354,7 @@ class TestRegisterEntrada:
 class TestRegisterSalida:
     """Tests para la función register_salida."""
     
-    def test_register_salida_exitosa(self, session: Session, inventario_fixture, usuario_fixture):
+    def test_register_salida_exitosa(self, session: Session, consultas, inventario_fixture, usuario_fixture):
         """Debe registrar una salida correctamente."""
         cantidad_inicial = inventario_fixture.cantidad
         data = MovimientoInventarioCreate(
@@ -290,7 +362,9 @@ class TestRegisterSalida:
             cantidad=25
         )
         
-        result = register_salida(session, data, usuario_fixture)
+        with consultas.maximo(6):
+            result = register_salida(session, data, usuario_fixture)
+            MovimientoInventarioRead.model_validate(result)
         
         assert result.tipo == TipoMovimientoEnum.SALIDA
         assert result.cantidad == 25
@@ -298,9 +372,9 @@ class TestRegisterSalida:
         assert result.usuario_id == usuario_fixture.id
         
         # Verificar que se actualizó el inventario
-        session.refresh(inventario_fixture)
-        assert inventario_fixture.cantidad == cantidad_inicial - 25
-        assert result.cantidad_inventario == inventario_fixture.cantidad
+        inventario = session.get(Inventario, inventario_fixture.id)
+        assert inventario.cantidad == cantidad_inicial - 25
+        assert result.cantidad_inventario == inventario.cantidad
     
     def test_register_salida_stock_insuficiente(self, session: Session, inventario_fixture, usuario_fixture):
         """Debe lanzar excepción cuando no hay stock suficiente."""
@@ -332,11 +406,12 @@ class TestRegisterSalida:
 class TestGetHistorialMovimientosByProducto:
     """Tests para la función get_historial_movimientos_by_producto."""
     
-    def test_get_historial_movimientos_by_producto_basic(self, session: Session, movimiento_fixture):
+    def test_get_historial_movimientos_by_producto_basic(self, session: Session, consultas, movimiento_fixture):
         """Debe devolver movimientos del producto."""
-        result = get_historial_movimientos_by_producto(
-            session, movimiento_fixture.producto_id
-        )
+        with consultas.maximo(3):
+            result = get_historial_movimientos_by_producto(
+                session, movimiento_fixture.producto_id
+            )
         
         assert result.total == 1
         assert len(result.items) == 1
@@ -396,16 +471,43 @@ class TestGetHistorialMovimientosByProducto:
         assert len(result.items) == 2
         assert result.current_page == 1
         assert result.total_pages == 3
+        assert result.next_cursor is not None
+
+    def test_get_historial_movimientos_cursor_recorre_todo(self, session: Session, producto_fixture, usuario_fixture):
+        """Con cursor debe recorrer todos los movimientos sin repetir ni omitir."""
+        session.add_all([
+            MovimientoInventario(
+                producto_id=producto_fixture.id,
+                tipo=TipoMovimientoEnum.ENTRADA,
+                cantidad=i,
+                usuario_id=usuario_fixture.id
+            )
+            for i in range(1, 6)
+        ])
+        session.commit()
+
+        ids, cursor = [], None
+        for _ in range(3):
+            result = get_historial_movimientos_by_producto(
+                session, producto_fixture.id, page_size=2, cursor=cursor
+            )
+            ids.extend(item.id for item in result.items)
+            cursor = result.next_cursor
+
+        assert cursor is None
+        assert len(ids) == 5
+        assert len(set(ids)) == 5
 
 
 class TestGetHistorialMovimientosByUsuario:
     """Tests para la función get_historial_movimientos_by_usuario."""
     
-    def test_get_historial_movimientos_by_usuario_basic(self, session: Session, movimiento_fixture):
+    def test_get_historial_movimientos_by_usuario_basic(self, session: Session, consultas, movimiento_fixture):
         """Debe devolver movimientos del usuario."""
-        result = get_historial_movimientos_by_usuario(
-            session, movimiento_fixture.usuario_id
-        )
+        with consultas.maximo(3):
+            result = get_historial_movimientos_by_usuario(
+                session, movimiento_fixture.usuario_id
+            )
         
         assert result.total == 1
         assert len(result.items) == 1
@@ -442,14 +544,36 @@ class TestGetHistorialMovimientosByUsuario:
 class TestGetMovimientosInventario:
     """Tests para la función get_movimientos_inventario."""
     
-    def test_get_movimientos_inventario_sin_filtros(self, session: Session, movimiento_fixture):
+    def test_get_movimientos_inventario_sin_filtros(self, session: Session, consultas, movimiento_fixture):
         """Debe devolver todos los movimientos sin filtros."""
-        result = get_movimientos_inventario(session)
+        with consultas.maximo(3):
+            result = get_movimientos_inventario(session)
         
         assert result.total == 1
         assert len(result.items) == 1
         assert result.items[0].id == movimiento_fixture.id
     
+    def test_get_movimientos_inventario_consultas_por_pagina(self, session: Session, consultas, categoria_fixture,
+                                                             usuarios_fixture):
+        """No debe consultar producto ni usuario por cada movimiento."""
+        productos = [
+            Producto(codigo=f"PM{i}", nombre=f"Producto {i}", precio_unitario=10.0,
+                     unidad_medida=UnidadMedida.UNIDAD, categoria_id=categoria_fixture.id)
+            for i in range(3)
+        ]
+        session.add_all(productos)
+        session.flush()
+        session.add_all([
+            MovimientoInventario(producto_id=producto.id, tipo=TipoMovimientoEnum.ENTRADA, cantidad=1, usuario_id=usuario.id)
+            for producto in productos for usuario in usuarios_fixture
+        ])
+        session.commit()
+
+        with consultas.maximo(3):
+            result = get_movimientos_inventario(session)
+
+        assert len(result.items) == len(productos) * len(usuarios_fixture)
+
     def test_get_movimientos_inventario_filtro_tipo(self, session: Session, producto_fixture, usuario_fixture):
         """Debe filtrar movimientos por tipo."""
         # Crear movimientos de diferentes tipos
@@ -521,7 +645,7 @@ class TestGetInventariosStockBajo:
     """Tests para la función get_inventarios_stock_bajo."""
     
     @patch('app.core.config.settings.STOCK_MINIMO', 20)
-    def test_get_inventarios_stock_bajo_basic(self, session: Session, categoria_fixture):
+    def test_get_inventarios_stock_bajo_basic(self, session: Session, consultas, categoria_fixture):
         """Debe devolver inventarios con stock bajo."""
         # Crear producto con stock bajo
         producto = Producto(
@@ -537,7 +661,9 @@ class TestGetInventariosStockBajo:
         session.add(inventario_stock_bajo)
         session.commit()
         
-        result = get_inventarios_stock_bajo(session)
+        with consultas.maximo(3):
+            result = get_inventarios_stock_bajo(session)
+            [InventarioReadDetail.model_validate(item) for item in result.items]
         
         assert result.total == 1
         assert result.items[0].cantidad < result.items[0].cantidad_minima
@@ -567,12 +693,14 @@ class TestGetInventariosStockBajo:
 class TestUpdateInventario:
     """Tests para la función update_inventario."""
     
-    def test_update_inventario_cantidad_exitoso(self, session: Session, inventario_fixture, usuario_fixture):
+    def test_update_inventario_cantidad_exitoso(self, session: Session, consultas, inventario_fixture, usuario_fixture):
         """Debe actualizar la cantidad y crear movimiento."""
         nueva_cantidad = 150
         data = InventarioCantidadUpdate(cantidad=nueva_cantidad)
         
-        result = update_inventario(session, inventario_fixture.id, data, usuario_fixture)
+        with consultas.maximo(6):
+            result = update_inventario(session, inventario_fixture.id, data, usuario_fixture)
+            InventarioRead.model_validate(result)
         
         assert result.cantidad == nueva_cantidad
         
@@ -0,0 +1,132 @@
+from sqlmodel import Session
+
+from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
+
+from app.schemas.shared import EstrategiaTotal
+from app.services.cliente_service import get_clientes
+from app.services.inventario_service import (
+    get_historial_movimientos_by_producto,
+    get_historial_movimientos_by_usuario,
+    get_movimientos_inventario
+)
+from app.services.venta_service import get_ventas
+
+
+class TestPaginar:
+    """Tests para el helper de paginación compartido por los listados."""
+
+    def test_total_en_la_misma_consulta(self, session: Session, clientes_fixture):
+        """Debe devolver el total del listado completo junto con la página."""
+        result = get_clientes(session, page=1, page_size=1)
+
+        assert result.total == len(clientes_fixture)
+        assert result.total_pages == len(clientes_fixture)
+        assert len(result.items) == 1
+        assert result.has_next is True
+
+    def test_sin_total(self, session: Session, clientes_fixture):
+        """Con include_total=False no se cuenta, pero se sabe si hay otra página."""
+        primera = get_clientes(session, page=1, page_size=1, include_total=False)
+        ultima = get_clientes(session, page=len(clientes_fixture), page_size=1, include_total=False)
+
+        assert primera.total is None
+        assert primera.total_pages is None
+        assert primera.has_next is True
+        assert len(ultima.items) == 1
+        assert ultima.has_next is False
+
+    def test_pagina_fuera_de_rango(self, session: Session, clientes_fixture):
+        """Una página vacía debe seguir informando el total."""
+        result = get_clientes(session, page=10, page_size=5)
+
+        assert result.items == []
+        assert result.total == len(clientes_fixture)
+        assert result.has_next is False
+
+    def test_sin_funciones_ventana(self, session: Session, clientes_fixture, monkeypatch):
+        """Sin funciones de ventana debe contar con una consulta aparte."""
+        monkeypatch.setattr("app.services.paginacion.soporta_funciones_ventana", lambda db: False)
+
+        result = get_clientes(session, page=1, page_size=1)
+
+        assert result.total == len(clientes_fixture)
+        assert len(result.items) == 1
+
+    def test_total_con_cursor(self, session: Session, movimiento_fixture):
+        """Con cursor el total es el del listado completo, no el de lo que resta."""
+        session.add(MovimientoInventario(
+            producto_id=movimiento_fixture.producto_id,
+            tipo=TipoMovimientoEnum.SALIDA,
+            cantidad=1,
+            usuario_id=movimiento_fixture.usuario_id
+        ))
+        session.commit()
+
+        primera = get_movimientos_inventario(session, page_size=1)
+        siguiente = get_movimientos_inventario(session, page_size=1, cursor=primera.next_cursor)
+
+        assert primera.total == siguiente.total == 2
+        assert siguiente.has_next is False
+
+
+class TestEstrategiaTotal:
+    """Tests para las estrategias de cálculo del total."""
+
+    def test_exacto_por_defecto(self, session: Session, clientes_fixture):
+        """Los listados pequeños cuentan siempre de forma exacta."""
+        result = get_clientes(session)
+
+        assert result.total_strategy == EstrategiaTotal.exacto
+
+    def test_listados_grandes_exactos_por_defecto(self, session: Session, venta_fixture, movimiento_fixture, monkeypatch):
+        """Las estrategias aproximadas solo se usan si se piden: el frontend trata el total como exacto."""
+        monkeypatch.setattr("app.services.paginacion.estimar_total", lambda db, statement: 120000)
+
+        for result in (
+            get_ventas(session),
+            get_movimientos_inventario(session),
+            get_historial_movimientos_by_producto(session, movimiento_fixture.producto_id),
+            get_historial_movimientos_by_usuario(session, movimiento_fixture.usuario_id),
+        ):
+            assert result.total_strategy == EstrategiaTotal.exacto
+            assert result.total == 1
+
+    def test_cache_reutiliza_el_total(self, session: Session, movimiento_fixture):
+        """Con los mismos filtros se reutiliza el total calculado antes."""
+        cache = EstrategiaTotal.cache
+        primera = get_historial_movimientos_by_producto(session, movimiento_fixture.producto_id, estrategia_total=cache)
+
+        session.add(MovimientoInventario(
+            producto_id=movimiento_fixture.producto_id,
+            tipo=TipoMovimientoEnum.SALIDA,
+            cantidad=1,
+            usuario_id=movimiento_fixture.usuario_id
+        ))
+        session.commit()
+        segunda = get_historial_movimientos_by_producto(session, movimiento_fixture.producto_id, estrategia_total=cache)
+        otro_filtro = get_historial_movimientos_by_producto(
+            session, movimiento_fixture.producto_id, tipo=TipoMovimientoEnum.SALIDA, estrategia_total=cache
+        )
+
+        assert primera.total_strategy == EstrategiaTotal.exacto
+        assert segunda.total_strategy == EstrategiaTotal.cache
+        assert segunda.total == 1
+        assert len(segunda.items) == 2
+        assert otro_filtro.total_strategy == EstrategiaTotal.exacto
+
+    def test_estimado_sin_filtros(self, session: Session, movimiento_fixture, monkeypatch):
+        """Sin filtros se usa la estimación de la tabla cuando el motor la ofrece."""
+        monkeypatch.setattr("app.services.paginacion.estimar_total", lambda db, statement: 120000)
+
+        result = get_movimientos_inventario(session, page_size=10, estrategia_total=EstrategiaTotal.estimado)
+
+        assert result.total_strategy == EstrategiaTotal.estimado
+        assert result.total == 120000
+        assert result.has_next is False
+
+    def test_estimado_sin_estadisticas(self, session: Session, movimiento_fixture):
+        """Sin estadísticas del motor (SQLite) se cuenta de forma exacta."""
+        result = get_movimientos_inventario(session, estrategia_total=EstrategiaTotal.estimado)
+
+        assert result.total_strategy == EstrategiaTotal.exacto
+        assert result.total == 1
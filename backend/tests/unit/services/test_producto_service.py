@@ -6,7 +6,8 @@ from typing import Optional
 
 from app.models.producto import Producto, UnidadMedida
 from app.models.categoria import Categoria
-from app.schemas.producto import ProductoCreate, ProductoUpdate
+from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
+from app.schemas.producto import ProductoCreate, ProductoDetailRead, ProductoUpdate
 from app.services.producto_service import (
     get_productos,
     get_numero_total_productos,
@@ -24,9 +25,11 @@ from app.services.producto_service import (
 class TestGetProductos:
     """Tests para la función get_productos con filtros, paginación y ordenamiento."""
     
-    def test_get_productos_sin_filtros(self, session: Session, producto_fixture):
+    def test_get_productos_sin_filtros(self, session: Session, consultas, producto_fixture):
         """Debe devolver todos los productos sin filtros aplicados."""
-        result = get_productos(session)
+        with consultas.maximo(2):
+            result = get_productos(session)
+            [ProductoDetailRead.model_validate(item) for item in result.items]
         
         assert result.total == 1
         assert len(result.items) == 1
@@ -264,6 +267,17 @@ class TestUpdateProducto:
         assert result.nombre == "Martillo Actualizado"
         assert result.precio_unitario == 15.0
         assert result.codigo == "P001"  # No debe cambiar
+
+    def test_update_producto_categoria(self, session: Session, producto_fixture):
+        """La categoría de la respuesta es la nueva, no la que estaba cargada."""
+        assert producto_fixture.categoria.nombre == "Herramientas"
+        otra = Categoria(nombre="Pinturas", descripcion="Otra")
+        session.add(otra)
+        session.commit()
+
+        result = update_producto(session, producto_fixture.id, ProductoUpdate(categoria_id=otra.id))
+
+        assert result.categoria.nombre == "Pinturas"
     
     def test_update_producto_codigo_duplicado(self, session: Session, categoria_fixture):
         """Debe lanzar excepción cuando se intenta actualizar con código duplicado."""
@@ -342,6 +356,25 @@ class TestDeleteProducto:
         assert exc_info.value.status_code == 400
         assert "No se puede eliminar" in exc_info.value.detail
 
+    def test_delete_producto_no_carga_relaciones(self, session: Session, consultas, producto_fixture, usuario_fixture):
+        """La verificación de relaciones es una sola consulta con EXISTS, sin leer los movimientos."""
+        session.add_all([
+            MovimientoInventario(
+                producto_id=producto_fixture.id, tipo=TipoMovimientoEnum.ENTRADA,
+                cantidad=1, cantidad_inventario=i, usuario_id=usuario_fixture.id
+            )
+            for i in range(50)
+        ])
+        session.commit()
+
+        with consultas.maximo(2) as sentencias:
+            with pytest.raises(HTTPException) as exc_info:
+                delete_producto(session, producto_fixture.id)
+
+        assert exc_info.value.status_code == 400
+        (consulta,) = [c for c in sentencias if "movimiento_inventario" in c]
+        assert "EXISTS" in consulta
+
 
 class TestChangeEstadoProducto:
     """Tests para la función change_estado_producto."""
@@ -380,7 +413,7 @@ class TestGetProductosInfinitoInventario:
     
     def test_get_productos_infinito_inventario_sin_inventario(self, session: Session, producto_fixture):
         """Debe devolver productos que no tienen inventario."""
-        result = get_productos_infinito_inventario(session)
+        result = get_productos_infinito_inventario(session).filas
         
         assert len(result) == 1
         assert result[0].id == producto_fixture.id
@@ -396,7 +429,7 @@ class TestGetProductosInfinitoInventario:
         session.add(producto2)
         session.commit()
         
-        result = get_productos_infinito_inventario(session, search="Destorn")
+        result = get_productos_infinito_inventario(session, search="Destorn").filas
         
         assert len(result) == 1
         assert "Destornillador" in result[0].nombre
@@ -411,7 +444,7 @@ class TestGetProductosInfinitoInventario:
         session.add(producto_inactivo)
         session.commit()
         
-        result = get_productos_infinito_inventario(session)
+        result = get_productos_infinito_inventario(session).filas
         
         # Solo debe devolver el producto activo del fixture
         assert len(result) == 1
@@ -428,17 +461,33 @@ class TestGetProductosInfinitoInventario:
         session.add_all(productos)
         session.commit()
         
-        result = get_productos_infinito_inventario(session, skip=2, limit=2)
+        result = get_productos_infinito_inventario(session, skip=2, limit=2).filas
         
         assert len(result) == 2
 
+    def test_get_productos_infinito_inventario_cursor(self, session: Session, categoria_fixture, producto_fixture):
+        """Con cursor debe continuar en orden (nombre, id) sin repetir productos."""
+        session.add_all([
+            Producto(codigo=f"P00{i}", nombre=f"Producto {i}", precio_unitario=10.0,
+                    unidad_medida=UnidadMedida.UNIDAD, categoria_id=categoria_fixture.id)
+            for i in range(2, 5)
+        ])
+        session.commit()
+
+        primera = get_productos_infinito_inventario(session, limit=2)
+        siguiente = get_productos_infinito_inventario(session, limit=2, cursor=primera.next_cursor)
+
+        assert [p.nombre for p in primera.filas + siguiente.filas] == [
+            "P001: Martillo", "P002: Producto 2", "P003: Producto 3", "P004: Producto 4"
+        ]
+
 
 class TestGetProductosInfinitoMovimiento:
     """Tests para la función get_productos_infinito_movimiento."""
     
     def test_get_productos_infinito_movimiento_basico(self, session: Session, producto_fixture):
         """Debe devolver productos activos."""
-        result = get_productos_infinito_movimiento(session)
+        result = get_productos_infinito_movimiento(session).filas
         
         assert len(result) == 1
         assert result[0].id == producto_fixture.id
@@ -454,7 +503,7 @@ class TestGetProductosInfinitoMovimiento:
         session.add(producto2)
         session.commit()
         
-        result = get_productos_infinito_movimiento(session, search="P002")
+        result = get_productos_infinito_movimiento(session, search="P002").filas
         
         assert len(result) == 1
         assert "P002" in result[0].nombre
@@ -469,7 +518,7 @@ class TestGetProductosInfinitoMovimiento:
         session.add(producto_inactivo)
         session.commit()
         
-        result = get_productos_infinito_movimiento(session)
+        result = get_productos_infinito_movimiento(session).filas
         
         # Solo debe devolver el producto activo del fixture
         assert len(result) == 1
@@ -0,0 +1,27 @@
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session
+
+from app.models.inventario import Inventario
+from app.models.producto import Producto
+from app.models.venta import Venta
+from app.services.relaciones import tiene_relaciones, verificar_sin_relaciones
+
+
+class TestRelaciones:
+    """Tests para la verificación de relaciones antes de eliminar."""
+
+    def test_sin_relaciones(self, session: Session, producto_fixture):
+        """Sin filas relacionadas no bloquea."""
+        assert tiene_relaciones(session, Inventario.producto_id == producto_fixture.id) is False
+        verificar_sin_relaciones(session, Inventario.producto_id == producto_fixture.id)
+
+    def test_alguna_condicion_basta(self, session: Session, inventario_fixture):
+        """Basta con que una de las tablas tenga filas."""
+        producto_id = inventario_fixture.producto_id
+        assert tiene_relaciones(session, Venta.id == -1, Inventario.producto_id == producto_id) is True
+
+        with pytest.raises(HTTPException) as exc_info:
+            verificar_sin_relaciones(session, Producto.id == -1, Inventario.producto_id == producto_id)
+        assert exc_info.value.status_code == 400
+        assert "relaciones activas" in exc_info.value.detail
@@ -0,0 +1,150 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.models.detalle_venta import DetalleVenta
+from app.models.movimiento_inventario import MovimientoInventario, TipoMovimientoEnum
+from app.models.reserva_stock import ReservaStock
+from app.models.venta import Venta
+from app.schemas.detalle_venta import DetalleVentaCreate, DetalleVentaUpdate
+from app.schemas.inventario import InventarioFranjasUpdate
+from app.schemas.venta import VentaDetailRead
+from app.services.inventario_service import configurar_franjas_inventario
+from app.services.reserva_service import liberar_reservas_vencidas
+from app.services.stock import stock_disponible
+from app.services.venta_service import (
+    add_detalle_venta,
+    confirmar_venta,
+    delete_detalle_venta,
+    update_detalle_venta
+)
+
+
+def _despues_del_vencimiento() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=1)
+
+
+class TestReservaStock:
+    """Tests para las líneas en borrador que apartan stock sin registrar movimientos."""
+
+    def _reservar(self, session: Session, venta_id: int, producto_id: int, cantidad: int, usuario):
+        return add_detalle_venta(
+            session, venta_id, DetalleVentaCreate(producto_id=producto_id, cantidad=cantidad), usuario, reservar=True
+        )
+
+    def test_reservar_aparta_stock_sin_movimiento(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """La línea reservada descuenta el stock pero no escribe en movimiento_inventario."""
+        venta = self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+
+        assert venta.total == Decimal(300)
+        assert stock_disponible(session, inventario_fixture.producto_id) == 70
+        assert session.exec(select(MovimientoInventario)).all() == []
+        reserva = session.exec(select(ReservaStock)).one()
+        assert reserva.detalle_venta_id == venta.detalle_ventas[0].id
+
+    def test_reserva_sin_stock(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Una reserva no puede apartar más de lo disponible."""
+        with pytest.raises(HTTPException) as exc:
+            self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 101, usuario_fixture)
+        assert exc.value.status_code == 400
+        assert session.exec(select(ReservaStock)).all() == []
+
+    def test_confirmar_convierte_reservas(self, session: Session, consultas, inventario_fixture, venta_fixture, usuario_fixture):
+        """Al confirmar, cada reserva pasa a ser un movimiento de venta."""
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 20, usuario_fixture)
+
+        with consultas.maximo(8):
+            venta = VentaDetailRead.model_validate(confirmar_venta(session, venta_fixture.id, usuario_fixture))
+
+        assert len(venta.detalle_ventas) == 2
+        assert session.exec(select(ReservaStock)).all() == []
+        movimientos = session.exec(select(MovimientoInventario)).all()
+        assert [m.cantidad for m in movimientos] == [30, 20]
+        assert all(m.tipo == TipoMovimientoEnum.VENTA for m in movimientos)
+        # Cada línea registra el stock que dejó su propia reserva
+        assert [m.cantidad_inventario for m in movimientos] == [70, 50]
+        assert stock_disponible(session, inventario_fixture.producto_id) == 50
+
+        # Ya confirmada, el barrido no la toca
+        assert liberar_reservas_vencidas(session, _despues_del_vencimiento()) == 0
+
+    def test_confirmar_con_franjas(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Con el stock repartido en franjas, cada movimiento registra el total del producto."""
+        configurar_franjas_inventario(session, inventario_fixture.id, InventarioFranjasUpdate(franjas=4))
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 10, usuario_fixture)
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 5, usuario_fixture)
+
+        confirmar_venta(session, venta_fixture.id, usuario_fixture)
+
+        movimientos = session.exec(select(MovimientoInventario).order_by(MovimientoInventario.id)).all()
+        assert [m.cantidad_inventario for m in movimientos] == [90, 85]
+        assert stock_disponible(session, inventario_fixture.producto_id) == 85
+
+    def test_confirmar_tras_actualizar_linea(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Ajustar una línea reservada actualiza el stock que registrará su movimiento."""
+        venta = self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+        update_detalle_venta(session, venta.detalle_ventas[0].id, DetalleVentaUpdate(cantidad=20), usuario_fixture)
+
+        confirmar_venta(session, venta_fixture.id, usuario_fixture)
+
+        assert session.exec(select(MovimientoInventario)).one().cantidad_inventario == 80
+
+    def test_confirmar_sin_reservas(self, session: Session, venta_fixture, usuario_fixture):
+        """Confirmar una venta sin líneas en borrador responde 400."""
+        with pytest.raises(HTTPException) as exc:
+            confirmar_venta(session, venta_fixture.id, usuario_fixture)
+        assert exc.value.status_code == 400
+
+    def test_barrido_libera_vencidas(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Las reservas vencidas devuelven el stock y eliminan sus líneas."""
+        add_detalle_venta(
+            session, venta_fixture.id,
+            DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=10), usuario_fixture
+        )
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+
+        assert liberar_reservas_vencidas(session) == 0
+        assert liberar_reservas_vencidas(session, _despues_del_vencimiento()) == 1
+
+        session.expire_all()
+        assert stock_disponible(session, inventario_fixture.producto_id) == 90
+        assert [d.cantidad for d in session.exec(select(DetalleVenta)).all()] == [10]
+        assert session.get(Venta, venta_fixture.id).total == Decimal(100)
+        # Solo el movimiento de la línea confirmada
+        assert len(session.exec(select(MovimientoInventario)).all()) == 1
+
+    def test_eliminar_linea_reservada(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Eliminar una línea en borrador libera la reserva sin registrar anulación."""
+        venta = self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+
+        delete_detalle_venta(session, venta.detalle_ventas[0].id, usuario_fixture)
+
+        assert stock_disponible(session, inventario_fixture.producto_id) == 100
+        assert session.exec(select(ReservaStock)).all() == []
+        assert session.exec(select(MovimientoInventario)).all() == []
+
+    def test_actualizar_linea_reservada(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Cambiar la cantidad de una línea en borrador ajusta la reserva."""
+        venta = self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 30, usuario_fixture)
+
+        update_detalle_venta(session, venta.detalle_ventas[0].id, DetalleVentaUpdate(cantidad=45), usuario_fixture)
+
+        assert stock_disponible(session, inventario_fixture.producto_id) == 55
+        assert session.exec(select(ReservaStock)).one().cantidad == 45
+        assert session.exec(select(MovimientoInventario)).all() == []
+
+    def test_linea_nueva_renueva_el_borrador(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Agregar una línea extiende la vigencia de las reservas anteriores."""
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 10, usuario_fixture)
+        primera = session.exec(select(ReservaStock)).one()
+        primera.expira = datetime.now(timezone.utc) - timedelta(minutes=1)
+        session.add(primera)
+        session.commit()
+
+        self._reservar(session, venta_fixture.id, inventario_fixture.producto_id, 10, usuario_fixture)
+
+        assert liberar_reservas_vencidas(session) == 0
+        assert len(session.exec(select(ReservaStock)).all()) == 2
@@ -1,12 +1,16 @@
+import asyncio
 import pytest
 from datetime import timedelta, datetime, timezone
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
 
 from app.core.security import (
     get_password_hash,
     verify_password,
+    verify_and_update_password,
+    verify_and_update_password_async,
     create_access_token,
     decode_access_token,
 )
@@ -300,6 +304,39 @@ class TestDecodeAccessToken:
         assert "exp" in payload  # Debe incluir expiración
 
 
+class TestVerifyAndUpdatePassword:
+    """Pruebas para la verificación con rehash de la contraseña"""
+
+    def test_hash_vigente(self):
+        """Test que verifica que un hash con el costo configurado no se rehace"""
+        hashed = get_password_hash("password")
+
+        assert verify_and_update_password("password", hashed) == (True, None)
+
+    def test_contrasena_incorrecta(self):
+        """Test que verifica que una contraseña incorrecta no genera hash nuevo"""
+        hashed = bcrypt.using(rounds=4).hash("password")
+
+        assert verify_and_update_password("otra", hashed) == (False, None)
+
+    def test_rehash_con_otro_costo(self):
+        """Test que verifica que un hash con otro costo se rehace con el configurado"""
+        hashed = bcrypt.using(rounds=4).hash("password")
+
+        valida, nuevo_hash = verify_and_update_password("password", hashed)
+
+        assert valida is True
+        assert nuevo_hash.startswith(f"$2b${settings.PASSWORD_BCRYPT_ROUNDS:02d}$")
+        assert verify_password("password", nuevo_hash) is True
+
+    def test_version_async(self):
+        """Test que verifica la verificación en el pool de hashing"""
+        hashed = get_password_hash("password")
+
+        assert asyncio.run(verify_and_update_password_async("password", hashed)) == (True, None)
+        assert asyncio.run(verify_and_update_password_async("otra", hashed)) == (False, None)
+
+
 class TestSecurityIntegration:
     """Pruebas de integración para funciones de seguridad"""
 
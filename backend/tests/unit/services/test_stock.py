@@ -0,0 +1,238 @@
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.models.inventario_franja import InventarioFranja
+from app.models.movimiento_inventario import MovimientoInventario
+from app.schemas.detalle_venta import DetalleVentaCreate
+from app.schemas.inventario import InventarioCantidadUpdate, InventarioFranjasUpdate, InventarioRead, InventarioReadDetail
+from app.schemas.movimiento_inventario import MovimientoInventarioCreate
+from app.schemas.venta import VentaCompletaRequest
+from app.services.inventario_service import (
+    configurar_franjas_inventario,
+    get_inventarios,
+    get_inventarios_stock_bajo,
+    register_salida,
+    update_inventario
+)
+from app.services import stock
+from app.services.stock import descontar_stock, registrar_franjas, sumar_stock, stock_disponible
+from app.services.venta_service import add_detalle_venta, create_venta_completa
+
+
+class TestStock:
+    """Tests para los cambios atómicos de stock."""
+
+    def test_descontar_stock(self, session: Session, inventario_fixture):
+        """Descuenta y retorna la cantidad que queda."""
+        assert descontar_stock(session, inventario_fixture.producto_id, 30) == 70
+        assert descontar_stock(session, inventario_fixture.producto_id, 70) == 0
+        session.commit()
+
+        assert stock_disponible(session, inventario_fixture.producto_id) == 0
+
+    def test_descontar_stock_insuficiente(self, session: Session, inventario_fixture):
+        """Si no alcanza no modifica nada."""
+        assert descontar_stock(session, inventario_fixture.producto_id, 101) is None
+        assert stock_disponible(session, inventario_fixture.producto_id) == 100
+
+    def test_sin_inventario(self, session: Session):
+        """Sin inventario para el producto no hay filas que actualizar."""
+        assert descontar_stock(session, 99999, 1) is None
+        assert sumar_stock(session, 99999, 1) is None
+
+    def test_sin_returning(self, session: Session, inventario_fixture, monkeypatch):
+        """En motores sin UPDATE ... RETURNING (MySQL) se lee la cantidad tras actualizar."""
+        monkeypatch.setattr(session.get_bind().dialect, "update_returning", False)
+
+        assert sumar_stock(session, inventario_fixture.producto_id, 5) == 105
+        assert descontar_stock(session, inventario_fixture.producto_id, 106) is None
+        assert descontar_stock(session, inventario_fixture.producto_id, 105) == 0
+
+
+class TestStockConcurrente:
+    """Ventas y salidas cuando otro proceso cambió el stock después de leerlo."""
+
+    def _vender_en_otra_sesion(self, engine, producto_id: int, cantidad: int) -> None:
+        with Session(engine) as otra:
+            descontar_stock(otra, producto_id, cantidad)
+            otra.commit()
+
+    def test_salida_con_copia_desactualizada(self, session: Session, engine, inventario_fixture, usuario_fixture):
+        """La salida usa el stock real, no el leído antes por la sesión."""
+        assert inventario_fixture.cantidad == 100
+        self._vender_en_otra_sesion(engine, inventario_fixture.producto_id, 95)
+
+        with pytest.raises(HTTPException) as exc:
+            register_salida(session, MovimientoInventarioCreate(producto_id=inventario_fixture.producto_id, cantidad=10), usuario_fixture)
+        assert exc.value.status_code == 400
+
+        movimiento = register_salida(session, MovimientoInventarioCreate(producto_id=inventario_fixture.producto_id, cantidad=5), usuario_fixture)
+        assert movimiento.cantidad_inventario == 0
+
+    def test_venta_no_pierde_actualizaciones(self, session: Session, engine, inventario_fixture,
+                                             venta_fixture, usuario_fixture):
+        """Dos ventas sobre el mismo stock se descuentan ambas."""
+        assert inventario_fixture.cantidad == 100
+        self._vender_en_otra_sesion(engine, inventario_fixture.producto_id, 40)
+
+        add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=10), usuario_fixture)
+
+        assert stock_disponible(session, inventario_fixture.producto_id) == 50
+        movimiento = session.exec(select(MovimientoInventario)).one()
+        assert movimiento.cantidad_inventario == 50
+
+
+class TestStockFranjas:
+    """Tests para los contadores de stock repartidos en franjas."""
+
+    def _repartir(self, session: Session, inventario_id: int, franjas: int = 4):
+        return configurar_franjas_inventario(session, inventario_id, InventarioFranjasUpdate(franjas=franjas))
+
+    def _franjas(self, session: Session, inventario_id: int) -> list:
+        return session.exec(
+            select(InventarioFranja.cantidad)
+            .where(InventarioFranja.inventario_id == inventario_id)
+            .order_by(InventarioFranja.franja)
+        ).all()
+
+    def test_activar_conserva_el_total(self, session: Session, inventario_fixture):
+        """El stock se reparte entre las franjas y la lectura sigue dando el total."""
+        inventario = self._repartir(session, inventario_fixture.id, 3)
+
+        assert self._franjas(session, inventario_fixture.id) == [34, 33, 33]
+        assert inventario.cantidad == 0
+        assert InventarioRead.model_validate(inventario).cantidad == 100
+
+        listado = get_inventarios(session)
+        assert InventarioRead.model_validate(listado.items[0]).cantidad == 100
+
+    def test_descontar_y_sumar(self, session: Session, inventario_fixture):
+        """Las ventas descuentan de una franja y las entradas suman a una."""
+        self._repartir(session, inventario_fixture.id)
+
+        assert descontar_stock(session, inventario_fixture.producto_id, 10) == 90
+        assert sumar_stock(session, inventario_fixture.producto_id, 5) == 95
+        assert sum(self._franjas(session, inventario_fixture.id)) == 95
+
+    def test_descontar_de_varias_franjas(self, session: Session, inventario_fixture):
+        """Si ninguna franja alcanza sola se descuenta de varias."""
+        self._repartir(session, inventario_fixture.id)
+
+        assert descontar_stock(session, inventario_fixture.producto_id, 60) == 40
+        assert descontar_stock(session, inventario_fixture.producto_id, 41) is None
+        assert descontar_stock(session, inventario_fixture.producto_id, 40) == 0
+        assert self._franjas(session, inventario_fixture.id) == [0, 0, 0, 0]
+
+    def test_franjas_activadas_por_otro_proceso(self, session: Session, inventario_fixture):
+        """Con la caché desactualizada se descuenta igual de las franjas."""
+        descontar_stock(session, inventario_fixture.producto_id, 1)
+
+        # Activación sin pasar por el servicio de este proceso
+        inventario_fixture.cantidad = 0
+        session.add(inventario_fixture)
+        session.add_all([
+            InventarioFranja(inventario_id=inventario_fixture.id, franja=0, cantidad=50),
+            InventarioFranja(inventario_id=inventario_fixture.id, franja=1, cantidad=49),
+        ])
+        session.commit()
+
+        assert descontar_stock(session, inventario_fixture.producto_id, 10) == 89
+
+    def test_desactivar_consolida(self, session: Session, inventario_fixture):
+        """Sin franjas el stock vuelve a la fila del inventario."""
+        self._repartir(session, inventario_fixture.id)
+        descontar_stock(session, inventario_fixture.producto_id, 10)
+        session.commit()
+
+        inventario = self._repartir(session, inventario_fixture.id, 0)
+
+        assert inventario.cantidad == 90
+        assert self._franjas(session, inventario_fixture.id) == []
+        assert descontar_stock(session, inventario_fixture.producto_id, 90) == 0
+
+    @pytest.mark.parametrize("antes, despues", [(4, 6), (6, 3), (3, 3)])
+    def test_reconfigurar_conserva_el_total(self, session: Session, inventario_fixture, antes, despues):
+        """Cambiar el número de franjas reparte de nuevo el mismo total."""
+        self._repartir(session, inventario_fixture.id, antes)
+        descontar_stock(session, inventario_fixture.producto_id, 10)
+        session.commit()
+
+        inventario = self._repartir(session, inventario_fixture.id, despues)
+
+        franjas = self._franjas(session, inventario_fixture.id)
+        assert len(franjas) == despues
+        assert sum(franjas) == 90
+        assert max(franjas) - min(franjas) <= 1
+        assert InventarioRead.model_validate(inventario).cantidad == 90
+        assert stock_disponible(session, inventario_fixture.producto_id) == 90
+
+    def test_sumar_con_cache_desactualizada(self, session: Session, inventario_fixture, monkeypatch):
+        """Si la franja elegida ya no existe se recargan las franjas y se suma a una de ellas."""
+        self._repartir(session, inventario_fixture.id, 2)
+        stock._cargar_franjas(session)
+        registrar_franjas(inventario_fixture.producto_id, inventario_fixture.id, 4)
+        monkeypatch.setattr(stock.random, "randrange", lambda n: n - 1)
+
+        assert sumar_stock(session, inventario_fixture.producto_id, 5) == 105
+        assert self._franjas(session, inventario_fixture.id) == [50, 55]
+
+    def test_sumar_tras_activar_franjas_en_otro_proceso(self, session: Session, inventario_fixture):
+        """Lo sumado con la caché desactualizada va a una franja y se puede vender completo."""
+        stock._cargar_franjas(session)
+
+        # Activación sin pasar por el servicio de este proceso
+        inventario_fixture.cantidad = 0
+        session.add(inventario_fixture)
+        session.add_all([
+            InventarioFranja(inventario_id=inventario_fixture.id, franja=0, cantidad=50),
+            InventarioFranja(inventario_id=inventario_fixture.id, franja=1, cantidad=50),
+        ])
+        session.commit()
+
+        assert sumar_stock(session, inventario_fixture.producto_id, 10) == 110
+        assert session.get(type(inventario_fixture), inventario_fixture.id).cantidad == 0
+
+        assert descontar_stock(session, inventario_fixture.producto_id, 110) == 0
+        assert stock_disponible(session, inventario_fixture.producto_id) == 0
+
+    def test_franjas_invalidas(self, session: Session, inventario_fixture):
+        """El número de franjas está acotado."""
+        with pytest.raises(HTTPException) as exc:
+            self._repartir(session, inventario_fixture.id, 1000)
+        assert exc.value.status_code == 400
+
+    def test_update_inventario_reparte(self, session: Session, inventario_fixture, usuario_fixture):
+        """Fijar la cantidad la reparte y registra la diferencia sobre el total."""
+        self._repartir(session, inventario_fixture.id)
+
+        update_inventario(session, inventario_fixture.id, InventarioCantidadUpdate(cantidad=8), usuario_fixture)
+
+        assert self._franjas(session, inventario_fixture.id) == [2, 2, 2, 2]
+        movimiento = session.exec(select(MovimientoInventario)).one()
+        assert movimiento.cantidad == 92
+        assert movimiento.cantidad_inventario == 8
+
+    def test_stock_bajo_usa_el_total(self, session: Session, inventario_fixture):
+        """El reporte de stock bajo compara el total con el mínimo."""
+        self._repartir(session, inventario_fixture.id)
+        assert get_inventarios_stock_bajo(session).items == []
+
+        descontar_stock(session, inventario_fixture.producto_id, 95)
+        session.commit()
+        session.expire_all()  # el reporte se consulta en otra petición
+
+        (item,) = get_inventarios_stock_bajo(session).items
+        assert InventarioReadDetail.model_validate(item).cantidad == 5
+
+    def test_venta_completa_con_franjas(self, session: Session, inventario_fixture, cliente_fixture, usuario_fixture):
+        """La venta completa descuenta de las franjas del producto."""
+        self._repartir(session, inventario_fixture.id)
+
+        create_venta_completa(session, VentaCompletaRequest(
+            cliente_id=cliente_fixture.id,
+            detalles=[DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=30)]
+        ), usuario_fixture.id)
+
+        assert stock_disponible(session, inventario_fixture.producto_id) == 70
+        assert sum(self._franjas(session, inventario_fixture.id)) == 70
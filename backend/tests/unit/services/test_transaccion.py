@@ -0,0 +1,102 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.models.movimiento_inventario import MovimientoInventario
+from app.schemas.movimiento_inventario import MovimientoInventarioCreate
+from app.services import inventario_service
+from app.services.inventario_service import register_salida
+from app.services.stock import stock_disponible
+from app.services.transaccion import es_error_reintentable, estadisticas_reintentos, transaccional
+
+
+class _ErrorMySQL(Exception):
+    def __init__(self, errno: int):
+        super().__init__(errno, "error")
+        self.errno = errno
+
+
+def _error(errno: int) -> OperationalError:
+    return OperationalError("UPDATE inventario ...", {}, _ErrorMySQL(errno))
+
+
+@pytest.fixture(autouse=True)
+def sin_espera(monkeypatch):
+    monkeypatch.setattr("app.services.transaccion.time.sleep", lambda segundos: None)
+
+
+class TestTransaccional:
+    """Tests para el reintento de transacciones ante conflictos de concurrencia."""
+
+    def test_errores_reintentables(self):
+        """Deadlock y lock wait timeout se reintentan; otros errores no."""
+        assert es_error_reintentable(_error(1213))
+        assert es_error_reintentable(_error(1205))
+        assert not es_error_reintentable(_error(1062))
+        assert es_error_reintentable(OperationalError("", {}, Exception("database is locked")))
+
+    def test_reintenta_hasta_completar(self, session: Session):
+        """Repite el servicio tras el deadlock y cuenta los reintentos."""
+        llamadas = []
+
+        @transaccional
+        def servicio(db: Session) -> str:
+            llamadas.append(1)
+            if len(llamadas) < 3:
+                raise _error(1213)
+            return "ok"
+
+        assert servicio(session) == "ok"
+        assert len(llamadas) == 3
+        assert estadisticas_reintentos() == {"servicio": {"reintentos": 2, "agotados": 0}}
+
+    def test_error_no_reintentable(self, session: Session):
+        """Los errores que no son de concurrencia se propagan sin repetir."""
+        llamadas = []
+
+        @transaccional
+        def servicio(db: Session):
+            llamadas.append(1)
+            raise _error(1062)
+
+        with pytest.raises(OperationalError):
+            servicio(db=session)
+        assert len(llamadas) == 1
+
+    def test_intentos_agotados(self, session: Session, monkeypatch):
+        """Si el conflicto persiste responde 503."""
+        monkeypatch.setattr("app.services.transaccion.settings.DB_RETRY_MAX_INTENTOS", 2)
+
+        @transaccional
+        def servicio(db: Session):
+            raise _error(1205)
+
+        with pytest.raises(HTTPException) as exc:
+            servicio(session)
+        assert exc.value.status_code == 503
+        assert estadisticas_reintentos()["servicio"] == {"reintentos": 1, "agotados": 1}
+
+    def test_register_salida_tras_deadlock(self, session: Session, inventario_fixture, usuario_fixture, monkeypatch):
+        """La salida repetida tras un deadlock se registra una sola vez."""
+        descontar_original = inventario_service.descontar_stock
+        fallos = [_error(1213)]
+
+        def descontar_con_deadlock(db, producto_id, cantidad):
+            resultado = descontar_original(db, producto_id, cantidad)
+            if fallos:
+                raise fallos.pop()
+            return resultado
+
+        monkeypatch.setattr(inventario_service, "descontar_stock", descontar_con_deadlock)
+
+        movimiento = register_salida(
+            session,
+            MovimientoInventarioCreate(producto_id=inventario_fixture.producto_id, cantidad=10),
+            usuario_fixture
+        )
+
+        assert movimiento.cantidad_inventario == 90
+        assert stock_disponible(session, inventario_fixture.producto_id) == 90
+        assert len(session.exec(select(MovimientoInventario)).all()) == 1
+        assert estadisticas_reintentos()["register_salida"]["reintentos"] == 1
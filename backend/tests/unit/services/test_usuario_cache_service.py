@@ -0,0 +1,89 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlmodel import Session
+
+from app.api.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.schemas.usuario import UsuarioUpdate
+from app.services.usuario_cache_service import estadisticas_cache_usuarios
+from app.services.usuario_service import update_usuario, delete_usuario, change_estado_usuario
+
+
+def _credenciales(email: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": email}))
+
+
+class TestCacheUsuarios:
+    """Tests para la caché de usuarios autenticados de get_current_user."""
+
+    def test_segunda_peticion_no_consulta_la_base(self, session: Session, usuario_fixture):
+        """La primera petición consulta la base; las siguientes usan la caché."""
+        primero = get_current_user(_credenciales(usuario_fixture.email), session)
+        segundo = get_current_user(_credenciales(usuario_fixture.email), session)
+
+        assert primero.id == segundo.id == usuario_fixture.id
+        assert segundo in session
+        assert estadisticas_cache_usuarios()["misses"] == 1
+        assert estadisticas_cache_usuarios()["hits"] == 1
+
+    def test_usuario_cacheado_en_otra_sesion(self, session: Session, engine, usuario_fixture):
+        """El usuario cacheado se puede usar desde otra sesión sin conflictos."""
+        get_current_user(_credenciales(usuario_fixture.email), session)
+
+        with Session(engine) as otra:
+            usuario = get_current_user(_credenciales(usuario_fixture.email), otra)
+            assert usuario in otra
+            assert usuario.rol_id == usuario_fixture.rol_id
+
+    def test_update_invalida(self, session: Session, usuario_fixture):
+        """Editar el usuario lo descarta de la caché."""
+        get_current_user(_credenciales(usuario_fixture.email), session)
+
+        update_usuario(session, usuario_fixture.id, UsuarioUpdate(rol_id=usuario_fixture.rol_id, nombre="Otro nombre"))
+        usuario = get_current_user(_credenciales(usuario_fixture.email), session)
+
+        assert usuario.nombre == "Otro nombre"
+        assert estadisticas_cache_usuarios()["invalidaciones"] == 1
+        assert estadisticas_cache_usuarios()["misses"] == 2
+
+    def test_cambio_de_email_invalida_el_anterior(self, session: Session, usuario_fixture):
+        """Con el email cambiado, el token anterior deja de ser válido."""
+        email_anterior = usuario_fixture.email
+        get_current_user(_credenciales(email_anterior), session)
+
+        update_usuario(session, usuario_fixture.id, UsuarioUpdate(email="nuevo@test.com"))
+
+        with pytest.raises(HTTPException) as exc:
+            get_current_user(_credenciales(email_anterior), session)
+        assert exc.value.status_code == 401
+
+    def test_change_estado_invalida(self, session: Session, usuario_fixture):
+        """Cambiar el estado descarta el usuario de la caché."""
+        get_current_user(_credenciales(usuario_fixture.email), session)
+
+        change_estado_usuario(session, usuario_fixture.id)
+        usuario = get_current_user(_credenciales(usuario_fixture.email), session)
+
+        assert usuario.estado is False
+
+    def test_delete_invalida(self, session: Session, usuario_fixture):
+        """Eliminar el usuario invalida sus tokens de inmediato."""
+        email = usuario_fixture.email
+        get_current_user(_credenciales(email), session)
+
+        delete_usuario(session, usuario_fixture.id)
+
+        with pytest.raises(HTTPException) as exc:
+            get_current_user(_credenciales(email), session)
+        assert exc.value.status_code == 401
+
+    def test_cache_deshabilitada(self, session: Session, usuario_fixture, monkeypatch):
+        """Con la caché deshabilitada siempre se consulta la base."""
+        monkeypatch.setattr("app.services.usuario_cache_service.settings.AUTH_CACHE_ENABLED", False)
+
+        get_current_user(_credenciales(usuario_fixture.email), session)
+        get_current_user(_credenciales(usuario_fixture.email), session)
+
+        assert estadisticas_cache_usuarios()["hits"] == 0
+        assert estadisticas_cache_usuarios()["entradas"] == 0
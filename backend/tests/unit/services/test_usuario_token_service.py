@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from passlib.hash import bcrypt
+from sqlmodel import Session
+
+from app.api.dependencies import get_current_user
+from app.api.v1.routes.auth import login
+from app.core.config import settings
+from app.core.security import create_access_token, get_password_hash
+from app.models.usuario import Usuario
+from app.schemas.auth import LoginRequest
+from app.schemas.usuario import UsuarioUpdate
+from app.services.usuario_token_service import claims_token
+from app.services.usuario_service import update_usuario, delete_usuario, change_estado_usuario
+
+
+def _credenciales(usuario: Usuario) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(claims_token(usuario)))
+
+
+@pytest.fixture
+def consultas_en_el_hilo(monkeypatch):
+    """La base SQLite en memoria de los tests solo se usa desde el hilo que la creó."""
+    async def en_el_hilo(funcion, *args):
+        return funcion(*args)
+
+    monkeypatch.setattr("app.api.v1.routes.auth.run_in_threadpool", en_el_hilo)
+
+
+def _rechazado(session: Session, credenciales: HTTPAuthorizationCredentials) -> bool:
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(credenciales, session)
+    return exc.value.status_code == 401
+
+
+class TestClaimsToken:
+    """Tests para la autorización con los claims del token y la tabla de revocación."""
+
+    def test_autoriza_sin_consultar_usuario(self, session: Session, consultas, usuario_fixture):
+        """Con la tabla cargada, la autorización no ejecuta consultas."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        with consultas.maximo(0):
+            usuario = get_current_user(credenciales, session)
+
+        assert usuario.id == usuario_fixture.id
+        assert usuario.rol_id == usuario_fixture.rol_id
+
+    def test_usuario_creado_despues_del_refresco(self, session: Session, usuario_fixture, rol_fixture):
+        """Un usuario que no estaba en la tabla se busca una vez y se autoriza."""
+        get_current_user(_credenciales(usuario_fixture), session)
+
+        nuevo = Usuario(
+            nombre="Nuevo", email="nuevo@test.com",
+            contrasena=get_password_hash("1234"), rol_id=rol_fixture.id
+        )
+        session.add(nuevo)
+        session.commit()
+        session.refresh(nuevo)
+
+        assert get_current_user(_credenciales(nuevo), session).id == nuevo.id
+
+    def test_usuario_desactivado(self, session: Session, usuario_fixture):
+        """Desactivar un usuario revoca sus tokens."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        change_estado_usuario(session, usuario_fixture.id)
+
+        assert _rechazado(session, credenciales)
+
+    def test_cambio_de_rol(self, session: Session, usuario_fixture):
+        """Un token emitido con otro rol deja de ser válido."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        update_usuario(session, usuario_fixture.id, UsuarioUpdate(rol_id=usuario_fixture.rol_id + 1))
+
+        assert _rechazado(session, credenciales)
+
+    def test_cambio_de_contrasena(self, session: Session, usuario_fixture):
+        """Cambiar la contraseña revoca los tokens anteriores, no los nuevos."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        usuario = update_usuario(session, usuario_fixture.id, UsuarioUpdate(contrasena="nueva"))
+
+        assert _rechazado(session, credenciales)
+        assert get_current_user(_credenciales(usuario), session).id == usuario.id
+
+    def test_usuario_eliminado(self, session: Session, usuario_fixture):
+        """Eliminar el usuario revoca sus tokens."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        delete_usuario(session, usuario_fixture.id)
+
+        assert _rechazado(session, credenciales)
+
+    def test_refresco_periodico(self, session: Session, usuario_fixture, monkeypatch):
+        """Los cambios hechos por otro proceso se aplican al refrescar la tabla."""
+        credenciales = _credenciales(usuario_fixture)
+        get_current_user(credenciales, session)
+
+        # Cambio directo en la base de datos, sin pasar por el servicio
+        usuario_fixture.estado = False
+        session.add(usuario_fixture)
+        session.commit()
+        assert get_current_user(credenciales, session).id == usuario_fixture.id
+
+        monkeypatch.setattr("app.services.usuario_token_service.settings.AUTH_REVOCACION_REFRESH_SECONDS", 0)
+        assert _rechazado(session, credenciales)
+
+    def test_token_sin_claims(self, session: Session, usuario_fixture):
+        """Los tokens que solo traen el email siguen funcionando."""
+        credenciales = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=create_access_token({"sub": usuario_fixture.email})
+        )
+
+        assert get_current_user(credenciales, session).nombre == usuario_fixture.nombre
+
+    def test_login_rehace_hash_con_otro_costo(self, session: Session, usuario_fixture, consultas_en_el_hilo):
+        """Al iniciar sesión, un hash con otro costo se reemplaza y el token es válido."""
+        usuario_fixture.contrasena = bcrypt.using(rounds=4).hash("1234")
+        session.add(usuario_fixture)
+        session.commit()
+
+        token = asyncio.run(login(LoginRequest(email=usuario_fixture.email, password="1234"), session))
+        session.refresh(usuario_fixture)
+
+        assert usuario_fixture.contrasena.startswith(f"$2b${settings.PASSWORD_BCRYPT_ROUNDS:02d}$")
+        credenciales = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token["access_token"])
+        assert get_current_user(credenciales, session).id == usuario_fixture.id
+
+    def test_login_credenciales_incorrectas(self, session: Session, usuario_fixture, consultas_en_el_hilo):
+        """Una contraseña incorrecta o un email inexistente responden 401."""
+        for email, password in ((usuario_fixture.email, "otra"), ("nadie@test.com", "1234")):
+            with pytest.raises(HTTPException) as exc:
+                asyncio.run(login(LoginRequest(email=email, password=password), session))
+            assert exc.value.status_code == 401
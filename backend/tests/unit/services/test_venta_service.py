@@ -3,6 +3,7 @@ from datetime import datetime, timezone, timedelta
 from decimal import Decimal
 from unittest.mock import patch
 from fastapi import HTTPException
+from sqlalchemy import func
 from sqlmodel import Session, select
 
 from app.models.venta import Venta
@@ -17,8 +18,11 @@ from app.models.rol import Rol
 
 from app.schemas.venta import (
     VentaRequest, 
+    VentaCompletaRequest,
     VentaUpdate, 
     VentaTotalResponse, 
+    VentaDetailRead,
+    VentaUpdateRead,
 )
 from app.schemas.detalle_venta import (
     DetalleVentaCreate, 
@@ -27,6 +31,7 @@ from app.schemas.detalle_venta import (
 from app.schemas.shared import PagedResponse
 from app.services.venta_service import (
     create_venta, 
+    create_venta_completa,
     get_venta_by_id, 
     get_ventas, 
     update_venta, 
@@ -34,11 +39,13 @@ from app.services.venta_service import (
     get_venta_by_cliente_id, 
     get_numero_ventas_ultimos_30_dias, 
     change_estado_venta,
+    anular_venta,
     add_detalle_venta, 
     update_detalle_venta, 
     delete_detalle_venta,
     get_detalles_venta_by_venta_id, 
-    get_detalle_venta_by_id
+    get_detalle_venta_by_id,
+    recalcular_totales
 )
 
 
@@ -49,11 +56,13 @@ from app.services.venta_service import (
 class TestCreateVenta:
     """Pruebas para la creación de ventas"""
     
-    def test_create_venta_success(self, session: Session, cliente_fixture, usuario_fixture):
+    def test_create_venta_success(self, session: Session, consultas, cliente_fixture, usuario_fixture):
         """Test crear venta exitosamente"""
         venta_data = VentaRequest(cliente_id=cliente_fixture.id)
         
-        result = create_venta(session, venta_data, usuario_fixture.id)
+        with consultas.maximo(3):
+            result = create_venta(session, venta_data, usuario_fixture.id)
+            VentaDetailRead.model_validate(result)
         
         assert result.id is not None
         assert result.cliente_id == cliente_fixture.id
@@ -64,6 +73,17 @@ class TestCreateVenta:
         assert result.usuario.id == usuario_fixture.id
         assert isinstance(result.fecha, datetime)
 
+    def test_create_venta_sin_recargar(self, session: Session, consultas, cliente_fixture, usuario_fixture):
+        """Test que la respuesta se arma sin volver a consultar la venta"""
+        with consultas.maximo(3) as sentencias:
+            result = VentaDetailRead.model_validate(
+                create_venta(session, VentaRequest(cliente_id=cliente_fixture.id), usuario_fixture.id)
+            )
+
+        assert sentencias[-1].startswith("INSERT INTO venta")
+        assert result.cliente.id == cliente_fixture.id
+        assert result.detalle_ventas == []
+
     def test_create_venta_cliente_not_found(self, session: Session, usuario_fixture):
         """Test crear venta con cliente inexistente"""
         venta_data = VentaRequest(cliente_id=99999)
@@ -75,12 +95,164 @@ class TestCreateVenta:
         assert "Cliente no encontrado" in str(exc_info.value.detail)
 
 
+class TestCreateVentaCompleta:
+    """Pruebas para la creación de una venta con todos sus detalles"""
+
+    def _productos(self, session: Session, categoria_id: int, n: int, cantidad: int = 50) -> list:
+        productos = [
+            Producto(codigo=f"PC{i:03d}", nombre=f"Producto {i}", precio_unitario=10 + i,
+                     unidad_medida=UnidadMedida.UNIDAD, categoria_id=categoria_id)
+            for i in range(n)
+        ]
+        session.add_all(productos)
+        session.flush()
+        session.add_all([Inventario(producto_id=p.id, cantidad=cantidad) for p in productos])
+        session.commit()
+        return productos
+
+    def test_create_venta_completa_success(self, session: Session, consultas, cliente_fixture, usuario_fixture, categoria_fixture):
+        """Test crear venta con detalles, movimientos y stock en un solo paso"""
+        p1, p2 = self._productos(session, categoria_fixture.id, 2)
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=p1.id, cantidad=3),
+            DetalleVentaCreate(producto_id=p2.id, cantidad=2, precio_unitario=Decimal("5")),
+            DetalleVentaCreate(producto_id=p1.id, cantidad=1),
+        ])
+
+        with consultas.maximo(7):
+            result = VentaDetailRead.model_validate(create_venta_completa(session, venta_data, usuario_fixture.id))
+
+        assert [d.cantidad for d in result.detalle_ventas] == [3, 2, 1]
+        assert [d.producto.id for d in result.detalle_ventas] == [p1.id, p2.id, p1.id]
+        assert result.total == Decimal(10 * 3 + 5 * 2 + 10 * 1)
+        assert result.usuario.id == usuario_fixture.id
+
+        stock = dict(session.exec(select(Inventario.producto_id, Inventario.cantidad)).all())
+        assert stock == {p1.id: 46, p2.id: 48}
+
+        movimientos = session.exec(
+            select(MovimientoInventario).where(MovimientoInventario.venta_id == result.id)
+            .order_by(MovimientoInventario.id)
+        ).all()
+        assert [m.tipo for m in movimientos] == [TipoMovimientoEnum.VENTA] * 3
+        assert [m.cantidad_inventario for m in movimientos] == [47, 48, 46]
+
+    def test_create_venta_completa_consultas_constantes(self, session: Session, consultas, cliente_fixture,
+                                                        usuario_fixture, categoria_fixture):
+        """Test que el número de consultas no depende del número de líneas"""
+        productos = self._productos(session, categoria_fixture.id, 20)
+        usuario_id = usuario_fixture.id
+
+        def contar(n: int) -> int:
+            venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+                DetalleVentaCreate(producto_id=p.id, cantidad=1) for p in productos[:n]
+            ])
+            with consultas.maximo(7) as sentencias:
+                create_venta_completa(session, venta_data, usuario_id)
+            return len(sentencias)
+
+        assert contar(20) == contar(2)
+
+    def test_create_venta_completa_sin_returning(self, session: Session, cliente_fixture, usuario_fixture,
+                                                 categoria_fixture, monkeypatch):
+        """Test que sin INSERT ... RETURNING (MySQL) los detalles se leen tras insertarlos"""
+        p1, p2 = self._productos(session, categoria_fixture.id, 2)
+        monkeypatch.setattr(session.get_bind().dialect, "insert_executemany_returning", False)
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=p2.id, cantidad=2),
+            DetalleVentaCreate(producto_id=p1.id, cantidad=1),
+        ])
+
+        result = VentaDetailRead.model_validate(create_venta_completa(session, venta_data, usuario_fixture.id))
+
+        assert [(d.producto.id, d.cantidad) for d in result.detalle_ventas] == [(p2.id, 2), (p1.id, 1)]
+        assert all(d.venta_id == result.id for d in result.detalle_ventas)
+
+    @pytest.mark.parametrize("cantidad", [0, -5])
+    def test_create_venta_completa_cantidad_invalida(self, session: Session, cliente_fixture, usuario_fixture,
+                                                     categoria_fixture, cantidad):
+        """Test que una línea sin cantidad positiva no suma stock ni crea la venta"""
+        p1, p2 = self._productos(session, categoria_fixture.id, 2)
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=p1.id, cantidad=1),
+            DetalleVentaCreate(producto_id=p2.id, cantidad=cantidad),
+        ])
+
+        with pytest.raises(HTTPException) as exc_info:
+            create_venta_completa(session, venta_data, usuario_fixture.id)
+
+        assert exc_info.value.status_code == 400
+        assert "mayor a 0" in exc_info.value.detail
+        assert session.exec(select(Venta)).all() == []
+        assert session.exec(select(func.sum(Inventario.cantidad))).one() == 100
+
+    def test_create_venta_completa_stock_insuficiente(self, session: Session, cliente_fixture,
+                                                      usuario_fixture, categoria_fixture):
+        """Test que si una línea no tiene stock no se crea nada"""
+        p1, p2 = self._productos(session, categoria_fixture.id, 2, cantidad=5)
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=p1.id, cantidad=1),
+            DetalleVentaCreate(producto_id=p2.id, cantidad=4),
+            DetalleVentaCreate(producto_id=p2.id, cantidad=2),
+        ])
+
+        with pytest.raises(HTTPException) as exc_info:
+            create_venta_completa(session, venta_data, usuario_fixture.id)
+
+        assert exc_info.value.status_code == 400
+        assert "Stock insuficiente" in exc_info.value.detail
+        assert session.exec(select(Venta)).all() == []
+        assert session.exec(select(func.sum(Inventario.cantidad))).one() == 10
+
+    def test_create_venta_completa_producto_inactivo(self, session: Session, cliente_fixture,
+                                                     usuario_fixture, categoria_fixture):
+        """Test crear venta con un producto inactivo"""
+        (producto,) = self._productos(session, categoria_fixture.id, 1)
+        producto.estado = False
+        session.add(producto)
+        session.commit()
+
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=producto.id, cantidad=1)
+        ])
+
+        with pytest.raises(HTTPException) as exc_info:
+            create_venta_completa(session, venta_data, usuario_fixture.id)
+
+        assert exc_info.value.status_code == 400
+        assert "inactivo" in exc_info.value.detail
+
+    def test_create_venta_completa_inventario_not_found(self, session: Session, cliente_fixture, usuario_fixture):
+        """Test crear venta con un producto sin inventario"""
+        venta_data = VentaCompletaRequest(cliente_id=cliente_fixture.id, detalles=[
+            DetalleVentaCreate(producto_id=99999, cantidad=1)
+        ])
+
+        with pytest.raises(HTTPException) as exc_info:
+            create_venta_completa(session, venta_data, usuario_fixture.id)
+
+        assert exc_info.value.status_code == 404
+
+    def test_create_venta_completa_cliente_not_found(self, session: Session, usuario_fixture):
+        """Test crear venta completa con cliente inexistente"""
+        venta_data = VentaCompletaRequest(cliente_id=99999, detalles=[
+            DetalleVentaCreate(producto_id=1, cantidad=1)
+        ])
+
+        with pytest.raises(HTTPException) as exc_info:
+            create_venta_completa(session, venta_data, usuario_fixture.id)
+
+        assert exc_info.value.status_code == 404
+        assert "Cliente no encontrado" in str(exc_info.value.detail)
+
+
 class TestGetVentaById:
     """Pruebas para obtener venta por ID"""
     
-    def test_get_venta_by_id_success(self, session: Session, venta_fixture):
+    def test_get_venta_by_id_success(self, session: Session, consultas, venta_fixture):
         """Test obtener venta por ID exitosamente"""
-        result = get_venta_by_id(session, venta_fixture.id)
+        with consultas.maximo(4):
+            result = get_venta_by_id(session, venta_fixture.id)
         
         assert result.id == venta_fixture.id
         assert result.cliente_id == venta_fixture.cliente_id
@@ -100,9 +272,10 @@ class TestGetVentaById:
 class TestGetVentas:
     """Pruebas para obtener lista de ventas con filtros"""
     
-    def test_get_ventas_sin_filtros(self, session: Session, venta_fixture):
+    def test_get_ventas_sin_filtros(self, session: Session, consultas, venta_fixture):
         """Test obtener ventas sin filtros"""
-        result = get_ventas(session)
+        with consultas.maximo(3):
+            result = get_ventas(session)
         
         assert result.total >= 1
         assert result.current_page == 1
@@ -143,11 +316,52 @@ class TestGetVentas:
         if len(result.items) > 1:
             assert result.items[0].fecha >= result.items[1].fecha
 
+    def test_get_ventas_consultas_por_pagina(self, session: Session, consultas, clientes_fixture, usuarios_fixture):
+        """Test que la página no consulta cliente ni usuario por cada venta"""
+        session.add_all([
+            Venta(cliente_id=cliente.id, usuario_id=usuario.id, total=Decimal("0"))
+            for cliente in clientes_fixture for usuario in usuarios_fixture
+        ])
+        session.commit()
+
+        with consultas.maximo(3):
+            result = get_ventas(session)
+
+        assert len(result.items) == len(clientes_fixture) * len(usuarios_fixture)
+
+    def test_get_ventas_rango_de_fechas(self, session: Session, venta_fixture):
+        """Test filtrar ventas por rango de fechas"""
+        hoy = datetime.now(timezone.utc).date()
+
+        result = get_ventas(session, fecha_desde=hoy - timedelta(days=1), fecha_hasta=hoy + timedelta(days=1))
+        assert any(v.id == venta_fixture.id for v in result.items)
+
+        result = get_ventas(session, fecha_desde=hoy + timedelta(days=2))
+        assert result.total == 0
+
+    def test_get_ventas_con_cursor(self, session: Session, venta_fixture, cliente_fixture, usuario_fixture):
+        """Test paginación por cursor ordenando por nombre de cliente"""
+        session.add_all([
+            Venta(cliente_id=cliente_fixture.id, usuario_id=usuario_fixture.id, total=Decimal("0"))
+            for _ in range(2)
+        ])
+        session.commit()
+
+        primera = get_ventas(session, page_size=2, sort_by="cliente_nombre", sort_order="asc")
+        segunda = get_ventas(
+            session, page_size=2, sort_by="cliente_nombre", sort_order="asc", cursor=primera.next_cursor
+        )
+
+        ids = [v.id for v in primera.items + segunda.items]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == 3
+        assert segunda.next_cursor is None
+
 
 class TestUpdateVenta:
     """Pruebas para actualizar ventas"""
     
-    def test_update_venta_success(self, session: Session, venta_fixture, cliente_fixture):
+    def test_update_venta_success(self, session: Session, consultas, venta_fixture, cliente_fixture):
         """Test actualizar venta exitosamente"""
         # Crear otro cliente para la prueba
         otro_cliente = Cliente(
@@ -165,9 +379,12 @@ class TestUpdateVenta:
         
         venta_data = VentaUpdate(cliente_id=otro_cliente.id, estado=False)
         
-        result = update_venta(session, venta_fixture.id, venta_data)
+        with consultas.maximo(4):
+            result = update_venta(session, venta_fixture.id, venta_data)
+            VentaUpdateRead.model_validate(result)
         
         assert result.cliente_id == otro_cliente.id
+        assert result.cliente.id == otro_cliente.id
         assert result.estado is False
 
     def test_update_venta_not_found(self, session: Session):
@@ -212,6 +429,20 @@ class TestDeleteVenta:
         assert exc_info.value.status_code == 400
         assert "tiene relaciones activas" in str(exc_info.value.detail)
 
+    def test_delete_venta_con_movimientos(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Sin líneas, una venta sigue relacionada con los movimientos que registró."""
+        venta = add_detalle_venta(
+            session, venta_fixture.id,
+            DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=5), usuario_fixture
+        )
+        delete_detalle_venta(session, venta.detalle_ventas[0].id, usuario_fixture)
+
+        with pytest.raises(HTTPException) as exc_info:
+            delete_venta(session, venta_fixture.id, usuario_fixture)
+
+        assert exc_info.value.status_code == 400
+        assert session.get(Venta, venta_fixture.id) is not None
+
     def test_delete_venta_not_found(self, session: Session, usuario_fixture):
         """Test eliminar venta inexistente"""
         with pytest.raises(HTTPException) as exc_info:
@@ -267,11 +498,12 @@ class TestGetNumeroVentasUltimos30Dias:
 class TestChangeEstadoVenta:
     """Pruebas para cambiar estado de venta"""
     
-    def test_change_estado_venta_success(self, session: Session, venta_fixture):
+    def test_change_estado_venta_success(self, session: Session, consultas, venta_fixture):
         """Test cambiar estado de venta"""
         estado_original = venta_fixture.estado
         
-        result = change_estado_venta(session, venta_fixture.id)
+        with consultas.maximo(5):
+            result = VentaDetailRead.model_validate(change_estado_venta(session, venta_fixture.id))
         
         assert result.estado != estado_original
         assert result.id == venta_fixture.id
@@ -284,14 +516,130 @@ class TestChangeEstadoVenta:
         assert exc_info.value.status_code == 404
 
 
+class TestAnularVenta:
+    """Pruebas para la anulación completa de una venta"""
+
+    def _venta(self, session: Session, cliente_id: int, usuario_id: int, categoria_id: int, n: int,
+               prefijo: str = "PA") -> Venta:
+        productos = [
+            Producto(codigo=f"{prefijo}{i:03d}", nombre=f"Producto {i}", precio_unitario=10,
+                     unidad_medida=UnidadMedida.UNIDAD, categoria_id=categoria_id)
+            for i in range(n)
+        ]
+        session.add_all(productos)
+        session.flush()
+        session.add_all([Inventario(producto_id=p.id, cantidad=50) for p in productos])
+        session.commit()
+
+        return create_venta_completa(session, VentaCompletaRequest(cliente_id=cliente_id, detalles=[
+            DetalleVentaCreate(producto_id=p.id, cantidad=i + 1) for i, p in enumerate(productos)
+        ]), usuario_id)
+
+    def test_anular_venta_success(self, session: Session, consultas, cliente_fixture, usuario_fixture, categoria_fixture):
+        """Test que devuelve todo el stock, registra las anulaciones y cierra la venta"""
+        venta = self._venta(session, cliente_fixture.id, usuario_fixture.id, categoria_fixture.id, 3)
+
+        with consultas.maximo(9):
+            result = VentaDetailRead.model_validate(anular_venta(session, venta.id, usuario_fixture))
+
+        assert result.estado is False
+        assert result.total == 0
+        assert result.detalle_ventas == []
+        assert set(session.exec(select(Inventario.cantidad)).all()) == {50}
+
+        anulaciones = session.exec(
+            select(MovimientoInventario)
+            .where(MovimientoInventario.tipo == TipoMovimientoEnum.ANULACIÓN_VENTA)
+            .order_by(MovimientoInventario.id)
+        ).all()
+        assert [m.cantidad for m in anulaciones] == [1, 2, 3]
+        assert all(m.cantidad_inventario == 50 for m in anulaciones)
+
+    def test_anular_venta_con_linea_reservada(self, session: Session, inventario_fixture, venta_fixture, usuario_fixture):
+        """Test que las líneas en borrador devuelven su stock sin registrar anulación"""
+        add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=10), usuario_fixture)
+        add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=5), usuario_fixture, reservar=True)
+
+        anular_venta(session, venta_fixture.id, usuario_fixture)
+
+        session.expire_all()
+        assert session.get(Inventario, inventario_fixture.id).cantidad == 100
+        anulacion = session.exec(
+            select(MovimientoInventario).where(MovimientoInventario.tipo == TipoMovimientoEnum.ANULACIÓN_VENTA)
+        ).one()
+        assert anulacion.cantidad == 10
+        # La reserva se devuelve después, en el orden de las líneas
+        assert anulacion.cantidad_inventario == 95
+
+    def test_anular_venta_mismo_producto_en_varias_lineas(self, session: Session, inventario_fixture,
+                                                           venta_fixture, usuario_fixture):
+        """Test que cada anulación registra el stock tras devolver su propia línea"""
+        for cantidad in (10, 20):
+            add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=cantidad), usuario_fixture)
+
+        anular_venta(session, venta_fixture.id, usuario_fixture)
+
+        anulaciones = session.exec(
+            select(MovimientoInventario)
+            .where(MovimientoInventario.tipo == TipoMovimientoEnum.ANULACIÓN_VENTA)
+            .order_by(MovimientoInventario.id)
+        ).all()
+        assert [(m.cantidad, m.cantidad_inventario) for m in anulaciones] == [(10, 80), (20, 100)]
+
+    def test_anular_venta_consultas_constantes(self, session: Session, consultas, cliente_fixture,
+                                              usuario_fixture, categoria_fixture):
+        """Test que el número de consultas no depende del número de líneas"""
+        usuario = usuario_fixture
+        ventas = [
+            self._venta(session, cliente_fixture.id, usuario.id, categoria_fixture.id, n, prefijo).id
+            for n, prefijo in ((2, "PA"), (20, "PB"))
+        ]
+
+        def contar(venta_id: int) -> int:
+            with consultas.maximo(9) as sentencias:
+                anular_venta(session, venta_id, usuario)
+            return len(sentencias)
+
+        assert contar(ventas[0]) == contar(ventas[1])
+
+    def test_anular_venta_inactiva(self, session: Session, venta_fixture, usuario_fixture):
+        """Test que una venta ya anulada no se anula de nuevo"""
+        anular_venta(session, venta_fixture.id, usuario_fixture)
+
+        with pytest.raises(HTTPException) as exc_info:
+            anular_venta(session, venta_fixture.id, usuario_fixture)
+
+        assert exc_info.value.status_code == 400
+
+    def test_anular_venta_not_found(self, session: Session, usuario_fixture):
+        """Test anular venta inexistente"""
+        with pytest.raises(HTTPException) as exc_info:
+            anular_venta(session, 99999, usuario_fixture)
+
+        assert exc_info.value.status_code == 404
+
+
 # ================================
 # PRUEBAS PARA DETALLES DE VENTA
 # ================================
 
 class TestAddDetalleVenta:
     """Pruebas para agregar detalles a ventas"""
+
+    def test_add_detalle_venta_sin_recargar(self, session: Session, consultas, detalle_venta_fixture,
+                                            inventario_fixture, usuario_fixture):
+        """Test que la respuesta usa los objetos de la sesión y el total devuelto por el UPDATE"""
+        with consultas.maximo(12) as sentencias:
+            venta = VentaDetailRead.model_validate(add_detalle_venta(
+                session, detalle_venta_fixture.venta_id,
+                DetalleVentaCreate(producto_id=inventario_fixture.producto_id, cantidad=2), usuario_fixture
+            ))
+
+        assert sentencias[-1].startswith("INSERT INTO movimiento_inventario")
+        assert [d.cantidad for d in venta.detalle_ventas] == [5, 2]
+        assert venta.total == Decimal(20)  # la venta del fixture empieza en 0
     
-    def test_add_detalle_venta_success(self, session: Session, venta_fixture, producto_fixture, 
+    def test_add_detalle_venta_success(self, session: Session, consultas, venta_fixture, producto_fixture, 
                                      inventario_fixture, usuario_fixture):
         """Test agregar detalle de venta exitosamente"""
 
@@ -303,13 +651,14 @@ class TestAddDetalleVenta:
             precio_unitario=Decimal("15.00")
         )
         
-        result = add_detalle_venta(session, venta_fixture.id, detalle_data, usuario_fixture)
+        with consultas.maximo(11):
+            result = VentaDetailRead.model_validate(add_detalle_venta(session, venta_fixture.id, detalle_data, usuario_fixture))
         
         assert len(result.detalle_ventas) >= 1
         assert result.total > 0
         
         # Verificar inventario actualizado
-        inventario_updated = session.get(Inventario, inventario_fixture.id)
+        inventario_updated = session.get(Inventario, inventario_fixture.id, populate_existing=True)
         assert inventario_updated.cantidad == cantidad_original - 3
 
         # Verificar que se creó el movimiento
@@ -321,7 +670,7 @@ class TestAddDetalleVenta:
         
         assert movimiento is not None
         assert movimiento.cantidad == 3  # Cantidad de detalle venta
-        assert movimiento.cantidad_inventario == inventario_fixture.cantidad
+        assert movimiento.cantidad_inventario == inventario_updated.cantidad
 
     def test_add_detalle_venta_stock_insuficiente(self, session: Session, venta_fixture, 
                                                 producto_fixture, inventario_fixture, usuario_fixture):
@@ -367,13 +716,16 @@ class TestAddDetalleVenta:
 class TestUpdateDetalleVenta:
     """Pruebas para actualizar detalles de venta"""
     
-    def test_update_detalle_venta_cantidad(self, session: Session, detalle_venta_fixture, 
+    def test_update_detalle_venta_cantidad(self, session: Session, consultas, detalle_venta_fixture, 
                                          inventario_fixture, usuario_fixture):
         """Test actualizar cantidad de detalle"""
         nueva_cantidad = detalle_venta_fixture.cantidad + 2
         detalle_data = DetalleVentaUpdate(cantidad=nueva_cantidad)
         
-        result = update_detalle_venta(session, detalle_venta_fixture.id, detalle_data, usuario_fixture)
+        with consultas.maximo(13):
+            result = VentaDetailRead.model_validate(
+                update_detalle_venta(session, detalle_venta_fixture.id, detalle_data, usuario_fixture)
+            )
         
         # Verificar que el detalle fue actualizado
         detalle_updated = next(d for d in result.detalle_ventas if d.id == detalle_venta_fixture.id)
@@ -388,7 +740,8 @@ class TestUpdateDetalleVenta:
         
         assert movimiento is not None
         assert movimiento.cantidad == 2  # Cantidad nueva del detalle venta
-        assert movimiento.cantidad_inventario == inventario_fixture.cantidad
+        inventario = session.get(Inventario, inventario_fixture.id, populate_existing=True)
+        assert movimiento.cantidad_inventario == inventario.cantidad
 
     def test_update_detalle_venta_precio(self, session: Session, detalle_venta_fixture, usuario_fixture, inventario_fixture):
         """Test actualizar precio de detalle"""
@@ -400,6 +753,20 @@ class TestUpdateDetalleVenta:
         detalle_updated = next(d for d in result.detalle_ventas if d.id == detalle_venta_fixture.id)
         assert detalle_updated.precio_unitario == nuevo_precio
 
+    def test_update_detalle_venta_ajusta_total(self, session: Session, inventario_fixture,
+                                               venta_fixture, usuario_fixture):
+        """Test que el total cambia solo en la diferencia del subtotal de la línea"""
+        producto_id = inventario_fixture.producto_id
+        venta = add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=producto_id, cantidad=3), usuario_fixture)
+        add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=producto_id, cantidad=4), usuario_fixture)
+
+        result = update_detalle_venta(
+            session, venta.detalle_ventas[0].id,
+            DetalleVentaUpdate(cantidad=5, precio_unitario=Decimal("12")), usuario_fixture
+        )
+
+        assert result.total == Decimal(70 - 30 + 60)
+
     def test_update_detalle_venta_not_found(self, session: Session, usuario_fixture):
         """Test actualizar detalle inexistente"""
         detalle_data = DetalleVentaUpdate(cantidad=5)
@@ -413,19 +780,22 @@ class TestUpdateDetalleVenta:
 class TestDeleteDetalleVenta:
     """Pruebas para eliminar detalles de venta"""
     
-    def test_delete_detalle_venta_success(self, session: Session, detalle_venta_fixture, 
+    def test_delete_detalle_venta_success(self, session: Session, consultas, detalle_venta_fixture, 
                                         inventario_fixture, usuario_fixture):
         """Test eliminar detalle de venta"""
         cantidad_original = detalle_venta_fixture.cantidad
         inventario_original = inventario_fixture.cantidad
         
-        result = delete_detalle_venta(session, detalle_venta_fixture.id, usuario_fixture)
+        with consultas.maximo(12):
+            result = VentaDetailRead.model_validate(
+                delete_detalle_venta(session, detalle_venta_fixture.id, usuario_fixture)
+            )
         
         # Verificar que el detalle fue eliminado
         assert not any(d.id == detalle_venta_fixture.id for d in result.detalle_ventas)
         
         # Verificar que el stock fue devuelto
-        inventario_updated = session.get(Inventario, inventario_fixture.id)
+        inventario_updated = session.get(Inventario, inventario_fixture.id, populate_existing=True)
         assert inventario_updated.cantidad == inventario_original + cantidad_original
 
 
@@ -438,7 +808,18 @@ class TestDeleteDetalleVenta:
         
         assert movimiento is not None
         assert movimiento.cantidad == 5  # Cantidad de detalle venta
-        assert movimiento.cantidad_inventario == inventario_fixture.cantidad
+        assert movimiento.cantidad_inventario == inventario_updated.cantidad
+
+    def test_delete_detalle_venta_ajusta_total(self, session: Session, inventario_fixture,
+                                               venta_fixture, usuario_fixture):
+        """Test que el total descuenta solo el subtotal de la línea eliminada"""
+        producto_id = inventario_fixture.producto_id
+        venta = add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=producto_id, cantidad=3), usuario_fixture)
+        add_detalle_venta(session, venta_fixture.id, DetalleVentaCreate(producto_id=producto_id, cantidad=4), usuario_fixture)
+
+        result = delete_detalle_venta(session, venta.detalle_ventas[0].id, usuario_fixture)
+
+        assert result.total == Decimal(40)
 
     def test_delete_detalle_venta_not_found(self, session: Session, usuario_fixture):
         """Test eliminar detalle inexistente"""
@@ -448,14 +829,35 @@ class TestDeleteDetalleVenta:
         assert exc_info.value.status_code == 404
 
 
+class TestRecalcularTotales:
+    """Pruebas para la corrección de totales desalineados"""
+
+    def test_recalcular_totales(self, session: Session, detalle_venta_fixture, cliente_fixture, usuario_fixture):
+        """Test que corrige ventas con líneas y ventas vacías, y no toca las correctas"""
+        # venta_fixture tiene total 0 pero una línea de 5 x 10
+        vacia = Venta(cliente_id=cliente_fixture.id, usuario_id=usuario_fixture.id,
+                      fecha=datetime.now(timezone.utc), total=Decimal(7))
+        session.add(vacia)
+        session.commit()
+        vacia_id = vacia.id
+
+        assert recalcular_totales(session) == 2
+
+        session.expire_all()
+        assert session.get(Venta, detalle_venta_fixture.venta_id).total == Decimal(50)
+        assert session.get(Venta, vacia_id).total == 0
+        assert recalcular_totales(session) == 0
+
+
 class TestGetDetallesVentaByVentaId:
     """Pruebas para obtener detalles por ID de venta"""
     
-    def test_get_detalles_venta_by_venta_id_success(self, session: Session, detalle_venta_fixture):
+    def test_get_detalles_venta_by_venta_id_success(self, session: Session, consultas, detalle_venta_fixture):
         """Test obtener detalles de una venta"""
-        result = get_detalles_venta_by_venta_id(
-            detalle_venta_fixture.venta_id, session
-        )
+        with consultas.maximo(3):
+            result = get_detalles_venta_by_venta_id(
+                detalle_venta_fixture.venta_id, session
+            )
         
         assert result.total >= 1
         assert any(d.id == detalle_venta_fixture.id for d in result.items)
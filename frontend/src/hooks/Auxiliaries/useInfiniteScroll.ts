@@ -37,6 +37,8 @@ export const useInfiniteScroll = ({
   const [hasMore, setHasMore] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [skip, setSkip] = useState(0);
+  // Cursor opaco de la siguiente página (cabecera X-Next-Cursor)
+  const [cursor, setCursor] = useState<string | null>(null);
   const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
   
   const isFirstLoad = useRef(true);
@@ -69,7 +71,7 @@ export const useInfiniteScroll = ({
   }, [searchTerm, debounceMs]);
 
   // Función para cargar items
-  const loadItems = useCallback(async (currentSkip: number, isLoadingMore = false) => {
+  const loadItems = useCallback(async (currentSkip: number, isLoadingMore = false, currentCursor: string | null = null) => {
     if (!enabled) return;
 
     if (isLoadingMore) {
@@ -86,6 +88,11 @@ export const useInfiniteScroll = ({
         limit
       };
 
+      // Con cursor el backend continúa después del último registro recibido
+      if (currentCursor) {
+        params.cursor = currentCursor;
+      }
+
       // Agregar búsqueda si existe
       if (debouncedSearchTerm.trim()) {
         params.search = debouncedSearchTerm.trim();
@@ -102,8 +109,10 @@ export const useInfiniteScroll = ({
         setItems(prevItems => [...prevItems, ...newItems]);
       }
 
-      // Verificar si hay más items
-      setHasMore(newItems.length === limit);
+      // Verificar si hay más items: el backend solo envía cursor si hay otra página
+      const nextCursor: string | undefined = response.headers['x-next-cursor'];
+      setHasMore(Boolean(nextCursor));
+      setCursor(nextCursor ?? null);
       setSkip(currentSkip + newItems.length);
 
     } catch (err: any) {
@@ -122,14 +131,15 @@ export const useInfiniteScroll = ({
   // Cargar más items
   const loadMore = useCallback(() => {
     if (!isLoadingMore && hasMore) {
-      loadItems(skip, true);
+      loadItems(skip, true, cursor);
     }
-  }, [loadItems, skip, isLoadingMore, hasMore]);
+  }, [loadItems, skip, cursor, isLoadingMore, hasMore]);
 
   // Reset para búsquedas
   const reset = useCallback(() => {
     setItems([]);
     setSkip(0);
+    setCursor(null);
     setHasMore(true);
     setError(null);
   }, []);